@@ -6,23 +6,49 @@
 import argparse
 import sys
 import os
+import time
 from dotenv import load_dotenv
-from ebs_merger.cli import EBSMergerCLI
+from ebs_merger.cli import EBSMergerCLI, find_input_files
+from ebs_merger.data_loader import DataLoader
+from ebs_merger.similarity_calculator import SimilarityCalculator
+from ebs_merger.similarity_shards import SimilarityShards
 
 # 加载.env文件
 load_dotenv()
 
 
-def main():
-    """主入口函数，解析命令行参数并执行"""
+def main(argv=None, merge_shards=False) -> int:
+    """主入口函数，解析命令行参数并执行
+    
+    参数:
+        argv: 命令行参数（省略时为sys.argv[1:]，可以以子命令开头）
+        merge_shards: 是否合并分片结果代替相似度计算（merge-shards子命令）
+        
+    返回:
+        退出码（0为全部成功）
+    """
+    # サブコマンド（build-index、query、merge-shards）
+    if argv is None:
+        argv = sys.argv[1:]
+        if argv and argv[0] in SUBCOMMANDS:
+            return SUBCOMMANDS[argv[0]](argv[1:])
+    
     # 从环境变量读取默认值
     default_input_dir = os.getenv('INPUT_DIR', 'input')
     default_output_dir = os.getenv('OUTPUT_DIR', 'output')
     default_threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.8'))
     # 2026/02/18 田 追加    
     default_mode = os.getenv('SIMILARITY_MODE', 'max')
+    default_engine = os.getenv('SIMILARITY_ENGINE', SimilarityCalculator.AUTO_ENGINE)
+    default_workers = int(os.getenv('SIMILARITY_WORKERS', '1'))
+    default_cache_dir = os.getenv('CACHE_DIR')
+    default_reader = os.getenv('EXCEL_READER', 'openpyxl')
+    default_jobs = int(os.getenv('JOBS', '1'))
+    default_scenario_processes = int(os.getenv('SCENARIO_PROCESSES', '1'))
+    default_ai_threads = int(os.getenv('AI_THREADS', '1'))
     
     parser = argparse.ArgumentParser(
+        prog='python -m ebs_merger merge-shards' if merge_shards else None,
         description='EBS設計書分析・マージツール - 一括処理版（AI使用）',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
@@ -30,9 +56,12 @@ def main():
   python -m ebs_merger
   python -m ebs_merger --input-dir input --output-dir output
   python -m ebs_merger --threshold 0.85
+  python -m ebs_merger --sweep 0.6,0.7,0.8,0.9
+  python -m ebs_merger --shard 1/3        （各ノードで 1/3、2/3、3/3 を実行）
+  python -m ebs_merger merge-shards
   
 説明:
-  ツールは入力フォルダ内のすべてのExcelファイル（.xlsxおよび.xls）を自動処理します
+  ツールは入力フォルダ内のすべての入力ファイル（.xlsx、.csv、.tsv、.parquet）を自動処理します
   出力ファイルは出力フォルダに保存されます
   AIを使用して分類、IF概要生成、マージIF名生成を行います
         """
@@ -63,25 +92,324 @@ def main():
         help=f'類似度算出モード、max or avg（デフォルト：{default_mode}、.envで設定可能）'
     )    
     
-    args = parser.parse_args()
+    parser.add_argument(
+        '--engine', '-e',
+        default=default_engine,
+        choices=sorted(SimilarityCalculator.ENGINES) + [SimilarityCalculator.AUTO_ENGINE],
+        help='類似度計算エンジン（auto：シナリオの規模・密度から推定コストが最小の厳密エンジンを自動選択、'
+             'brute：総当たり、index：転置インデックス、sparse：疎行列積、'
+             'prefix：プレフィックスフィルタ閾値結合、minhash：MinHash/LSH近似（avgモードのみ）、bitset：ビットセット）'
+             f'（デフォルト：{default_engine}、.envで設定可能）'
+    )
+    
+    parser.add_argument(
+        '--lsh-bands',
+        type=int,
+        default=32,
+        help='minhashエンジンのband数、大きいほど再現率が高い（デフォルト：32）。'
+             'minhashはJaccard類似度で候補を選ぶため、--mode avg でのみ使用でき、閾値付近のIFペアを取りこぼす場合がある'
+    )
+    
+    parser.add_argument(
+        '--lsh-rows',
+        type=int,
+        default=4,
+        help='minhashエンジンの1 bandあたりの行数、小さいほど再現率が高い（デフォルト：4）'
+    )
+    
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=default_workers,
+        help='類似度計算（indexエンジン）の並列プロセス数、0はCPUコア数'
+             f'（デフォルト：{default_workers}、.envで設定可能）'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        default=default_cache_dir,
+        help='入力キャッシュフォルダパス、変更のないファイルはExcelの解析を省略'
+             '（デフォルト：出力フォルダ/.cache、.envで設定可能）'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='入力キャッシュを使用しない'
+    )
+    
+    parser.add_argument(
+        '--reader',
+        default=default_reader,
+        choices=['auto'] + sorted(DataLoader.READERS),
+        help='Excel読み込み方式（openpyxl：ストリーミング読み込み、calamine：python-calamineによる高速読み込み、'
+             'auto：calamineがインストールされていれば使用）'
+             f'（デフォルト：{default_reader}、.envで設定可能）'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=default_jobs,
+        help='同時に処理する入力ファイル数（プロセス数）、0はCPUコア数。'
+             '各ファイルの処理ログは出力フォルダ/ファイル名/処理ログ.txtに保存'
+             f'（デフォルト：{default_jobs}、.envで設定可能）'
+    )
+    
+    parser.add_argument(
+        '--scenario-processes',
+        type=int,
+        default=default_scenario_processes,
+        help='1ファイル内で類似度計算・グループ化を同時に行うシナリオ数（プロセス数）、0はCPUコア数'
+             f'（デフォルト：{default_scenario_processes}、.envで設定可能）'
+    )
+    
+    parser.add_argument(
+        '--ai-threads',
+        type=int,
+        default=default_ai_threads,
+        help='1ファイル内でAI生成・テンプレート作成を同時に行うシナリオ数（スレッド数）'
+             f'（デフォルト：{default_ai_threads}、.envで設定可能）'
+    )
+    
+    parser.add_argument(
+        '--matrix-memmap',
+        choices=['float32', 'uint8'],
+        help='各シナリオの完全な類似度マトリックスをメモリマップファイル（.npy）とIF名インデックスとして'
+             'モジュールフォルダに出力（uint8は整数パーセント）。マトリックスExcelもこのファイルから行ブロックごとに作成'
+    )
+    
+    parser.add_argument(
+        '--catalog',
+        action='store_true',
+        help='全ファイル処理後、入力フォルダ内のすべてのIFを横断して閾値以上のファイル間・分類間の類似IFを'
+             'カタログ類似IF.xlsxに出力'
+    )
+    
+    if not merge_shards:
+        parser.add_argument(
+            '--shard',
+            help='分片計算モード（i/N、iは1～N）：各ファイルの類似度のi番目の分片のみを計算し、'
+                 '出力フォルダ/ファイル名/.shardsに保存（AI不使用）。全分片の完了後に merge-shards を実行'
+        )
+    
+    parser.add_argument(
+        '--sweep',
+        help='閾値スイープモード：カンマ区切りの閾値リスト（例：0.6,0.7,0.8）または all（すべての結合レベル）。'
+             'AIを使用せず、閾値ごとのグループ数・サイズを閾値スイープ結果.xlsxに出力。'
+             '出力フォルダに既存のグルーピング結果.xlsxがあればその分類（モジュール・業務内容）ごとに計算し、'
+             'なければファイル全体を1つのシナリオとして計算（各閾値のグループは通常処理の結果の上界）'
+    )
+    
+    args = parser.parse_args(argv)
     
     # 閾値範囲の検証
     if not 0.0 < args.threshold <= 1.0:
         print("エラー：類似度閾値は0.0から1.0の間でなければなりません")
-        sys.exit(1)
+        return 1
+    
+    if args.engine == 'minhash' and args.mode != 'avg':
+        print("エラー：minhashエンジンは --mode avg でのみ使用できます"
+              "（maxモードの重複係数ではJaccardベースのLSHの再現率が極端に低くなるため）")
+        return 1
     
-    # 创建CLI实例并运行（始终使用AI）
+    if args.workers < 0:
+        print("エラー：並列プロセス数は0以上でなければなりません")
+        return 1
+    
+    if args.jobs < 0:
+        print("エラー：ファイル並列処理数は0以上でなければなりません")
+        return 1
+    
+    if args.scenario_processes < 0 or args.ai_threads < 1:
+        print("エラー：シナリオ並列処理数はプロセス数が0以上、スレッド数が1以上でなければなりません")
+        return 1
+    
+    # 分片指定の解析
+    shard = None
+    if getattr(args, 'shard', None) is not None:
+        try:
+            shard = SimilarityShards.parse(args.shard)
+        except ValueError:
+            print("エラー：分片指定は i/N（iは1からNの整数）の形式でなければなりません")
+            return 1
+    if (shard is not None and args.catalog) or ((shard is not None or merge_shards) and args.sweep is not None):
+        print("エラー：--shard は --sweep、--catalog と、merge-shards は --sweep と同時に指定できません")
+        return 1
+    
+    # 閾値スイープの閾値リストの解析
+    sweep = None
+    if args.sweep is not None:
+        if args.sweep.strip().lower() == 'all':
+            sweep = 'all'
+        else:
+            try:
+                sweep = [float(value) for value in args.sweep.split(',') if value.strip()]
+            except ValueError:
+                sweep = []
+            if not sweep or not all(0.0 < value <= 1.0 for value in sweep):
+                print("エラー：スイープ閾値は all または0.0から1.0の間の値のカンマ区切りリストでなければなりません")
+                return 1
+    
+    # 创建CLI实例并运行（阈值扫描模式以外始终使用AI）
     cli = EBSMergerCLI(
         input_dir=args.input_dir,
         output_dir=args.output_dir,
         threshold=args.threshold,
      # 2026/02/18 田 追加 
-        mode=args.mode
+        mode=args.mode,
+        engine=args.engine,
+        lsh_bands=args.lsh_bands,
+        lsh_rows=args.lsh_rows,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        reader=args.reader,
+        jobs=args.jobs,
+        scenario_processes=args.scenario_processes,
+        ai_threads=args.ai_threads,
+        sweep=sweep,
+        catalog=args.catalog,
+        matrix_memmap=args.matrix_memmap,
+        shard=shard,
+        merge_shards=merge_shards
+    )
+    
+    return cli.run()
+
+
+def build_index_main(argv) -> int:
+    """build-indexサブコマンド：入力ファイルから類似度インデックスを作成して保存"""
+    from ebs_merger.similarity_index import SimilarityIndex
+    
+    parser = argparse.ArgumentParser(
+        prog='python -m ebs_merger build-index',
+        description='入力ファイルのすべてのIFから類似度インデックスを作成します（AI不使用）'
+    )
+    parser.add_argument(
+        'files', nargs='*',
+        help='インデックスに登録する入力ファイル（省略時は入力フォルダ内のすべての入力ファイル）'
+    )
+    parser.add_argument(
+        '--input-dir', '-i',
+        default=os.getenv('INPUT_DIR', 'input'),
+        help='入力フォルダパス（ファイル省略時に使用）'
+    )
+    parser.add_argument(
+        '--index-dir',
+        default=os.getenv('INDEX_DIR', 'index'),
+        help='類似度インデックスの保存先フォルダ（デフォルト：index、.envで設定可能）'
+    )
+    parser.add_argument(
+        '--reader',
+        default=os.getenv('EXCEL_READER', 'openpyxl'),
+        choices=['auto'] + sorted(DataLoader.READERS),
+        help='Excel読み込み方式'
+    )
+    args = parser.parse_args(argv)
+    
+    input_files = args.files or find_input_files(args.input_dir)
+    if not input_files:
+        print(f"エラー：'{args.input_dir}' フォルダに入力ファイル（{', '.join(DataLoader.supported_suffixes())}）が見つかりません")
+        return 1
+    
+    print(f"{len(input_files)} 個の入力ファイルから類似度インデックスを作成しています...")
+    start = time.perf_counter()
+    try:
+        index = SimilarityIndex.build(
+            [str(input_file) for input_file in input_files], args.index_dir,
+            DataLoader(reader=args.reader)
+        )
+    except Exception as e:
+        print(f"エラー：類似度インデックスの作成に失敗しました：{str(e)}")
+        return 1
+    print(f"✓ {len(index)} 個のIF、{len(index.fields)} 個の項目で類似度インデックスを作成しました"
+          f"（{time.perf_counter() - start:.1f}秒）：{args.index_dir}")
+    return 0
+
+
+def query_main(argv) -> int:
+    """queryサブコマンド：新しいIFに類似する既存IFの上位k件を検索"""
+    from ebs_merger.if_grouper import IFGrouper
+    from ebs_merger.similarity_index import SimilarityIndex
+    
+    parser = argparse.ArgumentParser(
+        prog='python -m ebs_merger query',
+        description='類似度インデックスから、入力ファイル内の各IFに類似する既存IFを検索します（AI不使用）'
+    )
+    parser.add_argument('spec', help='検索するIFを含む入力ファイル（入力ファイルと同じ形式）')
+    parser.add_argument(
+        '--index-dir',
+        default=os.getenv('INDEX_DIR', 'index'),
+        help='類似度インデックスフォルダ（デフォルト：index、.envで設定可能）'
+    )
+    parser.add_argument('--top', '-k', type=int, default=10, help='表示する類似IFの件数（デフォルト：10）')
+    parser.add_argument(
+        '--mode', '-m',
+        default=os.getenv('SIMILARITY_MODE', 'max'),
+        choices=['max', 'avg'],
+        help='類似度算出モード（.envで設定可能）'
     )
+    parser.add_argument(
+        '--reader',
+        default=os.getenv('EXCEL_READER', 'openpyxl'),
+        choices=['auto'] + sorted(DataLoader.READERS),
+        help='Excel読み込み方式'
+    )
+    parser.add_argument('--output', help='検索結果を保存するExcelファイルパス（省略時は表示のみ）')
+    args = parser.parse_args(argv)
+    
+    if args.top < 1:
+        print("エラー：検索件数は1以上でなければなりません")
+        return 1
+    
+    try:
+        start = time.perf_counter()
+        index = SimilarityIndex(args.index_dir)
+        print(f"類似度インデックスを読み込みました：{len(index)} 個のIF（{(time.perf_counter() - start) * 1000:.0f}ミリ秒）")
+        
+        grouper = IFGrouper()
+        if_dict = grouper.group_by_if(DataLoader(reader=args.reader).load_file(args.spec))
+    except Exception as e:
+        print(f"エラー：類似度検索に失敗しました：{str(e)}")
+        return 1
+    
+    rows = []
+    for if_name, if_info in if_dict.items():
+        start = time.perf_counter()
+        results = index.query_if(if_info, grouper, args.top, args.mode)
+        elapsed = (time.perf_counter() - start) * 1000
+        print()
+        print(f"「{if_name}」（{if_info.item_count} 項目）に類似するIF（{elapsed:.1f}ミリ秒）：")
+        if not results:
+            print("  共通する項目を持つIFはありません")
+        for rank, result in enumerate(results, 1):
+            print(f"  {rank:>3}. {result['IF名']}（{result['入力ファイル']}）"
+                  f" 類似度{result['類似度']:.1%}、共通項目数 {result['共通項目数']}")
+            rows.append(dict({'検索IF名': if_name, '順位': rank}, **result))
     
-    exit_code = cli.run()
-    sys.exit(exit_code)
+    if args.output:
+        import pandas as pd
+        columns = ['検索IF名', '順位', 'IF名', '入力ファイル', '文書管理番号', '類似度', '共通項目数']
+        pd.DataFrame(rows, columns=columns).to_excel(args.output, index=False, engine='openpyxl')
+        print(f"\n✓ 検索結果を保存しました：{args.output}")
+    return 0
+
+
+def merge_shards_main(argv) -> int:
+    """merge-shardsサブコマンド：分片計算の結果を結合し、通常と同じ処理（AI分類・グルーピング・出力）を実行
+
+    オプションは通常の実行と同じ（--shardを除く）
+    """
+    return main(argv, merge_shards=True)
+
+
+SUBCOMMANDS = {
+    'build-index': build_index_main,
+    'query': query_main,
+    'merge-shards': merge_shards_main,
+}
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
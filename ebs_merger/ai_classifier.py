@@ -4,9 +4,10 @@
 """
 
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from ebs_merger.ai_generator import AIGenerator
+from ebs_merger.data_loader import IFRowIndex
 from ebs_merger.if_grouper import IFInfo
 
 
@@ -24,22 +25,27 @@ class AIClassifier:
     def classify_interfaces(
         self,
         if_dict: Dict[str, IFInfo],
-        input_df: pd.DataFrame
+        input_df: pd.DataFrame,
+        row_index: Optional[IFRowIndex] = None
     ) -> Dict[str, Tuple[str, str, List[str]]]:
         """使用AI对IF进行分类
         
         参数:
             if_dict: IF信息字典
             input_df: 输入数据DataFrame
+            row_index: input_df的IF行索引（省略时在此建立）
             
         返回:
             分类结果字典: {category_name: (module, scenario, [if_names])}
             其中module是SAP模块（如FI、SD），scenario是业务场景
         """
+        if row_index is None:
+            row_index = IFRowIndex(input_df)
+        
         # 准备所有IF的信息
         if_info_list = []
         for if_name, if_info in if_dict.items():
-            if_data = input_df[input_df['IF名'] == if_name]
+            if_data = row_index.rows(if_name)
             tables = if_data['EBSテーブル名'].unique().tolist()
             items = if_data['項目名'].tolist()
             
@@ -162,7 +168,8 @@ classify_interfacesツールを使用して分類結果を返してください
         self,
         input_df: pd.DataFrame,
         categories: Dict[str, Tuple[str, str, List[str]]],
-        output_dir: str = "output"
+        output_dir: str = "output",
+        row_index: Optional[IFRowIndex] = None
     ) -> Dict[str, Tuple[Path, str, str]]:
         """保存分类后的数据到不同文件
         
@@ -170,17 +177,20 @@ classify_interfacesツールを使用して分類結果を返してください
             input_df: 输入数据DataFrame
             categories: 分类结果字典 {category_name: (module, scenario, if_names)}
             output_dir: 输出目录（直接在output下创建分类文件夹）
+            row_index: input_df的IF行索引（省略时在此建立）
             
         返回:
             文件路径字典: {category_name: (file_path, module, scenario)}
         """
         output_path = Path(output_dir)
+        if row_index is None:
+            row_index = IFRowIndex(input_df)
         
         file_paths = {}
         
         for category_name, (module, scenario, if_names) in categories.items():
             # 筛选属于该分类的数据
-            category_df = input_df[input_df['IF名'].isin(if_names)]
+            category_df = row_index.rows_of(if_names)
             
             if len(category_df) > 0:
                 # 生成文件名（替换特殊字符）
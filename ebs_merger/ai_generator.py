@@ -8,8 +8,9 @@ import os
 import requests
 import pandas as pd
 import json
-from typing import Dict, List
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from ebs_merger.data_loader import IFRowIndex
 from ebs_merger.if_grouper import IFInfo
 
 # 加载.env文件
@@ -233,21 +234,26 @@ class AIGenerator:
     def generate_all_if_info(
         self,
         if_dict: Dict[str, IFInfo],
-        input_df: pd.DataFrame
+        input_df: pd.DataFrame,
+        row_index: Optional[IFRowIndex] = None
     ) -> Dict[str, Dict[str, str]]:
         """すべてのIFの情報を一括生成（概要、代表項目名）
         
         パラメータ:
             if_dict: IF情報辞書
             input_df: 入力データDataFrame
+            row_index: input_dfのIF行インデックス（省略時はここで作成）
             
         戻り値:
             辞書形式: {if_name: {'summary': '...', 'representative_item': '...'}}
         """
+        if row_index is None:
+            row_index = IFRowIndex(input_df)
+        
         # すべてのIFの情報を準備
         if_info_list = []
         for if_name, if_info in if_dict.items():
-            if_data = input_df[input_df['IF名'] == if_name]
+            if_data = row_index.rows(if_name)
             tables = if_data['EBSテーブル名'].unique().tolist()
             items = if_data['項目名'].tolist()
             
@@ -375,7 +381,8 @@ generate_all_if_infoツールを呼び出して、すべてのインターフェ
         self,
         group_members: List[str],
         if_dict: Dict[str, IFInfo],
-        input_df: pd.DataFrame
+        input_df: pd.DataFrame,
+        row_index: Optional[IFRowIndex] = None
     ) -> str:
         """グルーピング後のIF名を生成
         
@@ -383,6 +390,7 @@ generate_all_if_infoツールを呼び出して、すべてのインターフェ
             group_members: グループ内のIF名リスト
             if_dict: IF情報辞書
             input_df: 入力データDataFrame
+            row_index: input_dfのIF行インデックス（省略時はここで作成）
             
         戻り値:
             マージ後のIF名
@@ -390,10 +398,13 @@ generate_all_if_infoツールを呼び出して、すべてのインターフェ
         if len(group_members) == 1:
             return group_members[0]
         
+        if row_index is None:
+            row_index = IFRowIndex(input_df)
+        
         # すべてのIFの情報を収集
         if_info_list = []
         for if_name in group_members:
-            if_data = input_df[input_df['IF名'] == if_name]
+            if_data = row_index.rows(if_name)
             tables = if_data['EBSテーブル名'].unique().tolist()
             if_info_list.append(f"- {if_name}（関連テーブル：{', '.join(tables[:3])}）")
         
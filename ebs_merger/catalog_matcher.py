@@ -0,0 +1,123 @@
+"""目录相似度模块
+
+对所有输入文件的所有IF建立一个共用的字段对词表，一次计算整个目录中的相似IF对，
+找出跨文件或跨分类（AI分类的模块・业务场景）的重复IF。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ebs_merger.if_grouper import IFGrouper, IFInfo
+from ebs_merger.similarity_calculator import SimilarityCalculator
+
+
+class CatalogMatcher:
+    """跨文件、跨分类的相似IF检测
+
+    所有文件的IF共用一个词表，合并为一个场景交给SimilarityCalculator计算，
+    倒排索引等引擎只比较至少共享一个字段对的IF对，不会两两比较整个目录。
+    同一文件、同一分类内的IF对已在通常处理中比较，不包含在结果中。
+    没有分类信息的IF（グルーピング結果文件中没有的IF）无法判断是否已比较，
+    与同一文件中其他IF的相似对作为「未分類」报告。
+    """
+
+    # カタログ類似IFファイルの列
+    REPORT_COLUMNS = [
+        'No.', '類似度', '区分', '共通項目数',
+        'ファイル1', 'IF名1', 'モジュール1', '業務内容1', '項目数1',
+        'ファイル2', 'IF名2', 'モジュール2', '業務内容2', '項目数2'
+    ]
+
+    def __init__(self, calculator: Optional[SimilarityCalculator] = None):
+        """初始化
+
+        参数:
+            calculator: 相似度计算器（省略时使用index引擎）
+        """
+        self.calculator = calculator or SimilarityCalculator()
+        self.grouper = IFGrouper()
+        # 目录中的IF：(文件名, IF名, 模块, 业务场景)，序号为if_dict的键
+        self.entries: List[Tuple[str, str, str, str]] = []
+        # 各IF是否有分类信息（与entries顺序相同）
+        self.categorized: List[bool] = []
+        self.if_dict: Dict[str, IFInfo] = {}
+        # 最近一次cross_pairs中自动选择引擎的结果（未自动选择时为None）
+        self.plan = None
+
+    def __len__(self) -> int:
+        """目录中的IF数"""
+        return len(self.entries)
+
+    def add_file(
+        self,
+        file_name: str,
+        df: pd.DataFrame,
+        categories: Optional[Dict[str, Tuple[str, str]]] = None
+    ):
+        """将一个输入文件的所有IF加入目录
+
+        参数:
+            file_name: 输入文件名（用于报告）
+            df: 该文件的数据
+            categories: {IF名: (模块, 业务场景)}（没有分类信息时省略，所有IF视为未分类）
+        """
+        categories = categories or {}
+        for if_name, if_info in self.grouper.group_by_if(df).items():
+            category = categories.get(if_name)
+            module, scenario = category if category is not None else ("", "")
+            self.if_dict[str(len(self.entries))] = if_info
+            self.entries.append((file_name, if_name, module, scenario))
+            self.categorized.append(category is not None)
+
+    def cross_pairs(self, threshold: float, mode: str = "max") -> List[Dict]:
+        """返回相似度>=threshold的跨文件、跨分类IF对
+
+        参数:
+            threshold: 相似度阈值
+            mode: 相似度算出方法（max或avg）
+
+        返回:
+            报告行的字典列表（按相似度降序），区分为「ファイル間」「分類間」或
+            「未分類」（同一文件中至少一方没有分类信息）
+        """
+        similarity = self.calculator.compute(self.if_dict, mode, threshold)
+        self.plan = similarity.plan
+
+        rows = []
+        for key1, key2, score in similarity.similar_pairs(threshold):
+            file1, if_name1, module1, scenario1 = self.entries[int(key1)]
+            file2, if_name2, module2, scenario2 = self.entries[int(key2)]
+            if file1 != file2:
+                kind = "ファイル間"
+            elif not (self.categorized[int(key1)] and self.categorized[int(key2)]):
+                kind = "未分類"
+            elif (module1, scenario1) != (module2, scenario2):
+                kind = "分類間"
+            else:
+                continue
+            info1, info2 = self.if_dict[key1], self.if_dict[key2]
+            rows.append({
+                '類似度': score,
+                '区分': kind,
+                '共通項目数': len(info1.field_pairs & info2.field_pairs),
+                'ファイル1': file1, 'IF名1': if_name1, 'モジュール1': module1,
+                '業務内容1': scenario1, '項目数1': info1.item_count,
+                'ファイル2': file2, 'IF名2': if_name2, 'モジュール2': module2,
+                '業務内容2': scenario2, '項目数2': info2.item_count,
+            })
+
+        rows.sort(key=lambda row: -row['類似度'])
+        for idx, row in enumerate(rows, 1):
+            row['No.'] = idx
+        return rows
+
+    def write_report(self, rows: List[Dict], output_path: str):
+        """写入カタログ類似IF文件
+
+        参数:
+            rows: cross_pairs返回的报告行
+            output_path: 输出文件路径
+        """
+        df = pd.DataFrame(rows, columns=self.REPORT_COLUMNS)
+        df.to_excel(output_path, index=False, engine='openpyxl')
@@ -3,26 +3,121 @@
 协调所有组件执行完整的分析和合并流程。
 """
 
+import contextlib
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from ebs_merger.data_loader import DataLoader
+from ebs_merger.data_loader import DataLoader, IFRowIndex
 from ebs_merger.if_grouper import IFGrouper
+from ebs_merger.input_cache import InputCache
 from ebs_merger.similarity_calculator import SimilarityCalculator
+from ebs_merger.similarity_shards import SimilarityShards
+from ebs_merger.similarity_store import SimilarityStore
 from ebs_merger.merge_grouper import MergeGrouper
 from ebs_merger.result_generator import ResultGenerator
 from ebs_merger.template_filler import TemplateFiller
 from ebs_merger.matrix_exporter import MatrixExporter
+from ebs_merger.threshold_sweep import ThresholdSweep
+
+
+def find_input_files(input_dir) -> list:
+    """查找输入文件夹中的所有输入文件
+    
+    参数:
+        input_dir: 输入文件夹路径
+        
+    返回:
+        输入文件路径列表（.xlsx、.csv、.tsv、.parquet，排除以~$开头的临时文件）
+    """
+    input_dir = Path(input_dir)
+    if not input_dir.exists():
+        return []
+    
+    input_files = []
+    # 支持.xlsx、.csv、.tsv、.parquet
+    for suffix in DataLoader.supported_suffixes():
+        input_files.extend(input_dir.glob(f"*{suffix}"))
+    
+    # 排除临时文件（以~$开头）
+    input_files = [f for f in input_files if not f.name.startswith('~$')]
+    
+    return sorted(input_files)
+
+
+def _process_file_in_worker(options: dict, input_file: str, output_dir: str) -> dict:
+    """在子进程中处理单个输入文件
+    
+    处理过程的输出写入该文件输出文件夹中的処理ログ.txt，避免多个进程的输出混在一起。
+    
+    参数:
+        options: EBSMergerCLI的初始化参数
+        input_file: 输入文件路径
+        output_dir: 该文件的输出文件夹路径
+        
+    返回:
+        该文件的处理摘要（与_process_file_with_summary相同）
+    """
+    file_output_dir = Path(output_dir)
+    file_output_dir.mkdir(parents=True, exist_ok=True)
+    with open(file_output_dir / "処理ログ.txt", 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        cli = EBSMergerCLI(**options)
+        return cli._process_file_with_summary(Path(input_file), file_output_dir)
+
+
+def _compute_scenario_groups(calculator_options: dict, mode: str, threshold: float, if_dict: dict,
+                             store: SimilarityStore = None, fingerprints: dict = None):
+    """在子进程中计算一个场景的相似度和分组
+    
+    参数:
+        calculator_options: SimilarityCalculator的初始化参数
+        mode: 相似度算出方法
+        threshold: 相似度阈值
+        if_dict: 该场景的IF信息字典
+        store: 该场景的增量相似度存储（None为全部重新计算）
+        fingerprints: 各IF字段对集合的指纹（使用store时必需）
+        
+    返回:
+        (SimilarityResult, groups)
+    """
+    similarity = SimilarityCalculator(**calculator_options).compute(
+        if_dict, mode, store=store, fingerprints=fingerprints
+    )
+    groups = MergeGrouper().group_by_result(if_dict, similarity, threshold)
+    return similarity, groups
 
 
 class EBSMergerCLI:
     """EBS合并工具命令行接口"""
     
+    # バッチ処理結果ファイルの列
+    BATCH_SUMMARY_COLUMNS = [
+        'No.', 'ファイル名', '結果', '行数', 'IF数', '分類数', 'グループ数',
+        'マージ対象IF数', '処理時間（秒）', '出力フォルダ', 'エラー'
+    ]
+    
     def __init__(
         self,
         input_dir: str = "input",
         output_dir: str = "output",
         threshold: float = 0.8,
-        mode: str = "max"
+        mode: str = "max",
+        engine: str = "auto",
+        lsh_bands: int = 32,
+        lsh_rows: int = 4,
+        workers: int = 1,
+        cache_dir: str = None,
+        use_cache: bool = True,
+        reader: str = "openpyxl",
+        jobs: int = 1,
+        scenario_processes: int = 1,
+        ai_threads: int = 1,
+        sweep=None,
+        catalog: bool = False,
+        matrix_memmap: str = None,
+        shard: tuple = None,
+        merge_shards: bool = False
     ):
         """初始化CLI配置
         
@@ -31,25 +126,71 @@ class EBSMergerCLI:
             output_dir: 输出文件夹路径
             threshold: 相似度阈值（默认0.8）
             mode: 相似度算出方法
+            engine: 相似度计算引擎（brute、index、sparse、prefix、minhash、bitset，或auto：按场景自动选择）
+            lsh_bands: minhash引擎的band数
+            lsh_rows: minhash引擎每个band的行数
+            workers: 相似度计算的进程数（0为CPU核数）
+            cache_dir: 输入缓存文件夹路径（默认为输出文件夹下的.cache）
+            use_cache: 是否使用输入缓存
+            reader: Excel读取器（auto、openpyxl或calamine）
+            jobs: 同时处理的输入文件数（进程数，0为CPU核数）
+            scenario_processes: 同时计算相似度和分组的场景数（进程数，0为CPU核数）
+            ai_threads: 同时进行AI生成和模板填充的场景数（线程数）
+            sweep: 阈值扫描模式（None为通常处理，"all"为所有合并阈值，或阈值列表）。
+                扫描模式不调用AI，只输出各阈值的分组统计
+            catalog: 是否在所有文件处理后检测跨文件、跨分类的相似IF
+            matrix_memmap: 相似度矩阵的内存映射输出（None为不输出，float32或uint8）。
+                指定时矩阵Excel也从该文件按行块读取
+            shard: 分片计算模式 (i, N)：只计算各文件相似度的第i个分片并写入输出文件夹（不调用AI）
+            merge_shards: 是否使用已写入的所有分片结果代替相似度计算（其余处理与通常相同）
         """
+        # 子进程使用相同的配置（jobs除外）
+        self.options = dict(
+            input_dir=input_dir, output_dir=output_dir, threshold=threshold, mode=mode,
+            engine=engine, lsh_bands=lsh_bands, lsh_rows=lsh_rows, workers=workers,
+            cache_dir=cache_dir, use_cache=use_cache, reader=reader,
+            scenario_processes=scenario_processes, ai_threads=ai_threads, sweep=sweep,
+            catalog=catalog, matrix_memmap=matrix_memmap, shard=shard, merge_shards=merge_shards
+        )
+        self.jobs = jobs or os.cpu_count() or 1
+        self.scenario_processes = scenario_processes or os.cpu_count() or 1
+        self.ai_threads = max(ai_threads, 1)
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.threshold = threshold
         # 2026/02/18 田 追加          
         self.mode = mode
+        self.engine = engine
+        self.sweep = sweep
+        self.catalog = catalog
+        self.matrix_memmap = matrix_memmap
+        self.shard = shard
+        self.merge_shards = merge_shards
+        self.cache = None
+        if use_cache:
+            self.cache = InputCache(cache_dir or str(self.output_dir / ".cache"))
+        # 增量相似度存储（缓存文件夹内所有输入文件共用一个；近似引擎的结果不保存）
+        self.store_path = None
+        if self.cache is not None and engine not in SimilarityCalculator.APPROXIMATE_ENGINES:
+            self.store_path = self.cache.cache_dir / "similarity.npz"
         
-        # 初始化组件（始终使用AI）
-        self.loader = DataLoader()
+        # 初始化组件（阈值扫描模式和分片计算模式以外始终使用AI）
+        use_ai = sweep is None and shard is None
+        self.loader = DataLoader(cache=self.cache, reader=reader)
         self.grouper = IFGrouper()
-        self.calculator = SimilarityCalculator()
+        self.calculator = SimilarityCalculator(
+            engine=engine, lsh_bands=lsh_bands, lsh_rows=lsh_rows, workers=workers
+        )
         self.merge_grouper = MergeGrouper()
-        self.result_generator = ResultGenerator(use_ai=True)
+        self.result_generator = ResultGenerator(use_ai=use_ai)
         self.template_filler = TemplateFiller()
         self.matrix_exporter = MatrixExporter()
         
-        # 初始化AI分类器
-        from ebs_merger.ai_classifier import AIClassifier
-        self.classifier = AIClassifier()
+        # 初始化AI分类器（阈值扫描模式和分片计算模式不连接AI）
+        self.classifier = None
+        if use_ai:
+            from ebs_merger.ai_classifier import AIClassifier
+            self.classifier = AIClassifier()
     
     def run(self):
         """执行完整的分析和合并流程"""
@@ -59,45 +200,90 @@ class EBSMergerCLI:
             
             # 起動情報の表示
             print("=" * 60)
-            print("EBS設計書の一括分析を開始します（AI使用）...")
+            if self.shard is not None:
+                print(f"EBS設計書の類似度分片計算を開始します（分片 {self.shard[0]}/{self.shard[1]}、AI不使用）...")
+            elif self.sweep is None:
+                print("EBS設計書の一括分析を開始します（AI使用）...")
+            else:
+                print("EBS設計書の閾値スイープを開始します（AI不使用）...")
             print("=" * 60)
             print(f"入力フォルダ：{self.input_dir}")
             print(f"出力フォルダ：{self.output_dir}")
-            print(f"類似度閾値：{self.threshold * 100:.0f}%")
+            if self.sweep is None:
+                print(f"類似度閾値：{self.threshold * 100:.0f}%")
+            elif self.sweep == "all":
+                print("スイープ閾値：すべての結合レベル")
+            else:
+                print(f"スイープ閾値：{', '.join(f'{t * 100:g}%' for t in sorted(self.sweep, reverse=True))}")
             print(f"類似度計算モード：{self.mode}")
+            if self.engine == SimilarityCalculator.AUTO_ENGINE:
+                print(f"類似度計算エンジン：{self.engine}（シナリオごとに規模・密度から自動選択）")
+            else:
+                print(f"類似度計算エンジン：{self.engine}")
+            if self.calculator.workers > 1:
+                print(f"類似度計算プロセス数：{self.calculator.workers}")
+            if self.calculator.is_approximate:
+                print("注意：近似エンジンのため、一部の類似IFペアが検出されない場合があります")
+            print(f"Excel読み込み：{self.loader.reader.name}")
+            if self.cache is not None:
+                print(f"入力キャッシュ：{self.cache.cache_dir}")
+            if self.store_path is not None and self.sweep is None:
+                print(f"類似度ストア：{self.store_path}")
+            if self.jobs > 1:
+                print(f"ファイル並列処理数：{self.jobs}")
+            if self.scenario_processes > 1:
+                print(f"シナリオ並列処理数（類似度計算）：{self.scenario_processes}")
+            if self.ai_threads > 1:
+                print(f"シナリオ並列処理数（AI生成・テンプレート作成）：{self.ai_threads}")
+            if self.catalog:
+                print("カタログ横断検出：有効（ファイル間・分類間の類似IF）")
+            if self.merge_shards:
+                print("類似度：分片計算の結果を結合して使用")
             print()
             
-            # 查找所有Excel文件
-            excel_files = self.find_excel_files()
+            # 查找所有输入文件
+            input_files = self.find_input_files()
             
-            if not excel_files:
-                print(f"エラー：'{self.input_dir}' フォルダにExcelファイルが見つかりません")
-                print("Excelファイルをinputフォルダに配置してから再試行してください")
+            if not input_files:
+                print(f"エラー：'{self.input_dir}' フォルダに入力ファイル（{', '.join(DataLoader.supported_suffixes())}）が見つかりません")
+                print("入力ファイルをinputフォルダに配置してから再試行してください")
                 return 1
             
-            print(f"{len(excel_files)} 個のExcelファイルを発見しました")
+            print(f"{len(input_files)} 個の入力ファイルを発見しました")
             print()
             
+            # 每个文件输出到各自的文件夹
+            output_dirs = self.file_output_dirs(input_files)
+            
             # 处理每个文件
-            success_count = 0
-            fail_count = 0
+            if self.jobs > 1 and len(input_files) > 1:
+                summaries = self._run_parallel(input_files, output_dirs)
+            else:
+                summaries = []
+                for idx, input_file in enumerate(input_files, 1):
+                    print(f"[{idx}/{len(input_files)}] ファイル処理中: {input_file.name}")
+                    print("-" * 60)
+                    
+                    summary = self._process_file_with_summary(input_file, output_dirs[input_file])
+                    if summary['結果'] == "成功":
+                        print("✓ 処理成功")
+                    else:
+                        print(f"✗ 処理失敗: {summary['エラー']}")
+                    summaries.append(summary)
+                    
+                    print()
             
-            for idx, input_file in enumerate(excel_files, 1):
-                print(f"[{idx}/{len(excel_files)}] ファイル処理中: {input_file.name}")
-                print("-" * 60)
-                
-                try:
-                    self.process_single_file(input_file)
-                    success_count += 1
-                    print("✓ 処理成功")
-                except Exception as e:
-                    fail_count += 1
-                    print(f"✗ 処理失敗: {e}")
-                
-                print()
+            # 全ファイル横断の類似IF検出
+            if self.catalog:
+                self.process_catalog(input_files, output_dirs)
+            
+            success_count = sum(1 for summary in summaries if summary['結果'] == "成功")
+            fail_count = len(summaries) - success_count
             
-            # 打印总体摘要
-            self.print_batch_summary(success_count, fail_count, len(excel_files))
+            # 输出バッチ処理結果文件并打印总体摘要（分片计算时由merge-shards输出）
+            if self.shard is None:
+                self._write_batch_summary(summaries, self.output_dir / "バッチ処理結果.xlsx")
+            self.print_batch_summary(success_count, fail_count, len(input_files))
             
             return 0 if fail_count == 0 else 1
             
@@ -105,69 +291,351 @@ class EBSMergerCLI:
             print(f"\nエラー：処理中に予期しないエラーが発生しました：{str(e)}")
             return 1
     
-    def find_excel_files(self):
-        """查找输入文件夹中的所有Excel文件
+    def find_input_files(self):
+        """查找输入文件夹中的所有输入文件
         
         返回:
-            Excel文件路径列表
+            输入文件路径列表（.xlsx、.csv、.tsv、.parquet）
         """
-        if not self.input_dir.exists():
-            return []
+        return find_input_files(self.input_dir)
+    
+    def file_output_dirs(self, input_files):
+        """为每个输入文件分配输出文件夹（输出文件夹/文件名）
+        
+        文件名（不含扩展名）重复时（如book.xlsx和book.csv）在文件夹名后加上扩展名。
         
-        excel_files = []
-        # 支持.xlsx
-        for pattern in ['*.xlsx']:
-            excel_files.extend(self.input_dir.glob(pattern))
+        参数:
+            input_files: 输入文件路径列表
+            
+        返回:
+            {输入文件路径: 输出文件夹路径}
+        """
+        from collections import Counter
+        stem_counts = Counter(input_file.stem for input_file in input_files)
+        output_dirs = {}
+        for input_file in input_files:
+            name = input_file.stem
+            if stem_counts[name] > 1:
+                name = f"{name}_{input_file.suffix.lstrip('.')}"
+            output_dirs[input_file] = self.output_dir / name
+        return output_dirs
+    
+    def _run_parallel(self, input_files, output_dirs):
+        """用进程池同时处理多个输入文件
         
-        # 排除临时文件（以~$开头）
-        excel_files = [f for f in excel_files if not f.name.startswith('~$')]
+        参数:
+            input_files: 输入文件路径列表
+            output_dirs: {输入文件路径: 输出文件夹路径}
+            
+        返回:
+            按输入文件顺序排列的处理摘要列表
+        """
+        summaries = {}
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(input_files))) as executor:
+            futures = {
+                executor.submit(
+                    _process_file_in_worker, self.options, str(input_file), str(output_dirs[input_file])
+                ): input_file
+                for input_file in input_files
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                input_file = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    summary = self._failed_summary(input_file, output_dirs[input_file], e)
+                summaries[input_file] = summary
+                
+                if summary['結果'] == "成功":
+                    print(f"[{done}/{len(input_files)}] ✓ 処理成功: {input_file.name}（{summary['処理時間（秒）']}秒）")
+                else:
+                    print(f"[{done}/{len(input_files)}] ✗ 処理失敗: {input_file.name}: {summary['エラー']}")
+        print()
+        return [summaries[input_file] for input_file in input_files]
+    
+    def _process_file_with_summary(self, input_file: Path, output_dir: Path) -> dict:
+        """处理单个输入文件，并返回处理摘要（失败时不抛出异常）
         
-        return sorted(excel_files)
+        参数:
+            input_file: 输入文件路径
+            output_dir: 该文件的输出文件夹路径
+            
+        返回:
+            处理摘要（キー为バッチ処理結果文件的列名）
+        """
+        start = time.perf_counter()
+        summary = {'ファイル名': input_file.name, '結果': "成功", '出力フォルダ': str(output_dir), 'エラー': ""}
+        if self.shard is not None:
+            process = self.shard_single_file
+        elif self.sweep is not None:
+            process = self.sweep_single_file
+        else:
+            process = self.process_single_file
+        try:
+            summary.update(process(input_file, output_dir))
+        except Exception as e:
+            summary = self._failed_summary(input_file, output_dir, e)
+        summary['処理時間（秒）'] = round(time.perf_counter() - start, 1)
+        return summary
     
-    def process_single_file(self, input_file: Path):
-        """处理单个Excel文件
+    @staticmethod
+    def _failed_summary(input_file: Path, output_dir: Path, error: Exception) -> dict:
+        """处理失败的文件的摘要"""
+        return {'ファイル名': input_file.name, '結果': "失敗", '出力フォルダ': str(output_dir), 'エラー': str(error)}
+    
+    def process_single_file(self, input_file: Path, output_dir: Path = None) -> dict:
+        """处理单个输入文件
         
         参数:
             input_file: 输入文件路径
+            output_dir: 该文件的输出文件夹路径（默认为输出文件夹/文件名）
+            
+        返回:
+            处理统计 {'行数', 'IF数', '分類数', 'グループ数', 'マージ対象IF数'}
         """
-        # 1. Excelファイルの読み込み
-        print(f"  Excelファイルを読み込んでいます...")
-        df = self.loader.load_excel(str(input_file))
+        if output_dir is None:
+            output_dir = self.file_output_dirs([input_file])[input_file]
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 1. 入力ファイルの読み込み
+        print(f"  入力ファイルを読み込んでいます...")
+        df = self.loader.load_file(str(input_file))
         print(f"  {len(df)} 行のデータを正常に読み込みました")
         
+        # IFごとの行インデックス（分類・AI生成・テンプレート作成で共用）
+        row_index = IFRowIndex(df)
+        
         # 2. IFのグループ化
         print(f"  IFをグループ化しています...")
         if_dict = self.grouper.group_by_if(df)
         print(f"  {len(if_dict)} 個のIFを発見しました")
         
+        # 分片計算の結果を結合（merge-shards）
+        shard_pairs = None
+        if self.merge_shards:
+            print(f"  分片計算の結果を結合しています...")
+            shards = SimilarityShards(output_dir / ".shards")
+            file_if_names = list(if_dict.keys())
+            shard_pairs = (file_if_names,) + shards.merge(SimilarityShards.input_hash(str(input_file)), file_if_names)
+            print(f"  {len(shard_pairs[1])} 組の共通項目を持つIFペアを結合しました")
+        
         # 3. AIによる分類
         print(f"  AIで分類しています...")
-        categories = self.classifier.classify_interfaces(if_dict, df)
+        categories = self.classifier.classify_interfaces(if_dict, df, row_index)
         print(f"  ✓ 分類完了：{len(categories)}個の分類")
         
         # 按模块组织数据
         print(f"  モジュール別にデータを整理しています...")
-        module_data = self._organize_by_module(categories, if_dict, df)
+        module_data = self._organize_by_module(categories, if_dict, row_index)
         
-        # 收集所有行用于统一的グルーピング結果文件
-        all_output_rows = []
-        
-        # 各模块ごとに処理
+        # 各モジュールのマージ処理（收集所有行用于统一的グルーピング結果文件）
         print(f"  各モジュールのマージ処理を実行しています...")
-        for module_name, scenarios in module_data.items():
-            print(f"\n  モジュールを処理中：{module_name}")
-            module_rows = self.process_module(module_name, scenarios, df)
-            all_output_rows.extend(module_rows)
+        all_output_rows = self.process_modules(module_data, df, row_index, output_dir, shard_pairs)
         
         # 输出统一的グルーピング結果文件（不分模块）
         output_filename = "グルーピング結果.xlsx"
-        output_path = self.output_dir / output_filename
+        output_path = output_dir / output_filename
         self._write_unified_output(all_output_rows, output_path)
-        print(f"\n  ✓ グルーピング結果ファイルを保存しました：{output_filename}")
+        print(f"\n  ✓ グルーピング結果ファイルを保存しました：{output_path}")
+        
+        return {
+            '行数': len(df),
+            'IF数': len(if_dict),
+            '分類数': len(categories),
+            'グループ数': len({row['グルーピングID'] for row in all_output_rows}),
+            'マージ対象IF数': sum(1 for row in all_output_rows if row['マージ要否'] == "○"),
+        }
+    
+    def shard_single_file(self, input_file: Path, output_dir: Path = None) -> dict:
+        """计算单个输入文件相似度的一个分片并写入分片文件（不调用AI）
+        
+        分片文件写入输出文件夹/文件名/.shards，所有分片完成后用merge-shards合并。
+        
+        参数:
+            input_file: 输入文件路径
+            output_dir: 该文件的输出文件夹路径（默认为输出文件夹/文件名）
+            
+        返回:
+            处理统计 {'行数', 'IF数'}
+        """
+        if output_dir is None:
+            output_dir = self.file_output_dirs([input_file])[input_file]
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        index, count = self.shard
+        
+        # 1. 入力ファイルの読み込み
+        print(f"  入力ファイルを読み込んでいます...")
+        df = self.loader.load_file(str(input_file))
+        print(f"  {len(df)} 行のデータを正常に読み込みました")
+        
+        # 2. IFのグループ化
+        print(f"  IFをグループ化しています...")
+        if_dict = self.grouper.group_by_if(df)
+        print(f"  {len(if_dict)} 個のIFを発見しました")
+        
+        # 3. 分片の類似度計算（ファイル内の全IFが対象）
+        print(f"  分片 {index}/{count} の類似度を計算しています...")
+        rows, cols, common = SimilarityShards.compute(if_dict, index, count)
+        shards = SimilarityShards(output_dir / ".shards")
+        path = shards.write(
+            index, count, SimilarityShards.input_hash(str(input_file)), list(if_dict.keys()), rows, cols, common
+        )
+        print(f"  ✓ {len(rows)} 組のIFペアを分片ファイルに保存しました：{path}")
+        
+        return {'行数': len(df), 'IF数': len(if_dict)}
+    
+    def sweep_single_file(self, input_file: Path, output_dir: Path = None) -> dict:
+        """对单个输入文件执行阈值扫描（不调用AI）
+        
+        输出文件夹中已有グルーピング結果文件时，读取其中的分类（模块・业务场景），
+        按场景各计算一次相似度，各阈值的组与用同一分类执行通常处理的结果相同。
+        没有该文件时不进行分类，整个文件作为一个场景计算，
+        各阈值的组是通常处理结果的上界（更粗的分组）。
+        由最大生成森林得到各阈值的分组统计并输出閾値スイープ結果文件。
+        
+        参数:
+            input_file: 输入文件路径
+            output_dir: 该文件的输出文件夹路径（默认为输出文件夹/文件名）
+            
+        返回:
+            处理统计 {'行数', 'IF数'}（读取了分类时还有'分類数'）
+        """
+        if output_dir is None:
+            output_dir = self.file_output_dirs([input_file])[input_file]
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 1. 入力ファイルの読み込み
+        print(f"  入力ファイルを読み込んでいます...")
+        df = self.loader.load_file(str(input_file))
+        print(f"  {len(df)} 行のデータを正常に読み込みました")
+        
+        # 2. IFのグループ化
+        print(f"  IFをグループ化しています...")
+        if_dict = self.grouper.group_by_if(df)
+        print(f"  {len(if_dict)} 個のIFを発見しました")
+        
+        # 3. 分類の読み込み（既存のグルーピング結果ファイルがある場合）
+        categories = self._read_categories(output_dir / "グルーピング結果.xlsx")
+        scenarios = {None: if_dict}
+        if categories:
+            scenarios = {}
+            for if_name, if_info in if_dict.items():
+                category = categories.get(if_name, ThresholdSweep.UNCLASSIFIED)
+                scenarios.setdefault(category, {})[if_name] = if_info
+            print(f"  既存のグルーピング結果から {len(scenarios)} 個の分類を読み込みました")
+        else:
+            print(f"  グルーピング結果ファイルがないため、ファイル全体を1つのシナリオとして計算します")
+        
+        # 4. 類似度計算（閾値リスト指定時は最小閾値以上の対のみ）
+        print(f"  類似度を計算しています...")
+        thresholds = None if self.sweep == "all" else sorted(set(self.sweep), reverse=True)
+        sweeps = []
+        pair_count = 0
+        for category, scenario_if_dict in scenarios.items():
+            similarity = self.calculator.compute(
+                scenario_if_dict, self.mode, threshold=min(thresholds) if thresholds else None
+            )
+            if similarity.plan is not None and category is None:
+                print(f"  類似度計算エンジン（自動選択）：{similarity.plan.describe()}")
+            sweeps.append(ThresholdSweep(similarity, category))
+            pair_count += similarity.pair_count
+        sweep = ThresholdSweep.combine(sweeps) if categories else sweeps[0]
+        print(f"  {pair_count} 組のIFペア、{len(sweep.levels())} 個の結合レベル")
+        
+        # 5. 閾値ごとのグループ統計
+        print(f"\n  閾値ごとのグループ数：")
+        for row in sweep.summary(thresholds):
+            print(f"    閾値 {row['閾値'] * 100:g}%：グループ数 {row['グループ数']}、"
+                  f"マージ対象IF数 {row['マージ対象IF数']}、最大グループ {row['最大グループサイズ']}IF")
+        for note in sweep.notes():
+            print(f"  ※{note}")
+        
+        output_path = output_dir / "閾値スイープ結果.xlsx"
+        sweep.write_report(str(output_path), thresholds)
+        print(f"\n  ✓ 閾値スイープ結果ファイルを保存しました：{output_path}")
+        
+        stats = {'行数': len(df), 'IF数': len(if_dict)}
+        if categories:
+            stats['分類数'] = len(scenarios)
+        return stats
     
-    def _organize_by_module(self, categories, if_dict, df):
+    @staticmethod
+    def _read_categories(result_path: Path) -> dict:
+        """从グルーピング結果文件读取各IF的分类
+        
+        参数:
+            result_path: グルーピング結果文件路径
+            
+        返回:
+            {IF名: (モジュール, 業務内容)}，文件不存在时为空字典
+        """
+        import pandas as pd
+        
+        if not result_path.exists():
+            return {}
+        result_df = pd.read_excel(result_path, usecols=['IF名', 'モジュール', '業務内容'], dtype=str)
+        return {
+            if_name: (module, scenario)
+            for if_name, module, scenario in result_df.fillna("").itertuples(index=False)
+        }
+    
+    def process_catalog(self, input_files, output_dirs):
+        """检测所有输入文件中跨文件、跨分类的相似IF，输出カタログ類似IF文件
+        
+        所有文件的IF建立一个共用的字段对索引，一次计算超过阈值的IF对。
+        分类（模块・业务场景）从各文件的グルーピング結果文件读取（不再次调用AI）。
+        没有该文件时（处理失败、或只执行过--sweep），该文件的IF视为未分类，
+        同一文件内的相似对作为「未分類」输出。
+        
+        参数:
+            input_files: 输入文件路径列表
+            output_dirs: {输入文件路径: 输出文件夹路径}
+            
+        返回:
+            カタログ類似IF文件的路径（失败时为None）
+        """
+        from collections import Counter
+        from ebs_merger.catalog_matcher import CatalogMatcher
+        
+        print("=" * 60)
+        print("全ファイル横断で類似IFを検出しています...")
+        try:
+            matcher = CatalogMatcher(self.calculator)
+            for input_file in input_files:
+                categories = self._read_categories(output_dirs[input_file] / "グルーピング結果.xlsx")
+                if not categories:
+                    print(f"  警告：{input_file.name} のグルーピング結果がないため、同一ファイル内のIFペアは「未分類」として出力します")
+                matcher.add_file(input_file.name, self.loader.load_file(str(input_file)), categories)
+            
+            rows = matcher.cross_pairs(self.threshold, self.mode)
+            output_path = self.output_dir / "カタログ類似IF.xlsx"
+            matcher.write_report(rows, output_path)
+        except Exception as e:
+            print(f"警告：全ファイル横断の類似IF検出に失敗しました：{str(e)}")
+            print()
+            return None
+        
+        counts = Counter(row['区分'] for row in rows)
+        print(f"  {len(input_files)} 個のファイル、{len(matcher)} 個のIF")
+        if matcher.plan is not None:
+            print(f"  類似度計算エンジン（自動選択）：{matcher.plan.describe()}")
+        print(f"  ファイル間：{counts['ファイル間']} 組、分類間：{counts['分類間']} 組、"
+              f"未分類：{counts['未分類']} 組の類似IFを発見しました")
+        print(f"  ✓ カタログ類似IFファイルを保存しました：{output_path}")
+        print()
+        return output_path
+    
+    def _organize_by_module(self, categories, if_dict, row_index):
         """按模块组织分类数据
         
+        参数:
+            categories: 分类结果字典 {category_name: (module, scenario, if_names)}
+            if_dict: IF信息字典
+            row_index: 完整数据的IF行索引
+        
         返回:
             {module: {scenario: (category_name, if_dict, df)}}
         """
@@ -177,91 +645,248 @@ class EBSMergerCLI:
         for category_name, (module, scenario, if_names) in categories.items():
             # 筛选该分类的IF
             category_if_dict = {name: if_dict[name] for name in if_names if name in if_dict}
-            category_df = df[df['IF名'].isin(if_names)]
+            category_df = row_index.rows_of(if_names)
             
             module_data[module][scenario] = (category_name, category_if_dict, category_df)
         
         return module_data
     
-    def process_module(self, module_name: str, scenarios: dict, full_df):
+    def process_module(self, module_name: str, scenarios: dict, full_df, row_index=None,
+                       output_dir=None):
         """处理单个模块的所有场景
         
         参数:
             module_name: 模块名（如FI、SD）
             scenarios: {scenario: (category_name, if_dict, df)}
             full_df: 完整的数据DataFrame
+            row_index: full_df的IF行索引（省略时在此建立）
+            output_dir: 输出文件夹路径（默认为self.output_dir）
             
         返回:
             所有场景的输出行列表
         """
-        # 创建模块文件夹（将模块名中的特殊字符替换为下划线，避免路径问题）
-        safe_module_name = module_name.replace('/', '_').replace('\\', '_').replace(':', '_')
-        module_dir = self.output_dir / safe_module_name
-        module_dir.mkdir(parents=True, exist_ok=True)
+        return self.process_modules({module_name: scenarios}, full_df, row_index, output_dir)
+    
+    def process_modules(self, module_data: dict, full_df, row_index=None, output_dir=None,
+                        shard_pairs=None):
+        """处理所有模块的所有场景
+        
+        各场景之间除グルーピングID的连番外互不依赖，按以下步骤调度：
+        1. 相似度计算和分组（CPU密集）：scenario_processes > 1时用进程池并行
+        2. 按模块、场景顺序分配连番的グルーピングID（与串行处理的结果相同）
+        3. AI生成和模板填充（等待AI响应）：ai_threads > 1时用线程池并行
+        4. 按模块输出相似度矩阵
+        步骤1和3都从IF数多的场景开始处理。
+        
+        参数:
+            module_data: {module: {scenario: (category_name, if_dict, df)}}
+            full_df: 完整的数据DataFrame
+            row_index: full_df的IF行索引（省略时在此建立）
+            output_dir: 输出文件夹路径（默认为self.output_dir）
+            shard_pairs: 合并后的分片结果 (文件内IF名列表, rows, cols, common)，
+                指定时各场景的相似度从中提取，不再计算
+            
+        返回:
+            所有模块、场景的输出行列表（按模块、场景顺序）
+        """
+        if row_index is None:
+            row_index = IFRowIndex(full_df)
         
-        # 收集所有场景的数据
-        all_module_rows = []
-        module_matrix_data = {}
+        tasks = [
+            (module_name, scenario, category_name, if_dict, df)
+            for module_name, scenarios in module_data.items()
+            for scenario, (category_name, if_dict, df) in scenarios.items()
+        ]
+        # IF数多的场景先处理
+        schedule = sorted(range(len(tasks)), key=lambda k: -len(tasks[k][3]))
         
-        # モジュール全体でグルーピングIDを管理（連番）
-        module_group_id_counter = 1
+        # 1. 相似度计算和分组
+        if shard_pairs is not None:
+            # 从合并后的分片结果提取各场景的相似度
+            results = []
+            for _, _, _, if_dict, _ in tasks:
+                similarity = SimilarityShards.scenario_result(*shard_pairs, if_dict, self.mode)
+                results.append((similarity, self.merge_grouper.group_by_result(if_dict, similarity, self.threshold)))
+        else:
+            stores = self._scenario_stores(tasks)
+            results = self._compute_scenarios(tasks, schedule, stores)
         
-        for scenario, (category_name, if_dict, df) in scenarios.items():
+        # 2. モジュール全体で連番のグルーピングIDを割り当て
+        module_dirs = {}
+        group_id_counters = {}
+        assignments = []
+        for (module_name, scenario, category_name, if_dict, df), (similarity, groups) in zip(tasks, results):
+            if module_name not in module_dirs:
+                print(f"\n  モジュールを処理中：{module_name}")
+                # 创建模块文件夹（将模块名中的特殊字符替换为下划线，避免路径问题）
+                module_dirs[module_name] = Path(output_dir or self.output_dir) / self._safe_module_name(module_name)
+                module_dirs[module_name].mkdir(parents=True, exist_ok=True)
+                group_id_counters[module_name] = 1
+            
             print(f"    場景を処理中：{scenario}")
             print(f"      {len(if_dict)} 個のIF, {len(df)} 行のデータ")
+            if similarity.plan is not None:
+                print(f"      類似度計算エンジン（自動選択）：{similarity.plan.describe()}")
             
-            # 計算相似度（用于分组，只包含超过阈值的）
-            similar_pairs = self.calculator.build_similarity_matrix(if_dict, self.threshold, self.mode)
+            # 超过阈值的相似对（用于分组根据）
+            similar_pairs = similarity.similar_pairs(self.threshold)
             print(f"      {len(similar_pairs)} 組の類似IFを発見しました")
             
-            # 計算完整相似度（用于矩阵输出，包含所有IF对）
-            all_similarity_pairs = self.calculator.build_full_similarity_matrix(if_dict, self.mode)
-            
-            # 生成分組
-            groups = self.merge_grouper.group_similar_ifs(if_dict, similar_pairs)
-            
-            # モジュール全体で連番のグルーピングIDを割り当て
             group_assignments = {}
             for group_members in groups.values():
-                formatted_id = f"{safe_module_name}{module_group_id_counter:03d}"
+                formatted_id = f"{self._safe_module_name(module_name)}{group_id_counters[module_name]:03d}"
                 for if_name in group_members:
                     group_assignments[if_name] = formatted_id
-                module_group_id_counter += 1
+                group_id_counters[module_name] += 1
             
             print(f"      {len(groups)} 個のグループを生成しました")
-            
-            # 生成输出行
-            rows = self._generate_output_rows(
-                if_dict, group_assignments, similar_pairs, df,
-                module_name, scenario
+            assignments.append((group_assignments, similar_pairs))
+        
+        # 3. AI生成和模板填充
+        def finish(k):
+            module_name, scenario, category_name, if_dict, df = tasks[k]
+            _, groups = results[k]
+            group_assignments, similar_pairs = assignments[k]
+            return self._finish_scenario(
+                module_name, scenario, if_dict, df, groups,
+                group_assignments, similar_pairs, module_dirs[module_name], row_index
             )
-            all_module_rows.extend(rows)
-            
-            # 保存矩阵数据（使用完整相似度数据）
-            module_matrix_data[scenario] = (category_name, if_dict, all_similarity_pairs)
-            
-            # 生成模板文件（直接放到模块文件夹，不创建业务场景子文件夹）
-            merged_if_names = self._get_merged_if_names(
-                if_dict, group_assignments, groups, similar_pairs, df
+        
+        if self.ai_threads > 1 and len(tasks) > 1:
+            with ThreadPoolExecutor(max_workers=self.ai_threads) as executor:
+                futures = {k: executor.submit(finish, k) for k in schedule}
+                rows = [futures[k].result() for k in range(len(tasks))]
+        else:
+            rows = [finish(k) for k in range(len(tasks))]
+        
+        # 4. 输出相似度矩阵（模块级别，多sheet）
+        for module_name, module_dir in module_dirs.items():
+            module_matrix_data = {
+                scenario: (category_name, if_dict, self._scenario_matrix(module_dir, module_name, scenario, if_dict, similarity))
+                for (task_module, scenario, category_name, if_dict, _), (similarity, _) in zip(tasks, results)
+                if task_module == module_name
+            }
+            matrix_filename = f"類似度マトリックス_{self._safe_module_name(module_name)}.xlsx"
+            self.matrix_exporter.export_module_matrices(
+                module_matrix_data, str(module_dir / matrix_filename), module_name
             )
+        
+        # 返回所有行用于统一输出
+        return [row for scenario_rows in rows for row in scenario_rows]
+    
+    def _scenario_matrix(self, module_dir, module_name, scenario, if_dict, similarity):
+        """返回用于输出矩阵Excel的相似度（指定matrix_memmap时先写入内存映射文件）
+        
+        返回:
+            SimilarityResult，或写入后的MemmapMatrix
+        """
+        if self.matrix_memmap is None:
+            return similarity
+        from ebs_merger.similarity_matrix import MemmapMatrix
+        directory = module_dir / f"類似度マトリックス_{self._safe_module_name(module_name)}_{self._safe_module_name(scenario)}"
+        matrix = MemmapMatrix.write(similarity, str(directory), sorted(if_dict.keys()), self.matrix_memmap)
+        print(f"    類似度マトリックス（{self.matrix_memmap}）を保存しました：{directory.name}")
+        return matrix
+    
+    @staticmethod
+    def _safe_module_name(module_name: str) -> str:
+        """将模块名中的特殊字符替换为下划线（用于文件夹名和グルーピングID）"""
+        return module_name.replace('/', '_').replace('\\', '_').replace(':', '_')
+    
+    def _scenario_stores(self, tasks):
+        """为各场景准备增量相似度存储和IF指纹
+        
+        文件内所有IF的指纹先一次登记到共用存储（只计算新指纹的行），再按场景切出需要的部分。
+        指纹由字段对字符串计算（与词表ID、文件名和场景名无关）。
+        
+        参数:
+            tasks: 场景列表 [(module, scenario, category_name, if_dict, df)]
             
-            self.template_filler.fill_merged_groups(
-                if_dict, group_assignments, similar_pairs, df,
-                str(module_dir), merged_if_names
-            )
+        返回:
+            与tasks顺序相同的 [(SimilarityStore, {IF名: 指纹})] 列表（不使用存储时为(None, None)）
+        """
+        if self.store_path is None:
+            return [(None, None)] * len(tasks)
         
-        # 输出相似度矩阵（模块级别，多sheet）
-        matrix_filename = f"類似度マトリックス_{safe_module_name}.xlsx"
-        matrix_path = module_dir / matrix_filename
-        self.matrix_exporter.export_module_matrices(
-            module_matrix_data, str(matrix_path), module_name
+        vocabulary = self.grouper.vocabulary
+        field_keys = {}
+        scenario_fingerprints = []
+        for _, _, _, if_dict, _ in tasks:
+            fingerprints = {}
+            for if_name, if_info in if_dict.items():
+                keys = SimilarityStore.field_keys(vocabulary.decode(if_info.field_pairs))
+                fingerprint = SimilarityStore.digest(keys)
+                field_keys[fingerprint] = keys
+                fingerprints[if_name] = fingerprint
+            scenario_fingerprints.append(fingerprints)
+        
+        store = SimilarityStore(str(self.store_path))
+        store.update(field_keys)
+        print(f"  類似度ストア：再利用 {store.reused}件、新規計算 {store.computed}件")
+        return [(store.slice(fingerprints.values()), fingerprints) for fingerprints in scenario_fingerprints]
+    
+    def _compute_scenarios(self, tasks, schedule, stores=None):
+        """计算各场景的相似度和分组
+        
+        参数:
+            tasks: 场景列表 [(module, scenario, category_name, if_dict, df)]
+            schedule: 处理顺序（tasks的序号列表）
+            stores: 与tasks顺序相同的 [(SimilarityStore, 指纹)] 列表（省略时全部重新计算）
+            
+        返回:
+            与tasks顺序相同的 [(SimilarityResult, groups)] 列表
+        """
+        if stores is None:
+            stores = [(None, None)] * len(tasks)
+        
+        if self.scenario_processes > 1 and len(tasks) > 1:
+            calculator_options = {
+                key: self.options[key] for key in ('engine', 'lsh_bands', 'lsh_rows', 'workers')
+            }
+            with ProcessPoolExecutor(max_workers=min(self.scenario_processes, len(tasks))) as executor:
+                futures = {
+                    k: executor.submit(
+                        _compute_scenario_groups, calculator_options, self.mode, self.threshold, tasks[k][3],
+                        *stores[k]
+                    )
+                    for k in schedule
+                }
+                return [futures[k].result() for k in range(len(tasks))]
+        
+        results = []
+        for (_, _, _, if_dict, _), (store, fingerprints) in zip(tasks, stores):
+            # 計算相似度（每个场景只计算一次，分组、根据、矩阵输出、模板共用）
+            similarity = self.calculator.compute(if_dict, self.mode, store=store, fingerprints=fingerprints)
+            groups = self.merge_grouper.group_by_result(if_dict, similarity, self.threshold)
+            results.append((similarity, groups))
+        return results
+    
+    def _finish_scenario(self, module_name, scenario, if_dict, df, groups,
+                         group_assignments, similar_pairs, module_dir, row_index):
+        """生成一个场景的输出行和模板文件（AI生成合并IF名）
+        
+        返回:
+            该场景的输出行列表
+        """
+        # 生成输出行
+        rows = self._generate_output_rows(
+            if_dict, group_assignments, similar_pairs, df,
+            module_name, scenario, row_index
         )
         
-        # 返回所有行用于统一输出
-        return all_module_rows
+        # 生成模板文件（直接放到模块文件夹，不创建业务场景子文件夹）
+        merged_if_names = self._get_merged_if_names(
+            if_dict, group_assignments, groups, similar_pairs, df, row_index
+        )
+        
+        self.template_filler.fill_merged_groups(
+            if_dict, group_assignments, df,
+            str(module_dir), merged_if_names, row_index
+        )
+        return rows
     
     def _generate_output_rows(self, if_dict, group_assignments, similar_pairs, df,
-                              module_name, scenario):
+                              module_name, scenario, row_index=None):
         """生成输出行数据"""
         from ebs_merger.result_generator import OutputRow
         
@@ -278,7 +903,7 @@ class EBSMergerCLI:
         
         if self.result_generator.use_ai:
             try:
-                all_if_info = self.result_generator.ai_generator.generate_all_if_info(if_dict, df)
+                all_if_info = self.result_generator.ai_generator.generate_all_if_info(if_dict, df, row_index)
             except:
                 pass
             
@@ -286,12 +911,15 @@ class EBSMergerCLI:
                 if len(group_members) > 1:
                     try:
                         merged_name = self.result_generator.ai_generator.generate_merged_if_name(
-                            group_members, if_dict, df
+                            group_members, if_dict, df, row_index
                         )
                         merged_if_names_cache[group_id] = merged_name
                     except:
                         merged_if_names_cache[group_id] = self.result_generator.create_merged_if_name(sorted(group_members))
         
+        # 组内相似对的邻接索引（每个场景只建立一次）
+        reason_index = self.result_generator.build_reason_index(group_assignments, similar_pairs)
+        
         # 生成输出行
         output_rows = []
         for if_name in sorted(if_dict.keys()):
@@ -314,7 +942,7 @@ class EBSMergerCLI:
                 merged_if_name = self.result_generator.create_merged_if_name(sorted(group_members))
             
             grouping_reason = self.result_generator.create_grouping_reason(
-                if_name, group_members, similar_pairs
+                if_name, group_members, similar_pairs, reason_index
             )
             
             output_rows.append({
@@ -333,7 +961,8 @@ class EBSMergerCLI:
         
         return output_rows
     
-    def _get_merged_if_names(self, if_dict, group_assignments, groups, similar_pairs, df):
+    def _get_merged_if_names(self, if_dict, group_assignments, groups, similar_pairs, df,
+                             row_index=None):
         """获取合并IF名称"""
         merged_if_names = {}
         
@@ -348,7 +977,7 @@ class EBSMergerCLI:
             if len(group_members) > 1:
                 try:
                     merged_name = self.result_generator.ai_generator.generate_merged_if_name(
-                        group_members, if_dict, df
+                        group_members, if_dict, df, row_index
                     )
                     merged_if_names[group_id] = merged_name
                 except:
@@ -373,6 +1002,19 @@ class EBSMergerCLI:
         
         df.to_excel(output_path, index=False, engine='openpyxl')
     
+    def _write_batch_summary(self, summaries, output_path):
+        """写入バッチ処理結果文件（每个输入文件一行）
+        
+        参数:
+            summaries: 处理摘要列表
+            output_path: 输出文件路径
+        """
+        import pandas as pd
+        
+        rows = [dict(summary, **{'No.': idx}) for idx, summary in enumerate(summaries, 1)]
+        df = pd.DataFrame(rows).reindex(columns=self.BATCH_SUMMARY_COLUMNS)
+        df.to_excel(output_path, index=False, engine='openpyxl')
+    
     def print_batch_summary(self, success_count, fail_count, total_count):
         """一括処理のサマリーを表示
         
@@ -388,4 +1030,6 @@ class EBSMergerCLI:
         print(f"成功：{success_count}")
         print(f"失敗：{fail_count}")
         print(f"出力フォルダ：{self.output_dir}")
+        if self.shard is None:
+            print(f"バッチ処理結果：{self.output_dir / 'バッチ処理結果.xlsx'}")
         print("=" * 60)
@@ -1,14 +1,122 @@
 """数据加载模块
 
-负责读取Excel文件并验证数据格式。
+负责读取输入文件（Excel、CSV/TSV、Parquet）并验证数据格式。
 """
 
+import importlib.util
+import os
+import numpy as np
 import pandas as pd
-from typing import List
+from pandas.io.parsers import TextParser
+from typing import Any, Hashable, Iterable, Iterator, List, Optional
+from ebs_merger.input_cache import InputCache
+
+
+class OpenpyxlReader:
+    """基于openpyxl只读模式的流式读取器
+    
+    逐行解析工作表XML，不构建完整的单元格对象模型。
+    单元格值的转换与pandas.read_excel(engine='openpyxl')相同。
+    """
+    
+    name = "openpyxl"
+    
+    def iter_rows(self, file_path: str) -> Iterator[List[Any]]:
+        """逐行生成第一个工作表的单元格值
+        
+        参数:
+            file_path: Excel文件路径
+            
+        返回:
+            每行单元格值列表的迭代器（空单元格为""，行尾的空单元格被省略）
+        """
+        from openpyxl import load_workbook
+        from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+        
+        wb = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+        try:
+            sheet = wb.worksheets[0]
+            sheet.reset_dimensions()
+            for row in sheet.rows:
+                values = []
+                for cell in row:
+                    value = cell.value
+                    if value is None:
+                        value = ""
+                    elif cell.data_type == TYPE_ERROR:
+                        value = np.nan
+                    elif cell.data_type == TYPE_NUMERIC and int(value) == value:
+                        value = int(value)
+                    values.append(value)
+                while values and values[-1] == "":
+                    values.pop()
+                yield values
+        finally:
+            wb.close()
+
+
+class CalamineReader:
+    """基于python-calamine（Rust实现）的流式读取器
+    
+    需要安装python-calamine。单元格值的转换与pandas.read_excel(engine='calamine')相同。
+    注意：只包含空格的单元格会被读取为空值（openpyxl读取为原样的空格）。
+    """
+    
+    name = "calamine"
+    
+    @staticmethod
+    def is_available() -> bool:
+        """是否安装了python-calamine"""
+        return importlib.util.find_spec('python_calamine') is not None
+    
+    def iter_rows(self, file_path: str) -> Iterator[List[Any]]:
+        """逐行生成第一个工作表的单元格值
+        
+        参数:
+            file_path: Excel文件路径
+            
+        返回:
+            每行单元格值列表的迭代器（空单元格为""）
+        """
+        from datetime import date, datetime
+        from python_calamine import CalamineWorkbook
+        
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        workbook = CalamineWorkbook.from_path(file_path)
+        sheet = workbook.get_sheet_by_index(0)
+        for row in sheet.iter_rows():
+            values = []
+            for value in row:
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                elif isinstance(value, date) and not isinstance(value, datetime):
+                    value = datetime(value.year, value.month, value.day)
+                values.append(value)
+            yield values
 
 
 class DataLoader:
-    """Excel文件加载器"""
+    """输入文件加载器
+    
+    支持Excel（.xlsx）、CSV（.csv）、TSV（.tsv）和Parquet（.parquet）。
+    先读取表头确认必需的列，再只读取这些列的数据。
+    IF名和EBSテーブルID以分类类型（category）保存以减少内存。
+    """
+    
+    # 支持的输入文件扩展名
+    EXCEL_SUFFIXES = ['.xlsx']
+    DELIMITED_SUFFIXES = {'.csv': ',', '.tsv': '\t'}
+    PARQUET_SUFFIXES = ['.parquet']
+    
+    # CSV/TSV依次尝试的编码
+    TEXT_ENCODINGS = ['utf-8-sig', 'cp932']
+    
+    # 读取器（auto时已安装python-calamine则使用calamine，否则使用openpyxl）
+    READERS = {
+        "openpyxl": OpenpyxlReader,
+        "calamine": CalamineReader,
+    }
     
     # 必需的列名
     REQUIRED_COLUMNS = [
@@ -22,6 +130,58 @@ class DataLoader:
         '桁数'
     ]
     
+    # 以分类类型保存的列（取值重复多）
+    CATEGORICAL_COLUMNS = ['IF名', 'EBSテーブルID']
+    
+    def __init__(self, cache: Optional[InputCache] = None, reader: str = "openpyxl"):
+        """初始化加载器
+        
+        参数:
+            cache: 输入缓存（指定时文件未变更则跳过Excel解析）
+            reader: Excel读取器（auto、openpyxl或calamine）
+            
+        异常:
+            ValueError: 未知的读取器，或指定了calamine但未安装
+        """
+        if reader == "auto":
+            reader = "calamine" if CalamineReader.is_available() else "openpyxl"
+        if reader not in self.READERS:
+            raise ValueError(f"reader must be one of {['auto'] + sorted(self.READERS)}, got '{reader}'")
+        if reader == "calamine" and not CalamineReader.is_available():
+            raise ValueError("错误：calamine读取器需要python-calamine，请执行 pip install python-calamine")
+        
+        self.cache = cache
+        self.reader = self.READERS[reader]()
+    
+    @classmethod
+    def supported_suffixes(cls) -> List[str]:
+        """返回支持的输入文件扩展名列表"""
+        return cls.EXCEL_SUFFIXES + list(cls.DELIMITED_SUFFIXES) + cls.PARQUET_SUFFIXES
+    
+    def load_file(self, file_path: str) -> pd.DataFrame:
+        """根据扩展名读取输入文件并验证必需的列
+        
+        参数:
+            file_path: 输入文件路径（.xlsx、.csv、.tsv或.parquet）
+            
+        返回:
+            包含EBS定义数据的DataFrame
+            
+        异常:
+            FileNotFoundError: 文件不存在
+            ValueError: 不支持的扩展名、缺少必需的列或文件格式错误
+        """
+        suffix = os.path.splitext(file_path)[1].lower()
+        if suffix in self.EXCEL_SUFFIXES:
+            return self.load_excel(file_path)
+        if suffix in self.DELIMITED_SUFFIXES:
+            return self.load_delimited(file_path, self.DELIMITED_SUFFIXES[suffix])
+        if suffix in self.PARQUET_SUFFIXES:
+            return self.load_parquet(file_path)
+        raise ValueError(
+            f"错误：不支持的输入文件格式 '{file_path}'（支持：{', '.join(self.supported_suffixes())}）"
+        )
+    
     def load_excel(self, file_path: str) -> pd.DataFrame:
         """读取Excel文件并验证必需的列
         
@@ -35,28 +195,187 @@ class DataLoader:
             FileNotFoundError: 文件不存在
             ValueError: 缺少必需的列或文件格式错误
         """
+        cache_key = None
+        if self.cache is not None and os.path.exists(file_path):
+            cache_key = self.cache.key(file_path, variant=self.reader.name)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            # 读取Excel文件
-            df = pd.read_excel(file_path, engine='openpyxl')
+            # 读取表头行
+            rows = self.reader.iter_rows(file_path)
+            header = next(rows, None)
         except FileNotFoundError:
             raise FileNotFoundError(f"错误：找不到输入文件 '{file_path}'")
         except Exception as e:
             raise ValueError(f"错误：无法读取Excel文件 '{file_path}'，请确认文件格式正确。详细信息：{str(e)}")
         
+        if header is None:
+            raise ValueError("错误：输入文件不包含任何数据行")
+        
+        try:
+            # 读取数据前先验证必需的列
+            self.validate_header(header)
+            try:
+                df = self._read_required_columns(header, rows)
+            except Exception as e:
+                raise ValueError(f"错误：无法读取Excel文件 '{file_path}'，请确认文件格式正确。详细信息：{str(e)}")
+        finally:
+            rows.close()
+        
+        df = self._finalize(df)
+        
+        if cache_key is not None:
+            self.cache.put(cache_key, df)
+        
+        return df
+    
+    def load_delimited(self, file_path: str, sep: str = ',') -> pd.DataFrame:
+        """读取CSV/TSV文件并验证必需的列
+        
+        ID和名称列按字符串读取（保留"001"等前导零），编码依次尝试UTF-8（含BOM）和CP932。
+        
+        参数:
+            file_path: CSV/TSV文件路径
+            sep: 分隔符
+            
+        返回:
+            包含EBS定义数据的DataFrame
+            
+        异常:
+            FileNotFoundError: 文件不存在
+            ValueError: 缺少必需的列或文件格式错误
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"错误：找不到输入文件 '{file_path}'")
+        
+        text_columns = {column: str for column in self.REQUIRED_COLUMNS if column not in ('No.', '桁数')}
+        last_error = None
+        for encoding in self.TEXT_ENCODINGS:
+            try:
+                # 读取表头行
+                header = pd.read_csv(file_path, sep=sep, encoding=encoding, nrows=0).columns.tolist()
+            except pd.errors.EmptyDataError:
+                raise ValueError("错误：输入文件不包含任何数据行")
+            except UnicodeDecodeError as e:
+                last_error = e
+                continue
+            except Exception as e:
+                raise ValueError(f"错误：无法读取文件 '{file_path}'，请确认文件格式正确。详细信息：{str(e)}")
+            
+            # 读取数据前先验证必需的列
+            self.validate_header(header)
+            try:
+                df = pd.read_csv(
+                    file_path,
+                    sep=sep,
+                    encoding=encoding,
+                    usecols=self.REQUIRED_COLUMNS,
+                    dtype=text_columns
+                )
+            except UnicodeDecodeError as e:
+                last_error = e
+                continue
+            except Exception as e:
+                raise ValueError(f"错误：无法读取文件 '{file_path}'，请确认文件格式正确。详细信息：{str(e)}")
+            return self._finalize(df.reindex(columns=self.REQUIRED_COLUMNS))
+        
+        raise ValueError(f"错误：无法读取文件 '{file_path}'，请确认文件编码。详细信息：{str(last_error)}")
+    
+    def load_parquet(self, file_path: str) -> pd.DataFrame:
+        """读取Parquet文件并验证必需的列
+        
+        先从文件元数据确认必需的列，只读取这些列，字符串列使用Arrow存储。
+        
+        参数:
+            file_path: Parquet文件路径
+            
+        返回:
+            包含EBS定义数据的DataFrame
+            
+        异常:
+            FileNotFoundError: 文件不存在
+            ValueError: 缺少必需的列、文件格式错误或未安装pyarrow
+        """
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ValueError("错误：读取Parquet文件需要pyarrow，请执行 pip install pyarrow")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"错误：找不到输入文件 '{file_path}'")
+        
+        try:
+            header = pq.read_schema(file_path).names
+        except Exception as e:
+            raise ValueError(f"错误：无法读取文件 '{file_path}'，请确认文件格式正确。详细信息：{str(e)}")
+        
+        # 读取数据前先验证必需的列
+        self.validate_header(header)
+        
+        string_dtype = self._arrow_string_dtype()
+        
+        def types_mapper(arrow_type):
+            if string_dtype is not None and (pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)):
+                return string_dtype
+            return None
+        
+        try:
+            table = pq.read_table(file_path, columns=self.REQUIRED_COLUMNS)
+            df = table.to_pandas(types_mapper=types_mapper)
+        except Exception as e:
+            raise ValueError(f"错误：无法读取文件 '{file_path}'，请确认文件格式正确。详细信息：{str(e)}")
+        return self._finalize(df)
+    
+    @staticmethod
+    def _arrow_string_dtype():
+        """返回以Arrow存储、缺失值为NaN的字符串类型（pandas不支持时返回None）"""
+        try:
+            return pd.StringDtype("pyarrow", na_value=np.nan)
+        except (TypeError, ImportError):
+            return None
+    
+    def _finalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """验证数据不为空，并将重复值多的列转换为分类类型"""
         # 验证数据不为空
         if df.empty:
             raise ValueError("错误：输入文件不包含任何数据行")
         
-        # 验证必需的列
-        self.validate_columns(df)
-        
+        for column in self.CATEGORICAL_COLUMNS:
+            df[column] = df[column].astype('category')
         return df
     
-    def validate_columns(self, df: pd.DataFrame) -> bool:
-        """验证DataFrame是否包含所有必需的列
+    def _read_required_columns(self, header: List[Any], rows: Iterator[List[Any]]) -> pd.DataFrame:
+        """从表头之后的行中只读取必需的列
+        
+        与pandas.read_excel相同：保留中间的空行，去掉末尾的空行，
+        并由TextParser推断各列的类型。
         
         参数:
-            df: 待验证的DataFrame
+            header: 表头行的单元格值
+            rows: 表头之后各行单元格值的迭代器
+            
+        返回:
+            只包含必需列的DataFrame
+        """
+        positions = [header.index(column) for column in self.REQUIRED_COLUMNS]
+        data = [list(self.REQUIRED_COLUMNS)]
+        last_row_with_data = 0
+        for row in rows:
+            width = len(row)
+            data.append([row[position] if position < width else "" for position in positions])
+            if any(value != "" for value in row):
+                last_row_with_data = len(data) - 1
+        data = data[:last_row_with_data + 1]
+        
+        return TextParser(data, header=0, skip_blank_lines=False).read()
+    
+    def validate_header(self, header: List[Any]) -> bool:
+        """验证表头行是否包含所有必需的列
+        
+        参数:
+            header: 表头行的列名
             
         返回:
             True如果所有必需列都存在
@@ -64,15 +383,63 @@ class DataLoader:
         异常:
             ValueError: 缺少必需的列，错误消息包含缺失列名
         """
-        # 获取DataFrame的列名
-        actual_columns = set(df.columns)
-        required_columns = set(self.REQUIRED_COLUMNS)
-        
         # 检查缺失的列
-        missing_columns = required_columns - actual_columns
+        missing_columns = set(self.REQUIRED_COLUMNS) - set(header)
         
         if missing_columns:
             missing_list = ', '.join(sorted(missing_columns))
-            raise ValueError(f"错误：Excel文件缺少以下必需列：{missing_list}")
+            raise ValueError(f"错误：输入文件缺少以下必需列：{missing_list}")
         
         return True
+    
+    def validate_columns(self, df: pd.DataFrame) -> bool:
+        """验证DataFrame是否包含所有必需的列
+        
+        参数:
+            df: 待验证的DataFrame
+            
+        返回:
+            True如果所有必需列都存在
+            
+        异常:
+            ValueError: 缺少必需的列，错误消息包含缺失列名
+        """
+        return self.validate_header(list(df.columns))
+
+
+class IFRowIndex:
+    """按IF名预先建立的行位置索引
+    
+    加载数据后建立一次，分类、AI生成和模板填充都通过它取得各IF的行，
+    避免对每个IF重复执行 df[df['IF名'] == if_name] 的全表扫描。
+    取得的行与按IF名筛选的结果相同（保持原始顺序和索引）。
+    """
+    
+    def __init__(self, df: pd.DataFrame):
+        """建立索引
+        
+        参数:
+            df: 包含IF名列的DataFrame
+        """
+        self.df = df
+        self._positions = df.groupby('IF名', sort=False, observed=True).indices
+    
+    def __contains__(self, if_name: Hashable) -> bool:
+        """IF名是否存在"""
+        return if_name in self._positions
+    
+    def rows(self, if_name: Hashable) -> pd.DataFrame:
+        """返回指定IF的所有行（不存在时返回空DataFrame）"""
+        positions = self._positions.get(if_name)
+        if positions is None:
+            return self.df.iloc[0:0]
+        return self.df.iloc[positions]
+    
+    def rows_of(self, if_names: Iterable[Hashable]) -> pd.DataFrame:
+        """返回属于任一指定IF的所有行（与 df[df['IF名'].isin(if_names)] 相同）"""
+        positions = [
+            self._positions[if_name] for if_name in set(if_names) if if_name in self._positions
+        ]
+        if not positions:
+            return self.df.iloc[0:0]
+        return self.df.iloc[np.sort(np.concatenate(positions))]
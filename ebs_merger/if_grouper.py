@@ -3,9 +3,10 @@
 负责按IF名称分组并提取特征。
 """
 
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
-from typing import Dict, Set, Tuple
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
 
 @dataclass
@@ -13,55 +14,155 @@ class IFInfo:
     """IF的元数据和特征"""
     if_name: str
     doc_number: str  # 文書管理番号
-    field_pairs: Set[Tuple[str, str]]  # (EBSテーブルID, 項目ID)对的集合
+    field_pairs: FrozenSet[int]  # (EBSテーブルID, 項目ID)对在FieldVocabulary中的ID集合
     item_count: int  # 項目数
     representative_item: str  # 代表項目名（第一个項目名）
 
 
+class FieldVocabulary:
+    """(EBSテーブルID, 項目ID)对到连续整数ID的词表
+    
+    加载数据时将每个字段对登记为整数ID，IFInfo.field_pairs只保存ID，
+    哈希、比较和存储都比字符串元组便宜。同一个词表可以在多个文件之间共用。
+    """
+    
+    def __init__(self):
+        """初始化空词表"""
+        self._ids: Dict[Tuple[str, str], int] = {}
+        self._pairs: List[Tuple[str, str]] = []
+    
+    def __len__(self) -> int:
+        """已登记的字段对数量"""
+        return len(self._pairs)
+    
+    def intern(self, table_id: str, item_id: str) -> int:
+        """登记字段对并返回其ID（已登记时返回已有ID）"""
+        pair = (table_id, item_id)
+        field_id = self._ids.get(pair)
+        if field_id is None:
+            field_id = len(self._pairs)
+            self._ids[pair] = field_id
+            self._pairs.append(pair)
+        return field_id
+    
+    def intern_many(self, table_ids: List[str], item_ids: List[str]) -> List[int]:
+        """批量登记字段对，返回对应的ID列表"""
+        intern = self.intern
+        return [intern(table_id, item_id) for table_id, item_id in zip(table_ids, item_ids)]
+    
+    def lookup(self, table_id: str, item_id: str) -> int:
+        """返回字段对的ID，未登记时返回-1"""
+        return self._ids.get((table_id, item_id), -1)
+    
+    def pair(self, field_id: int) -> Tuple[str, str]:
+        """返回ID对应的(EBSテーブルID, 項目ID)对"""
+        return self._pairs[field_id]
+    
+    def decode(self, field_ids) -> Set[Tuple[str, str]]:
+        """将ID集合还原为(EBSテーブルID, 項目ID)对的集合"""
+        return {self._pairs[field_id] for field_id in field_ids}
+
+
 class IFGrouper:
     """IF分组器"""
     
+    def __init__(self, vocabulary: Optional[FieldVocabulary] = None):
+        """初始化IF分组器
+        
+        参数:
+            vocabulary: 字段对词表（省略时新建；多个文件共用时传入同一个词表）
+        """
+        self.vocabulary = vocabulary if vocabulary is not None else FieldVocabulary()
+    
     def group_by_if(self, df: pd.DataFrame) -> Dict[str, IFInfo]:
         """按IF名称分组并提取每个IF的特征
         
+        所有列一次性向量化处理（字符串规范化、空值过滤、按IF分组），
+        不逐行遍历DataFrame。
+        
         参数:
             df: 包含EBS定义的DataFrame
             
         返回:
-            字典，键为IF名称，值为IFInfo对象
+            字典，键为IF名称，值为IFInfo对象（按IF名排序）
         """
-        if_dict = {}
+        # IF名为空的行不属于任何IF
+        df = df[df['IF名'].notna()]
+        if df.empty:
+            return {}
         
-        # 按IF名分组
-        grouped = df.groupby('IF名')
+        # 为每个IF分配编号（按IF名排序，与groupby的顺序一致）
+        codes, if_names = pd.factorize(df['IF名'], sort=True)
         
-        for if_name, if_df in grouped:
-            # 提取字段对
-            field_pairs = self.extract_field_pairs(if_df)
-            
-            # 获取文書管理番号（取第一个）
-            doc_number = if_df['文書管理番号'].iloc[0]
-            
-            # 获取代表項目名（取第一个非空的項目名）
-            representative_item = ""
-            for item_name in if_df['項目名']:
-                if pd.notna(item_name) and str(item_name).strip():
-                    representative_item = str(item_name)
-                    break
+        # 文書管理番号：各IF的第一行
+        _, first_rows = np.unique(codes, return_index=True)
+        doc_numbers = df['文書管理番号'].iloc[first_rows].tolist()
+        
+        # 代表項目名：各IF中第一个非空的項目名
+        item_names = df['項目名']
+        named = (item_names.notna() & (item_names.astype(str).str.strip() != '')).to_numpy()
+        named_codes = codes[named]
+        named_values = item_names[named].astype(str).tolist()
+        representative_items = [""] * len(if_names)
+        for code, item_name in zip(named_codes[::-1].tolist(), named_values[::-1]):
+            # 倒序覆盖，最终保留每个IF的第一个值
+            representative_items[code] = item_name
+        
+        # 字段对：过滤空值并去除空格，登记到词表
+        field_codes, table_ids, item_ids = self.normalized_field_columns(df, codes)
+        field_ids = np.asarray(self.vocabulary.intern_many(table_ids, item_ids), dtype=np.int64)
+        order = np.argsort(field_codes, kind='stable')
+        field_codes = field_codes[order]
+        field_ids = field_ids[order].tolist()
+        bounds = np.searchsorted(field_codes, np.arange(len(if_names) + 1)).tolist()
+        
+        if_dict = {}
+        for code, if_name in enumerate(if_names):
+            start, stop = bounds[code], bounds[code + 1]
+            field_pairs = frozenset(field_ids[start:stop])
             
-            # 創建IFInfo对象
             if_info = IFInfo(
                 if_name=str(if_name),
-                doc_number=str(doc_number),
+                doc_number=str(doc_numbers[code]),
                 field_pairs=field_pairs,
                 item_count=len(field_pairs),
-                representative_item=representative_item
+                representative_item=representative_items[code]
             )
             
             if_dict[str(if_name)] = if_info
         
         return if_dict
     
+    @staticmethod
+    def normalized_field_columns(
+        df: pd.DataFrame,
+        codes: np.ndarray
+    ) -> Tuple[np.ndarray, List[str], List[str]]:
+        """向量化提取有效的(EBSテーブルID, 項目ID)列
+        
+        参数:
+            df: 包含EBS定义的DataFrame
+            codes: 每行的编号（如所属IF的编号或行号）
+            
+        返回:
+            (编号数组, EBSテーブルID列表, 項目ID列表)，只包含两者都非空的行
+        """
+        table_col = df['EBSテーブルID']
+        item_col = df['項目ID']
+        valid = (table_col.notna() & item_col.notna()).to_numpy()
+        
+        # 转换为字符串并去除空格
+        table_ids = table_col[valid].astype(str).str.strip()
+        item_ids = item_col[valid].astype(str).str.strip()
+        
+        # 只保留非空的字段对
+        non_empty = ((table_ids != '') & (item_ids != '')).to_numpy()
+        return (
+            codes[valid][non_empty],
+            table_ids[non_empty].tolist(),
+            item_ids[non_empty].tolist(),
+        )
+    
     def extract_field_pairs(self, if_df: pd.DataFrame) -> Set[Tuple[str, str]]:
         """从IF的DataFrame中提取(EBSテーブルID, 項目ID)对
         
@@ -71,20 +172,25 @@ class IFGrouper:
         返回:
             (EBSテーブルID, 項目ID)对的集合，过滤掉空值
         """
-        field_pairs = set()
+        _, table_ids, item_ids = self.normalized_field_columns(
+            if_df, np.zeros(len(if_df), dtype=np.intp)
+        )
+        return set(zip(table_ids, item_ids))
+    
+    def find_identical_ifs(self, if_dict: Dict[str, IFInfo]) -> Dict[str, List[str]]:
+        """找出字段对集合完全相同的IF
         
-        for _, row in if_df.iterrows():
-            table_id = row['EBSテーブルID']
-            item_id = row['項目ID']
-            
-            # 过滤空值
-            if pd.notna(table_id) and pd.notna(item_id):
-                # 转换为字符串并去除空格
-                table_id_str = str(table_id).strip()
-                item_id_str = str(item_id).strip()
-                
-                # 只添加非空的字段对
-                if table_id_str and item_id_str:
-                    field_pairs.add((table_id_str, item_id_str))
+        以冻结后的字段对集合为键进行哈希分组。同一类中的IF之间相似度必为1.0，
+        与其他IF的相似度也完全相同，因此两两比较时只需比较每类的代表IF。
         
-        return field_pairs
+        参数:
+            if_dict: IF名称到IFInfo的映射
+            
+        返回:
+            {代表IF名: [同类IF名, ...]}，代表IF为该类中最先出现的IF（也包含在列表中），
+            顺序与if_dict一致
+        """
+        classes: Dict[FrozenSet, List[str]] = {}
+        for if_name, if_info in if_dict.items():
+            classes.setdefault(frozenset(if_info.field_pairs), []).append(if_name)
+        return {members[0]: members for members in classes.values()}
@@ -0,0 +1,134 @@
+"""输入缓存模块
+
+将读取并验证后的输入DataFrame保存到磁盘，文件未变更时跳过Excel解析。
+"""
+
+import hashlib
+import importlib.util
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+
+class InputCache:
+    """以文件内容哈希为键的输入DataFrame缓存
+
+    键由文件内容的SHA-256、文件大小和修改时间组成，任何一项变化都会使缓存失效。
+    安装了pyarrow时以Parquet（列式）格式保存，无法用Parquet表示的数据
+    （如混合类型的列）或未安装pyarrow时以pickle保存。
+    缓存总大小超过上限时，从最久未使用的条目开始删除。
+    """
+
+    # 缓存格式变更时递增，使旧缓存失效
+    VERSION = 2
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024):
+        """初始化缓存
+
+        参数:
+            cache_dir: 缓存文件夹路径
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.use_parquet = importlib.util.find_spec('pyarrow') is not None
+
+    def key(self, file_path: str, variant: str = "") -> str:
+        """计算输入文件的缓存键
+
+        参数:
+            file_path: 输入文件路径
+            variant: 读取方式的标识（如读取器名称），不同读取方式的缓存互不共用
+
+        返回:
+            十六进制字符串形式的缓存键
+        """
+        stat = os.stat(file_path)
+        content = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                content.update(chunk)
+        source = f"{self.VERSION}:{variant}:{content.hexdigest()}:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """读取缓存的DataFrame
+
+        参数:
+            key: key()返回的缓存键
+
+        返回:
+            缓存的DataFrame，没有缓存或缓存损坏时返回None
+        """
+        for path in (self.cache_dir / f"{key}.parquet", self.cache_dir / f"{key}.pkl"):
+            if not path.exists():
+                continue
+            try:
+                if path.suffix == '.parquet':
+                    df = pd.read_parquet(path)
+                else:
+                    with open(path, 'rb') as f:
+                        df = pickle.load(f)
+            except Exception:
+                # 损坏的缓存视为未命中
+                path.unlink(missing_ok=True)
+                continue
+            # 更新修改时间，作为LRU淘汰的依据
+            os.utime(path)
+            return df
+        return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        """保存DataFrame到缓存
+
+        参数:
+            key: key()返回的缓存键
+            df: 读取并验证后的DataFrame
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        path = None
+        if self.use_parquet:
+            path = self._write(self.cache_dir / f"{key}.parquet", lambda tmp: df.to_parquet(tmp))
+        if path is None:
+            path = self._write(
+                self.cache_dir / f"{key}.pkl",
+                lambda tmp: tmp.write_bytes(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+        if path is not None:
+            self.evict(keep=path)
+
+    def _write(self, path: Path, writer) -> Optional[Path]:
+        """经由临时文件原子地写入缓存文件，失败时返回None"""
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            writer(tmp)
+            os.replace(tmp, path)
+            return path
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            return None
+
+    def evict(self, keep: Optional[Path] = None):
+        """缓存总大小超过上限时，按最久未使用的顺序删除条目
+
+        参数:
+            keep: 不删除的条目（刚写入的缓存）
+        """
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix in ('.parquet', '.pkl'):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
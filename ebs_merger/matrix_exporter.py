@@ -6,8 +6,11 @@
 
 import pandas as pd
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple, Union
+import numpy as np
 from ebs_merger.if_grouper import IFInfo
+from ebs_merger.similarity_matrix import MemmapMatrix
+from ebs_merger.similarity_result import SimilarityResult
 
 
 class MatrixExporter:
@@ -169,14 +172,16 @@ class MatrixExporter:
     
     def export_module_matrices(
         self,
-        module_data: Dict[str, Tuple[str, Dict[str, IFInfo], List[Tuple[str, str, float]]]],
+        module_data: Dict[str, Tuple[str, Dict[str, IFInfo], Union[SimilarityResult, MemmapMatrix, List[Tuple[str, str, float]]]]],
         output_path: str,
         module_name: str
     ):
         """按模块输出多sheet相似度矩阵
         
         パラメータ:
-            module_data: {scenario: (category_name, if_dict, similar_pairs)}
+            module_data: {scenario: (category_name, if_dict, similarity)}
+                similarityはSimilarityResult、MemmapMatrix（IF名の昇順で作成したもの）、
+                または(IF1名, IF2名, 類似度)のリスト
             output_path: 输出文件路径
             module_name: 模块名（如FI、SD）
         """
@@ -186,7 +191,7 @@ class MatrixExporter:
         
         # 创建Excel writer
         with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for scenario, (category_name, if_dict, similar_pairs) in module_data.items():
+            for scenario, (category_name, if_dict, similarity) in module_data.items():
                 # Sheet名：モジュール_業務内容_類似度（特殊文字を除去）
                 safe_module = module_name.replace('/', '_').replace('\\', '_').replace(':', '_').replace('*', '_').replace('?', '_').replace('[', '_').replace(']', '_')
                 sheet_name = f"{safe_module}_{scenario}_類似度"
@@ -197,7 +202,7 @@ class MatrixExporter:
                 # 生成矩阵数据
                 matrix_df = self._build_matrix_dataframe(
                     if_dict, 
-                    similar_pairs, 
+                    similarity, 
                     module_name, 
                     scenario
                 )
@@ -210,7 +215,7 @@ class MatrixExporter:
     def _build_matrix_dataframe(
         self,
         if_dict: Dict[str, IFInfo],
-        similar_pairs: List[Tuple[str, str, float]],
+        similarity: Union[SimilarityResult, MemmapMatrix, List[Tuple[str, str, float]]],
         module_name: str,
         scenario: str
     ) -> pd.DataFrame:
@@ -218,7 +223,8 @@ class MatrixExporter:
         
         パラメータ:
             if_dict: IF信息字典
-            similar_pairs: 相似度对列表（使用min作为分母）
+            similarity: SimilarityResult或MemmapMatrix（最高値和詳細値都从中按行块读取），
+                或相似度对列表（使用min作为分母，詳細値重新计算）
             module_name: 模块名
             scenario: 业务场景名
             
@@ -231,11 +237,18 @@ class MatrixExporter:
         if not if_names:
             return pd.DataFrame()
         
-        # 類似度辞書を構築（使用min作为分母的相似度）
-        similarity_dict = {}
-        for if1, if2, sim in similar_pairs:
-            similarity_dict[(if1, if2)] = sim
-            similarity_dict[(if2, if1)] = sim
+        if isinstance(similarity, (SimilarityResult, MemmapMatrix)):
+            # 相似度结果包含所有IF对（没有共同字段对的对为0），按行块读取
+            score_rows = self._matrix_rows(similarity, if_names, directional=False)
+            directional_rows = self._matrix_rows(similarity, if_names, directional=True)
+            similarity_dict = None
+        else:
+            # 類似度辞書を構築（使用min作为分母的相似度）
+            score_rows = directional_rows = None
+            similarity_dict = {}
+            for if1, if2, sim in similarity:
+                similarity_dict[(if1, if2)] = sim
+                similarity_dict[(if2, if1)] = sim
         
         # マトリックスデータを構築
         matrix_data = []
@@ -265,6 +278,7 @@ class MatrixExporter:
         # データ行（上三角のみ）
         for i, if1 in enumerate(if_names):
             row = [if_dict[if1].doc_number]
+            score_row = next(score_rows) if score_rows is not None else None
             for j, if2 in enumerate(if_names):
                 if i == j:
                     row.append("-")
@@ -273,7 +287,10 @@ class MatrixExporter:
                     row.append("")
                 else:
                     # 上三角显示相似度（使用min作为分母）
-                    sim = similarity_dict.get((if1, if2), "")
+                    if similarity_dict is None:
+                        sim = float(score_row[j])
+                    else:
+                        sim = similarity_dict.get((if1, if2), "")
                     if sim != "":
                         percentage = round(sim * 100, 1)
                         row.append(f"{percentage}%")
@@ -301,15 +318,19 @@ class MatrixExporter:
         for i, if1_name in enumerate(if_names):
             row = [if_dict[if1_name].doc_number]
             if1 = if_dict[if1_name]
+            directional_row = next(directional_rows) if directional_rows is not None else None
             
             for j, if2_name in enumerate(if_names):
                 if i == j:
                     row.append("-")
                 else:
-                    if2 = if_dict[if2_name]
-                    
-                    # 计算相似度：始终使用行IF（if1）的字段数作为分母
-                    sim = self._calculate_directional_similarity(if1, if2, use_if1_as_denominator=True)
+                    if directional_row is not None:
+                        # 从相似度结果读取（不再重新计算交集）
+                        sim = float(directional_row[j])
+                    else:
+                        # 计算相似度：始终使用行IF（if1）的字段数作为分母
+                        if2 = if_dict[if2_name]
+                        sim = self._calculate_directional_similarity(if1, if2, use_if1_as_denominator=True)
                     
                     if sim > 0:
                         percentage = round(sim * 100, 1)
@@ -320,4 +341,28 @@ class MatrixExporter:
         
         return pd.DataFrame(matrix_data)
     
-
+    @staticmethod
+    def _matrix_rows(
+        similarity: Union[SimilarityResult, MemmapMatrix],
+        if_names: List[str],
+        directional: bool
+    ) -> Iterator[np.ndarray]:
+        """按行块读取相似度方阵，逐行生成（不生成完整的方阵）
+        
+        パラメータ:
+            similarity: SimilarityResult或MemmapMatrix
+            if_names: 矩阵行列的IF名称顺序
+            directional: True时读取定向相似度（行IF为分母）
+            
+        返回:
+            每行相似度数组的迭代器
+        """
+        if isinstance(similarity, MemmapMatrix):
+            if similarity.if_names != if_names:
+                raise ValueError("memmap matrix must be written in the sorted IF name order")
+            blocks = similarity.tiles(directional=directional)
+        else:
+            block_rows = max(1, MemmapMatrix.BLOCK_ELEMENTS // max(len(if_names), 1))
+            blocks = similarity.iter_row_blocks(if_names, block_rows, directional)
+        for _, block in blocks:
+            yield from block
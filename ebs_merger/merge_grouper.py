@@ -3,8 +3,11 @@
 使用Union-Find算法识别需要合并的IF组。
 """
 
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
 from ebs_merger.if_grouper import IFInfo
+from ebs_merger.similarity_result import SimilarityResult
 
 
 class UnionFind:
@@ -22,7 +25,7 @@ class UnionFind:
         self.rank = {x: 0 for x in elements}
     
     def find(self, x: str) -> str:
-        """查找元素所属组的代表元素（带路径压缩）
+        """查找元素所属组的代表元素（带路径减半，非递归）
         
         参数:
             x: 要查找的元素
@@ -30,10 +33,12 @@ class UnionFind:
         返回:
             该元素所属组的代表元素
         """
-        if self.parent[x] != x:
-            # 路径压缩：将x直接连接到根节点
-            self.parent[x] = self.find(self.parent[x])
-        return self.parent[x]
+        parent = self.parent
+        while parent[x] != x:
+            # 路径减半：将x连接到祖父节点
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
     
     def union(self, x: str, y: str):
         """合并两个元素所属的组
@@ -72,6 +77,93 @@ class UnionFind:
         return groups
 
 
+class ArrayUnionFind:
+    """以整数序号为元素、用数组保存父节点的Union-Find
+    
+    元素为0..n-1的序号，find使用迭代的路径减半（不受递归深度限制），
+    union按集合大小合并。边可以从生成器逐条输入，无需先生成完整的边列表。
+    """
+    
+    def __init__(self, n: int):
+        """初始化，每个元素自成一组
+        
+        参数:
+            n: 元素数
+        """
+        # parent[i] 表示i的父节点，size[i] 表示以i为根的集合大小
+        self.parent = list(range(n))
+        self.size = [1] * n
+    
+    def __len__(self) -> int:
+        """元素数"""
+        return len(self.parent)
+    
+    def find(self, i: int) -> int:
+        """查找元素所属组的根（迭代的路径减半）
+        
+        参数:
+            i: 元素序号
+            
+        返回:
+            根元素的序号
+        """
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    def union(self, i: int, j: int) -> bool:
+        """合并两个元素所属的组
+        
+        参数:
+            i: 第一个元素序号
+            j: 第二个元素序号
+            
+        返回:
+            两个元素原本不在同一组时为True
+        """
+        root_i = self.find(i)
+        root_j = self.find(j)
+        if root_i == root_j:
+            return False
+        
+        # 按大小合并：将较小的集合连接到较大的集合
+        if self.size[root_i] < self.size[root_j]:
+            root_i, root_j = root_j, root_i
+        self.parent[root_j] = root_i
+        self.size[root_i] += self.size[root_j]
+        return True
+    
+    def union_edges(self, edges: Iterable[Tuple[int, int]]):
+        """逐条合并边（可以是生成器）
+        
+        参数:
+            edges: (i, j)序号对的可迭代对象
+        """
+        union = self.union
+        for i, j in edges:
+            union(i, j)
+    
+    def groups(self) -> List[List[int]]:
+        """返回所有组
+        
+        返回:
+            组的列表，组内序号升序，各组按最小序号升序排列（与合并顺序无关）
+        """
+        n = len(self.parent)
+        if n == 0:
+            return []
+        roots = np.fromiter((self.find(i) for i in range(n)), dtype=np.int64, count=n)
+        order = np.argsort(roots, kind='stable')
+        sorted_roots = roots[order]
+        starts = np.flatnonzero(np.r_[True, sorted_roots[1:] != sorted_roots[:-1]])
+        members = np.split(order, starts[1:])
+        # 各组的第一个元素就是组内最小序号
+        members.sort(key=lambda group: group[0])
+        return [group.tolist() for group in members]
+
+
 class MergeGrouper:
     """合并分组器"""
     
@@ -84,23 +176,63 @@ class MergeGrouper:
         
         参数:
             if_dict: IF名称到IFInfo的映射
-            similar_pairs: 相似度超过阈值的IF对列表
+            similar_pairs: 相似度超过阈值的IF对（列表或生成器）
             
         返回:
-            分组结果，键为代表IF名，值为该组的IF名称列表
+            分组结果，键为代表IF名（组内最先出现的IF），值为该组的IF名称列表
         """
         # 获取所有IF名称
         if_names = list(if_dict.keys())
+        positions = {if_name: i for i, if_name in enumerate(if_names)}
         
-        # 初始化Union-Find
-        uf = UnionFind(if_names)
-        
-        # 合并相似的IF
-        for if1_name, if2_name, _ in similar_pairs:
-            uf.union(if1_name, if2_name)
+        # 初始化Union-Find并合并相似的IF
+        uf = ArrayUnionFind(len(if_names))
+        uf.union_edges(
+            (positions[if1_name], positions[if2_name]) for if1_name, if2_name, _ in similar_pairs
+        )
         
         # 获取分组结果
-        return uf.get_groups()
+        return self._named_groups(uf, if_names)
+    
+    @staticmethod
+    def _named_groups(uf: ArrayUnionFind, if_names: List[str]) -> Dict[str, List[str]]:
+        """将序号分组转换为IF名称分组（键为组内最先出现的IF）"""
+        groups = {}
+        for group in uf.groups():
+            members = [if_names[i] for i in group]
+            groups[members[0]] = members
+        return groups
+    
+    def group_by_result(
+        self,
+        if_dict: Dict[str, IFInfo],
+        result: SimilarityResult,
+        threshold: float
+    ) -> Dict[str, List[str]]:
+        """直接从相似度结果构建合并组（不生成IF名对列表）
+        
+        参数:
+            if_dict: IF名称到IFInfo的映射
+            result: 该场景的相似度计算结果
+            threshold: 相似度阈值
+            
+        返回:
+            分组结果，键为代表IF名（组内最先出现的IF），值为该组的IF名称列表
+        """
+        if_names = list(if_dict.keys())
+        uf = ArrayUnionFind(len(if_names))
+        
+        if threshold <= 0:
+            # 所有IF对（包括相似度为0的对）都满足阈值，全部合并为一组
+            uf.union_edges((0, i) for i in range(1, len(if_names)))
+            return self._named_groups(uf, if_names)
+        
+        # 结果中的序号转换为if_dict中的序号，逐块合并相似度超过阈值的IF对
+        positions = {if_name: i for i, if_name in enumerate(if_names)}
+        order = [positions[if_name] for if_name in result.if_names]
+        uf.union_edges((order[i], order[j]) for i, j in result.iter_edges(threshold))
+        
+        return self._named_groups(uf, if_names)
     
     def assign_group_ids(
         self, 
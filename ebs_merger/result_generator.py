@@ -6,6 +6,7 @@
 import pandas as pd
 from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
+from ebs_merger.data_loader import IFRowIndex
 from ebs_merger.if_grouper import IFInfo
 from ebs_merger.ai_generator import AIGenerator
 
@@ -47,7 +48,8 @@ class ResultGenerator:
         output_path: str,
         input_df: Optional[pd.DataFrame] = None,
         module: str = "",
-        scenario: str = ""
+        scenario: str = "",
+        row_index: Optional[IFRowIndex] = None
     ) -> Dict[str, str]:
         """生成输出Excel文件
         
@@ -59,6 +61,7 @@ class ResultGenerator:
             input_df: 输入数据DataFrame（使用AI时需要）
             module: 模块名（如FI、SD）
             scenario: 业务场景名
+            row_index: input_df的IF行索引（省略时在此建立）
             
         返回:
             AI生成的合并IF名字典 {group_id: merged_name}
@@ -70,6 +73,9 @@ class ResultGenerator:
                 groups[group_id] = []
             groups[group_id].append(if_name)
         
+        # 组内相似对的邻接索引（用于生成根据）
+        reason_index = self.build_reason_index(group_assignments, similar_pairs)
+        
         # 生成输出行
         output_rows = []
         row_no = 1
@@ -78,9 +84,11 @@ class ResultGenerator:
         merged_if_names_cache = {}
         if self.use_ai and input_df is not None:
             print("  AIでコンテンツを生成しています...")
+            if row_index is None:
+                row_index = IFRowIndex(input_df)
             try:
                 # すべてのIFの概要と代表項目名を一括生成
-                all_if_info = self.ai_generator.generate_all_if_info(if_dict, input_df)
+                all_if_info = self.ai_generator.generate_all_if_info(if_dict, input_df, row_index)
                 print(f"    ✓ {len(all_if_info)} 個のIF情報を一括生成しました")
             except Exception as e:
                 print(f"    警告：AI一括生成に失敗しました: {e}")
@@ -91,7 +99,7 @@ class ResultGenerator:
                 if len(group_members) > 1:
                     try:
                         merged_name = self.ai_generator.generate_merged_if_name(
-                            group_members, if_dict, input_df
+                            group_members, if_dict, input_df, row_index
                         )
                         merged_if_names_cache[group_id] = merged_name
                         print(f"    ✓ マージIF名を生成しました: {group_id} -> {merged_name}")
@@ -127,7 +135,8 @@ class ResultGenerator:
             grouping_reason = self.create_grouping_reason(
                 if_name, 
                 group_members, 
-                similar_pairs
+                similar_pairs,
+                reason_index
             )
             
             # 创建输出行
@@ -192,11 +201,35 @@ class ResultGenerator:
         # 使用"_"连接所有IF名称
         return "_".join(if_names)
     
+    def build_reason_index(
+        self,
+        group_assignments: Dict[str, str],
+        similar_pairs: List[Tuple[str, str, float]]
+    ) -> Dict[str, List[Tuple[str, float]]]:
+        """グルーピング根拠用の隣接インデックスを生成（類似IFペアを1回だけ走査）
+        
+        パラメータ:
+            group_assignments: IFからグルーピングIDへのマッピング
+            similar_pairs: 類似IFペアのリスト
+            
+        戻り値:
+            {IF名: [(同じグループの類似IF名, 類似度)]}（similar_pairsの順序）
+        """
+        reason_index = {}
+        for if1, if2, similarity in similar_pairs:
+            group_id = group_assignments.get(if1)
+            if group_id is None or group_assignments.get(if2) != group_id:
+                continue
+            reason_index.setdefault(if1, []).append((if2, similarity))
+            reason_index.setdefault(if2, []).append((if1, similarity))
+        return reason_index
+    
     def create_grouping_reason(
         self, 
         if_name: str, 
         group_members: List[str],
-        similar_pairs: List[Tuple[str, str, float]]
+        similar_pairs: List[Tuple[str, str, float]],
+        reason_index: Optional[Dict[str, List[Tuple[str, float]]]] = None
     ) -> str:
         """グルーピング根拠の説明を生成
         
@@ -204,6 +237,8 @@ class ResultGenerator:
             if_name: 現在のIF名
             group_members: 同じグループのすべてのIF名
             similar_pairs: 類似IFペアのリスト
+            reason_index: build_reason_indexで生成した隣接インデックス
+                （省略時はsimilar_pairsを走査）
             
         戻り値:
             根拠の説明（例：「IF2と類似度85%、IF3と類似度82%」）
@@ -212,12 +247,18 @@ class ResultGenerator:
             return "独立IF、マージ不要"
         
         # 現在のIFに関連する類似度情報を検索
-        reasons = []
-        for if1, if2, similarity in similar_pairs:
-            if if1 == if_name and if2 in group_members:
-                reasons.append(f"「{if2}」と類似度{similarity:.1%}")
-            elif if2 == if_name and if1 in group_members:
-                reasons.append(f"「{if1}」と類似度{similarity:.1%}")
+        if reason_index is not None:
+            reasons = [
+                f"「{other}」と類似度{similarity:.1%}"
+                for other, similarity in reason_index.get(if_name, [])
+            ]
+        else:
+            reasons = []
+            for if1, if2, similarity in similar_pairs:
+                if if1 == if_name and if2 in group_members:
+                    reasons.append(f"「{if2}」と類似度{similarity:.1%}")
+                elif if2 == if_name and if1 in group_members:
+                    reasons.append(f"「{if1}」と類似度{similarity:.1%}")
         
         if reasons:
             return "、".join(reasons)
@@ -3,13 +3,108 @@
 负责计算IF之间的相似度。
 """
 
-from typing import Dict, List, Tuple
-from ebs_merger.if_grouper import IFInfo
+import os
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from ebs_merger.engine_planner import EnginePlan, EnginePlanner
+from ebs_merger.if_grouper import IFGrouper, IFInfo
+from ebs_merger.similarity_engines import (
+    BitsetEngine,
+    BlockedIndexEngine,
+    BruteForceEngine,
+    InvertedIndexEngine,
+    MinHashLSHEngine,
+    PrefixFilterEngine,
+    SparseMatrixEngine,
+)
+from ebs_merger.similarity_matrix import MemmapMatrix
+from ebs_merger.similarity_result import SimilarityResult
+from ebs_merger.similarity_store import SimilarityStore
 
 
 class SimilarityCalculator:
     """相似度计算器"""
     
+    # 可选的计算引擎（除近似引擎外结果完全相同，只是计算方式不同）
+    ENGINES = {
+        "brute": BruteForceEngine,
+        "index": InvertedIndexEngine,
+        "sparse": SparseMatrixEngine,
+        "prefix": PrefixFilterEngine,
+        "minhash": MinHashLSHEngine,
+        "bitset": BitsetEngine,
+    }
+    
+    # 结果为近似值的引擎（可能漏掉部分相似IF对）
+    APPROXIMATE_ENGINES = {"minhash"}
+    
+    # 按场景自动选择精确引擎
+    AUTO_ENGINE = "auto"
+    
+    def __init__(
+        self,
+        engine: str = "index",
+        lsh_bands: int = 32,
+        lsh_rows: int = 4,
+        workers: int = 1
+    ):
+        """初始化相似度计算器
+        
+        参数:
+            engine: 计算引擎名称（brute: 两两比较, index: 倒排索引, sparse: 稀疏矩阵乘积,
+                prefix: 前缀过滤阈值连接，只在按阈值筛选时生效, minhash: MinHash/LSH近似,
+                bitset: 位集合AND + popcount, auto: 每次计算时按场景的规模和形状选择精确引擎）
+            lsh_bands: minhash引擎的band数（越大召回率越高）
+            lsh_rows: minhash引擎每个band的行数（越小召回率越高）
+            workers: index引擎计算完整矩阵时的进程数（1为单进程，0为CPU核数）
+        """
+        if engine not in self.ENGINES and engine != self.AUTO_ENGINE:
+            raise ValueError(
+                f"engine must be one of {sorted(self.ENGINES) + [self.AUTO_ENGINE]}, got '{engine}'"
+            )
+        if workers < 0:
+            raise ValueError(f"workers must be >= 0, got {workers}")
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.lsh_bands = lsh_bands
+        self.lsh_rows = lsh_rows
+        self._grouper = IFGrouper()
+        self.planner = EnginePlanner(self.workers, BlockedIndexEngine.MIN_PARALLEL_IFS)
+        self._engines = {}
+        self._engine = None if engine == self.AUTO_ENGINE else self._get_engine(engine)
+    
+    def _get_engine(self, engine: str):
+        """返回指定名称的引擎实例（同一名称只创建一次）"""
+        if engine not in self._engines:
+            if engine == "minhash":
+                self._engines[engine] = MinHashLSHEngine(bands=self.lsh_bands, rows=self.lsh_rows)
+            elif engine == "index" and self.workers > 1:
+                self._engines[engine] = BlockedIndexEngine(self.workers)
+            else:
+                self._engines[engine] = self.ENGINES[engine]()
+        return self._engines[engine]
+    
+    def plan(self, if_dict: Dict[str, IFInfo], threshold: Optional[float] = None) -> EnginePlan:
+        """估算各精确引擎计算该场景的成本，返回自动选择的结果（不进行计算）
+        
+        参数:
+            if_dict: IF名称到IFInfo的映射
+            threshold: 只需要相似度>=threshold的对时指定（None表示需要完整矩阵）
+            
+        返回:
+            EnginePlan
+        """
+        representative_sets = [
+            if_dict[members[0]].field_pairs
+            for members in self._grouper.find_identical_ifs(if_dict).values()
+        ]
+        return self.planner.plan(representative_sets, threshold)
+    
+    @property
+    def is_approximate(self) -> bool:
+        """当前引擎的结果是否为近似值"""
+        return self.engine in self.APPROXIMATE_ENGINES
+    
     def calculate_similarity(self, if1: IFInfo, if2: IFInfo, mode:str = "max") -> float:
         """计算两个IF之间的相似度
         
@@ -63,6 +158,130 @@ class SimilarityCalculator:
         # 确保相似度在[0.0, 1.0]范围内
         return max(0.0, min(1.0, similarity))
     
+    def compute(
+        self,
+        if_dict: Dict[str, IFInfo],
+        mode: str = "max",
+        threshold: Optional[float] = None,
+        store: Optional[SimilarityStore] = None,
+        fingerprints: Optional[Dict[str, str]] = None
+    ) -> SimilarityResult:
+        """一次计算场景内所有IF对的共同字段对数量
+        
+        分组（按阈值筛选）、相似度矩阵（完整矩阵和詳細値）都由该结果得到，
+        不需要对同一场景重复计算。
+        
+        参数:
+            if_dict: IF名称到IFInfo的映射
+            mode: 相似度算出方法（max或avg）
+            threshold: 只需要相似度>=threshold的对时指定。引擎支持阈值连接时
+                结果中只包含这些对（不能用于输出完整矩阵）
+            store: 该场景的增量相似度存储（指定时只计算新增或变更的IF，阈值连接时不使用）
+            fingerprints: 各IF字段对集合的指纹 {IF名: 指纹}（使用store时必需）
+            
+        返回:
+            SimilarityResult对象（自动选择引擎时plan属性为EnginePlan）
+        """
+        if mode not in ["max", "avg"]:
+            raise ValueError(f"mode must be 'max' or 'avg', got '{mode}'")
+        if self.engine == "minhash" and mode == "max":
+            # LSH按Jaccard分桶，重叠系数（max）下召回率极低
+            raise ValueError("minhash engine only supports mode 'avg'")
+        
+        if_names = list(if_dict.keys())
+        field_sets = [if_info.field_pairs for if_info in if_dict.values()]
+        sizes = np.array([len(field_set) for field_set in field_sets], dtype=np.int64)
+        
+        # 字段对集合完全相同的IF只比较代表IF，之后再展开
+        positions = {if_name: i for i, if_name in enumerate(if_names)}
+        classes = [
+            np.array([positions[name] for name in members], dtype=np.int64)
+            for members in self._grouper.find_identical_ifs(if_dict).values()
+        ]
+        representative_sets = [field_sets[members[0]] for members in classes]
+        
+        # 自动选择时按代表IF的规模和形状决定引擎
+        plan = None
+        engine = self._engine
+        if engine is None:
+            plan = self.planner.plan(representative_sets, threshold)
+            engine = self._get_engine(plan.engine)
+        
+        use_threshold = threshold is not None and threshold > 0 and hasattr(engine, "threshold_overlaps")
+        if use_threshold:
+            rows, cols, common = engine.threshold_overlaps(representative_sets, threshold, mode)
+        elif store is not None:
+            rows, cols, common = store.overlap_counts(
+                [fingerprints[if_names[members[0]]] for members in classes],
+                representative_sets, engine
+            )
+        else:
+            rows, cols, common = engine.overlap_counts(representative_sets)
+        
+        if len(classes) < len(if_names):
+            rows, cols, common = self._expand_identical(
+                rows, cols, common, classes, sizes, threshold if use_threshold else None
+            )
+        
+        result = SimilarityResult(
+            if_names, sizes, rows, cols, common, mode,
+            threshold=threshold if use_threshold else None
+        )
+        result.plan = plan
+        return result
+    
+    @staticmethod
+    def _expand_identical(
+        rows: np.ndarray,
+        cols: np.ndarray,
+        common: np.ndarray,
+        classes: List[np.ndarray],
+        sizes: np.ndarray,
+        threshold: Optional[float]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """将代表IF之间的结果展开到所有同类IF
+        
+        参数:
+            rows, cols, common: 代表IF序号（classes中的下标）之间的共同数量
+            classes: 每类IF在原始顺序中的序号数组
+            sizes: 原始顺序中各IF的字段对数量
+            threshold: 阈值连接时的阈值（同类IF之间相似度为1.0）
+            
+        返回:
+            原始IF序号之间的(行号数组, 列号数组, 共同数量数组)，按(i, j)升序
+        """
+        class_sizes = np.array([len(members) for members in classes], dtype=np.int64)
+        class_starts = np.concatenate(([0], np.cumsum(class_sizes)[:-1]))
+        flat_members = np.concatenate(classes)
+        
+        # 不同类之间：代表IF对展开为两类成员的笛卡尔积
+        sizes_a = class_sizes[rows]
+        sizes_b = class_sizes[cols]
+        products = sizes_a * sizes_b
+        pair_index = np.repeat(np.arange(len(rows)), products)
+        local = np.arange(products.sum()) - np.repeat(np.cumsum(products) - products, products)
+        first = flat_members[class_starts[rows[pair_index]] + local // sizes_b[pair_index]]
+        second = flat_members[class_starts[cols[pair_index]] + local % sizes_b[pair_index]]
+        row_parts = [np.minimum(first, second)]
+        col_parts = [np.maximum(first, second)]
+        count_parts = [common[pair_index]]
+        
+        # 同类之间：共同数量等于字段对数量（相似度1.0，空集合除外）
+        if threshold is None or threshold <= 1.0:
+            for members in classes:
+                if len(members) < 2 or sizes[members[0]] == 0:
+                    continue
+                first, second = np.triu_indices(len(members), k=1)
+                row_parts.append(members[first])
+                col_parts.append(members[second])
+                count_parts.append(np.full(len(first), sizes[members[0]], dtype=np.int64))
+        
+        rows = np.concatenate(row_parts)
+        cols = np.concatenate(col_parts)
+        common = np.concatenate(count_parts)
+        order = np.lexsort((cols, rows))
+        return rows[order], cols[order], common[order]
+    
     def build_similarity_matrix(
         self, 
         if_dict: Dict[str, IFInfo], 
@@ -74,32 +293,12 @@ class SimilarityCalculator:
         参数:
             if_dict: IF名称到IFInfo的映射
             threshold: 相似度阈值
+            mode: 相似度算出方法（max或avg）
             
         返回:
             (IF1名称, IF2名称, 相似度)的列表，仅包含相似度>=threshold的对
         """
-        similar_pairs = []
-        
-        # 获取所有IF名称列表
-        if_names = list(if_dict.keys())
-        
-        # 两两比较所有IF
-        for i in range(len(if_names)):
-            for j in range(i + 1, len(if_names)):
-                if1_name = if_names[i]
-                if2_name = if_names[j]
-                
-                if1 = if_dict[if1_name]
-                if2 = if_dict[if2_name]
-                
-                # 计算相似度
-                similarity = self.calculate_similarity(if1, if2 ,mode)
-                
-                # 只保留超过阈值的对
-                if similarity >= threshold:
-                    similar_pairs.append((if1_name, if2_name, similarity))
-        
-        return similar_pairs
+        return self.compute(if_dict, mode, threshold).similar_pairs(threshold)
     
     def build_full_similarity_matrix(
         self, 
@@ -110,28 +309,29 @@ class SimilarityCalculator:
         
         参数:
             if_dict: IF名称到IFInfo的映射
+            mode: 相似度算出方法（max或avg）
             
         返回:
             (IF1名称, IF2名称, 相似度)的列表，包含所有IF对
         """
-        all_pairs = []
-        
-        # 获取所有IF名称列表
-        if_names = list(if_dict.keys())
+        return list(self.compute(if_dict, mode).iter_full_pairs())
+    
+    def write_full_similarity_matrix(
+        self,
+        if_dict: Dict[str, IFInfo],
+        directory: str,
+        mode: str = "max",
+        dtype: str = "float32"
+    ) -> MemmapMatrix:
+        """将完整相似度矩阵写入内存映射文件（不生成IF对列表）
         
-        # 两两比较所有IF
-        for i in range(len(if_names)):
-            for j in range(i + 1, len(if_names)):
-                if1_name = if_names[i]
-                if2_name = if_names[j]
-                
-                if1 = if_dict[if1_name]
-                if2 = if_dict[if2_name]
-                
-                # 计算相似度
-                similarity = self.calculate_similarity(if1, if2, mode)
-                
-                # 保留所有对（包括相似度为0的）
-                all_pairs.append((if1_name, if2_name, similarity))
-        
-        return all_pairs
+        参数:
+            if_dict: IF名称到IFInfo的映射
+            directory: 输出文件夹路径
+            mode: 相似度算出方法（max或avg）
+            dtype: 数据类型（float32或uint8百分比）
+            
+        返回:
+            MemmapMatrix（行列为IF名的升序）
+        """
+        return MemmapMatrix.write(self.compute(if_dict, mode), directory, sorted(if_dict.keys()), dtype)
@@ -0,0 +1,712 @@
+"""相似度计算引擎模块
+
+提供计算IF之间共同字段对数量的多种算法实现。
+所有引擎的输出格式相同：按(i, j)升序排列的(行号数组, 列号数组, 共同数量数组)，
+其中i < j，且只包含共同字段对数量大于0的IF对。
+"""
+
+import math
+import zlib
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Hashable, List, Set, Tuple
+
+import numpy as np
+
+
+OverlapCounts = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _to_arrays(rows: List[int], cols: List[int], counts: List[int]) -> OverlapCounts:
+    """将行号、列号和共同数量列表转换为numpy数组"""
+    return (
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(cols, dtype=np.int64),
+        np.asarray(counts, dtype=np.int64),
+    )
+
+
+class BruteForceEngine:
+    """暴力比较引擎：逐对计算字段对集合的交集"""
+
+    name = "brute"
+
+    def overlap_counts(self, field_sets: List[Set[Hashable]]) -> OverlapCounts:
+        """计算所有IF对的共同字段对数量
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，仅包含共同数量>0的对
+        """
+        rows, cols, counts = [], [], []
+        n = len(field_sets)
+        for i in range(n):
+            set_i = field_sets[i]
+            if not set_i:
+                continue
+            for j in range(i + 1, n):
+                common_count = len(set_i & field_sets[j])
+                if common_count:
+                    rows.append(i)
+                    cols.append(j)
+                    counts.append(common_count)
+        return _to_arrays(rows, cols, counts)
+
+
+class InvertedIndexEngine:
+    """倒排索引引擎：只比较至少共享一个字段对的IF
+
+    为每个字段对建立使用它的IF列表（倒排表），然后对每个IF只累加
+    倒排表中出现的其他IF的计数，完全不接触没有共同字段对的IF对。
+    """
+
+    name = "index"
+
+    def build_postings(self, field_sets: List[Set[Hashable]]) -> Dict[Hashable, List[int]]:
+        """构建字段对到IF序号列表的倒排索引
+
+        参数:
+            field_sets: 每个IF的字段对集合
+
+        返回:
+            {字段对: [IF序号, ...]}，序号升序
+        """
+        postings: Dict[Hashable, List[int]] = {}
+        for i, field_set in enumerate(field_sets):
+            for field in field_set:
+                postings.setdefault(field, []).append(i)
+        return postings
+
+    def overlap_counts(self, field_sets: List[Set[Hashable]]) -> OverlapCounts:
+        """通过倒排索引计算共享字段对的IF对的共同数量
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，仅包含共同数量>0的对
+        """
+        postings = self.build_postings(field_sets)
+
+        rows, cols, counts = [], [], []
+        for i, field_set in enumerate(field_sets):
+            counter = Counter()
+            for field in field_set:
+                posting = postings[field]
+                # 只统计序号大于i的IF，避免重复计算
+                start = bisect_right(posting, i)
+                if start < len(posting):
+                    counter.update(posting[start:])
+            for j in sorted(counter):
+                rows.append(i)
+                cols.append(j)
+                counts.append(counter[j])
+        return _to_arrays(rows, cols, counts)
+
+
+class SparseMatrixEngine:
+    """稀疏矩阵引擎：通过一次稀疏矩阵乘法得到所有IF对的共同数量
+
+    将每个IF的字段对编码为IF×字段对关联矩阵A的一行（值为1），
+    则A·Aᵀ的(i, j)元素即为IF i与IF j的共同字段对数量。
+    需要安装scipy。
+    """
+
+    name = "sparse"
+
+    def incidence_matrix(self, field_sets: List[Set[Hashable]]):
+        """构建IF×字段对的稀疏关联矩阵（CSR格式）
+
+        参数:
+            field_sets: 每个IF的字段对集合
+
+        返回:
+            scipy.sparse.csr_matrix，形状为(IF数, 字段对种类数)
+        """
+        try:
+            from scipy import sparse
+        except ImportError:
+            raise ImportError("sparseエンジンを使用するにはscipyをインストールしてください（pip install scipy）")
+
+        # 为每个字段对分配列号
+        vocabulary: Dict[Hashable, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+        for field_set in field_sets:
+            for field in field_set:
+                indices.append(vocabulary.setdefault(field, len(vocabulary)))
+            indptr.append(len(indices))
+
+        data = np.ones(len(indices), dtype=np.int32)
+        return sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(field_sets), len(vocabulary))
+        )
+
+    def overlap_counts(self, field_sets: List[Set[Hashable]]) -> OverlapCounts:
+        """通过稀疏矩阵乘积计算所有IF对的共同数量
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，仅包含共同数量>0的对
+        """
+        from scipy import sparse
+
+        incidence = self.incidence_matrix(field_sets)
+        # 共同数量矩阵，只取上三角（i < j）
+        counts = sparse.triu(incidence @ incidence.T, k=1).tocoo()
+
+        rows = counts.row.astype(np.int64)
+        cols = counts.col.astype(np.int64)
+        common = counts.data.astype(np.int64)
+
+        # 过滤可能存在的显式零值，并按(i, j)排序
+        nonzero = common > 0
+        rows, cols, common = rows[nonzero], cols[nonzero], common[nonzero]
+        order = np.lexsort((cols, rows))
+        return rows[order], cols[order], common[order]
+
+
+def _required_overlap(threshold: float, size1: int, size2: int, mode: str) -> int:
+    """相似度达到阈值所需的最小共同字段对数量（size1 <= size2）
+
+    为避免浮点误差导致漏掉边界上的对，计算时略微放宽（结果只会偏小）。
+    最终是否达到阈值由精确计算的相似度判断。
+    """
+    if mode == "max":
+        bound = threshold * size1
+    else:  # mode == "avg"
+        # (c/a + c/b) / 2 >= t  <=>  c >= 2t·a·b / (a + b)
+        bound = 2 * threshold * size1 * size2 / (size1 + size2)
+    return max(1, math.ceil(bound - 1e-9))
+
+
+def _pair_score(common: int, size1: int, size2: int, mode: str) -> float:
+    """计算单个IF对的相似度（与scores_from_counts的运算顺序一致）"""
+    if mode == "max":
+        similarity = common / min(size1, size2)
+    else:  # mode == "avg"
+        similarity = (common / size1 + common / size2) / 2
+    return max(0.0, min(1.0, similarity))
+
+
+class PrefixFilterEngine:
+    """前缀过滤引擎：只求相似度>=阈值的IF对的精确集合相似度连接
+
+    参考AllPairs/PPJoin：
+    - 字段对按全局出现频率升序排列（稀有的字段对在前）
+    - IF按字段对数量降序处理，较小的IF只用前缀探测已建索引的较大IF
+      （若共同数量>=α，前|x|-α+1个字段对中必有共同字段对）
+    - 大小过滤：avg模式下所需共同数量超过较小IF的数量时直接跳过
+    - 位置过滤：已匹配数量+剩余可能匹配数量不足α时剪枝
+    候选对最后用精确的交集数量验证，结果与两两比较完全一致。
+    """
+
+    name = "prefix"
+
+    def overlap_counts(self, field_sets: List[Set[Hashable]]) -> OverlapCounts:
+        """计算所有IF对的共同数量（完整矩阵无法剪枝，使用倒排索引）"""
+        return InvertedIndexEngine().overlap_counts(field_sets)
+
+    def threshold_overlaps(
+        self,
+        field_sets: List[Set[Hashable]],
+        threshold: float,
+        mode: str = "max"
+    ) -> OverlapCounts:
+        """只计算相似度>=threshold的IF对的共同数量
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+            threshold: 相似度阈值（>0）
+            mode: 相似度算出方法（max或avg）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，仅包含相似度>=threshold的对
+        """
+        # 字段对按全局频率升序编号（频率相同时按首次出现顺序）
+        frequency: Counter = Counter()
+        for field_set in field_sets:
+            frequency.update(field_set)
+        ranks = {field: rank for rank, (field, _) in enumerate(
+            sorted(frequency.items(), key=lambda item: item[1])
+        )}
+        records = [sorted(ranks[field] for field in field_set) for field_set in field_sets]
+        sizes = [len(record) for record in records]
+
+        # 按字段对数量降序处理，索引中只有数量不小于当前IF的IF
+        order = sorted((i for i in range(len(records)) if sizes[i]), key=lambda i: (-sizes[i], i))
+        index: Dict[int, List[Tuple[int, int]]] = {}
+
+        rows, cols, counts = [], [], []
+        for x in order:
+            record = records[x]
+            size_x = sizes[x]
+            prefix_length = size_x - _required_overlap(threshold, size_x, size_x, mode) + 1
+
+            # 候选IF -> 前缀中已匹配的数量（-1表示已剪枝）
+            candidates: Dict[int, int] = {}
+            for position in range(max(0, prefix_length)):
+                for y, y_position in index.get(record[position], ()):
+                    matched = candidates.get(y, 0)
+                    if matched < 0:
+                        continue
+                    required = _required_overlap(threshold, size_x, sizes[y], mode)
+                    # 大小过滤：共同数量不可能超过较小IF的数量
+                    if required > size_x:
+                        candidates[y] = -1
+                        continue
+                    # 位置过滤：剩余字段对全部匹配也达不到所需数量
+                    remaining = min(size_x - position - 1, sizes[y] - y_position - 1)
+                    if matched + 1 + remaining < required:
+                        candidates[y] = -1
+                        continue
+                    candidates[y] = matched + 1
+
+            # 验证候选对
+            for y, matched in candidates.items():
+                if matched <= 0:
+                    continue
+                common_count = len(field_sets[x] & field_sets[y])
+                if _pair_score(common_count, size_x, sizes[y], mode) >= threshold:
+                    rows.append(min(x, y))
+                    cols.append(max(x, y))
+                    counts.append(common_count)
+
+            # 将当前IF的全部字段对加入索引（供更小的IF探测）
+            for position, field in enumerate(record):
+                index.setdefault(field, []).append((x, position))
+
+        rows_array, cols_array, counts_array = _to_arrays(rows, cols, counts)
+        order_array = np.lexsort((cols_array, rows_array))
+        return rows_array[order_array], cols_array[order_array], counts_array[order_array]
+
+
+class MinHashLSHEngine:
+    """MinHash/LSH近似引擎：用于超大规模IF目录的探索性分析
+
+    为每个IF的字段对集合生成MinHash签名（bands×rows个哈希函数），
+    签名在任一band中完全一致的IF对成为候选对，候选对再用精确的交集数量验证。
+    没有成为候选的IF对视为相似度0，因此结果是近似的（只会漏掉，不会误报）。
+    两个IF成为候选的概率为 1 - (1 - J^rows)^bands（J为Jaccard相似度），
+    增加bands或减少rows可以提高召回率，但候选对也会增加。
+
+    召回率的限制：LSH按Jaccard相似度分桶，而avg模式的相似度不小于Jaccard
+    （例如avg=0.8的IF对Jaccard可能只有0.67），阈值附近的IF对比上式更容易漏掉。
+    max模式（重叠系数）下大小相差很大的IF对Jaccard很低，几乎不会成为候选，
+    因此SimilarityCalculator不允许minhash引擎与max模式一起使用。
+    """
+
+    name = "minhash"
+
+    # 梅森素数 2^61 - 1，用于通用哈希 (a·x + b) mod p
+    _PRIME = np.uint64((1 << 61) - 1)
+    _LOW_32 = np.uint64((1 << 32) - 1)
+    _LOW_29 = np.uint64((1 << 29) - 1)
+
+    def __init__(self, bands: int = 32, rows: int = 4, seed: int = 1):
+        """初始化MinHash/LSH引擎
+
+        参数:
+            bands: LSH的band数
+            rows: 每个band的行数（哈希函数数）
+            seed: 生成哈希函数的随机种子（固定种子保证结果可复现）
+        """
+        if bands < 1 or rows < 1:
+            raise ValueError(f"bands and rows must be positive, got bands={bands}, rows={rows}")
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        permutations = bands * rows
+        self._a = rng.integers(1, (1 << 61) - 1, size=permutations, dtype=np.uint64)
+        self._b = rng.integers(0, (1 << 61) - 1, size=permutations, dtype=np.uint64)
+
+    @classmethod
+    def _mod_prime(cls, values: np.ndarray) -> np.ndarray:
+        """对小于2^64的uint64值取 mod (2^61 - 1)（利用2^61 ≡ 1）"""
+        values = (values & cls._PRIME) + (values >> np.uint64(61))
+        return np.where(values >= cls._PRIME, values - cls._PRIME, values)
+
+    def universal_hash(self, values: np.ndarray) -> np.ndarray:
+        """计算所有哈希函数的 (a·x + b) mod (2^61 - 1)
+
+        a为61位，直接相乘会超出uint64，因此把a拆成高29位和低32位分别相乘：
+        a·x = a_hi·x·2^32 + a_lo·x，其中x < 2^32，各部分乘积都小于2^64，
+        乘以2^32后再利用2^61 ≡ 1取模。
+
+        参数:
+            values: 字段对的32位哈希值（uint64数组）
+
+        返回:
+            形状为(len(values), 哈希函数数)的uint64数组，值小于2^61 - 1
+        """
+        x = values[:, None]
+        high = self._mod_prime(x * (self._a >> np.uint64(32)))
+        low = self._mod_prime(x * (self._a & self._LOW_32))
+        # high·2^32 = (high >> 29)·2^61 + (high的低29位)·2^32 ≡ (high >> 29) + (high的低29位) << 32
+        shifted = (high >> np.uint64(29)) + ((high & self._LOW_29) << np.uint64(32))
+        return self._mod_prime(self._mod_prime(shifted + low) + self._b)
+
+    @staticmethod
+    def _token_hash(field: Hashable) -> int:
+        """字段对的32位哈希（不依赖Python的随机化hash，结果可复现）"""
+        return zlib.crc32(repr(field).encode("utf-8"))
+
+    def signatures(self, field_sets: List[Set[Hashable]]) -> np.ndarray:
+        """计算所有IF的MinHash签名
+
+        参数:
+            field_sets: 每个IF的字段对集合
+
+        返回:
+            形状为(IF数, bands×rows)的uint64数组（空集合的签名为全最大值）
+        """
+        permutations = self.bands * self.rows
+        signatures = np.full((len(field_sets), permutations), np.iinfo(np.uint64).max, dtype=np.uint64)
+
+        token_hashes: Dict[Hashable, int] = {}
+        for i, field_set in enumerate(field_sets):
+            if not field_set:
+                continue
+            values = np.fromiter(
+                (token_hashes.setdefault(field, self._token_hash(field)) for field in field_set),
+                dtype=np.uint64,
+                count=len(field_set)
+            )
+            signatures[i] = self.universal_hash(values).min(axis=0)
+        return signatures
+
+    def candidate_pairs(self, field_sets: List[Set[Hashable]]) -> np.ndarray:
+        """通过LSH分桶得到候选IF对
+
+        参数:
+            field_sets: 每个IF的字段对集合
+
+        返回:
+            候选对的键数组（i·n + j，i < j），升序且无重复
+        """
+        n = len(field_sets)
+        signatures = self.signatures(field_sets)
+        non_empty = [i for i, field_set in enumerate(field_sets) if field_set]
+
+        keys: List[np.ndarray] = []
+        for band in range(self.bands):
+            band_values = signatures[:, band * self.rows:(band + 1) * self.rows]
+            buckets: Dict[bytes, List[int]] = {}
+            for i in non_empty:
+                buckets.setdefault(band_values[i].tobytes(), []).append(i)
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                members_array = np.asarray(members, dtype=np.int64)
+                first, second = np.triu_indices(len(members_array), k=1)
+                keys.append(members_array[first] * n + members_array[second])
+
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(keys))
+
+    def _verified_overlaps(
+        self,
+        field_sets: List[Set[Hashable]],
+        threshold: float = None,
+        mode: str = "max"
+    ) -> OverlapCounts:
+        """精确验证候选对，可选按阈值筛选"""
+        n = len(field_sets)
+        rows, cols, counts = [], [], []
+        for key in self.candidate_pairs(field_sets).tolist():
+            i, j = divmod(key, n)
+            common_count = len(field_sets[i] & field_sets[j])
+            if not common_count:
+                continue
+            if threshold is not None and \
+                    _pair_score(common_count, len(field_sets[i]), len(field_sets[j]), mode) < threshold:
+                continue
+            rows.append(i)
+            cols.append(j)
+            counts.append(common_count)
+        return _to_arrays(rows, cols, counts)
+
+    def overlap_counts(self, field_sets: List[Set[Hashable]]) -> OverlapCounts:
+        """计算LSH候选对的共同数量（非候选对视为0）
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，按(i, j)升序
+        """
+        return self._verified_overlaps(field_sets)
+
+    def threshold_overlaps(
+        self,
+        field_sets: List[Set[Hashable]],
+        threshold: float,
+        mode: str = "max"
+    ) -> OverlapCounts:
+        """只返回验证后相似度>=threshold的候选对
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+            threshold: 相似度阈值
+            mode: 相似度算出方法（max或avg）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，按(i, j)升序
+        """
+        return self._verified_overlaps(field_sets, threshold, mode)
+
+
+def _popcount(blocks: np.ndarray) -> np.ndarray:
+    """计算uint64数组每个元素中1的位数"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(blocks)
+    # numpy<2.0：按字节查表
+    table = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+    as_bytes = blocks.view(np.uint8).reshape(blocks.shape + (8,))
+    return table[as_bytes].sum(axis=-1, dtype=np.uint64)
+
+
+class BitsetEngine:
+    """位集合引擎：用AND + popcount计算共同数量
+
+    在场景的字段对词表上把每个IF编码为uint64块组成的位集合，
+    共同字段对数量 = popcount(位集合1 AND 位集合2)。
+    计算量与IF对数×词表大小成正比，适合IF之间共享大部分表和字段的密集场景。
+    """
+
+    name = "bitset"
+
+    def pack(self, field_sets: List[Set[Hashable]]) -> np.ndarray:
+        """将所有IF的字段对集合编码为位集合矩阵
+
+        参数:
+            field_sets: 每个IF的字段对集合
+
+        返回:
+            形状为(IF数, ceil(词表大小/64))的uint64数组
+        """
+        vocabulary: Dict[Hashable, int] = {}
+        row_ids: List[int] = []
+        field_ids: List[int] = []
+        for i, field_set in enumerate(field_sets):
+            for field in field_set:
+                row_ids.append(i)
+                field_ids.append(vocabulary.setdefault(field, len(vocabulary)))
+
+        words = max(1, (len(vocabulary) + 63) // 64)
+        blocks = np.zeros((len(field_sets), words), dtype=np.uint64)
+        if field_ids:
+            ids = np.asarray(field_ids, dtype=np.uint64)
+            np.bitwise_or.at(
+                blocks,
+                (np.asarray(row_ids, dtype=np.int64), (ids >> np.uint64(6)).astype(np.int64)),
+                np.uint64(1) << (ids & np.uint64(63))
+            )
+        return blocks
+
+    def overlap_counts(self, field_sets: List[Set[Hashable]]) -> OverlapCounts:
+        """通过位集合AND + popcount计算所有IF对的共同数量
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，仅包含共同数量>0的对
+        """
+        blocks = self.pack(field_sets)
+        row_parts, col_parts, count_parts = [], [], []
+        for i in range(len(field_sets) - 1):
+            if not field_sets[i]:
+                continue
+            counts = _popcount(blocks[i + 1:] & blocks[i]).sum(axis=1, dtype=np.int64)
+            nonzero = np.flatnonzero(counts)
+            if len(nonzero):
+                row_parts.append(np.full(len(nonzero), i, dtype=np.int64))
+                col_parts.append(nonzero + i + 1)
+                count_parts.append(counts[nonzero])
+
+        if not row_parts:
+            return _to_arrays([], [], [])
+        return np.concatenate(row_parts), np.concatenate(col_parts), np.concatenate(count_parts)
+
+
+# 多进程计算时各工作进程共享的CSR数组（由_attach_shared_arrays设置）
+_SHARED_ARRAYS: Dict[str, np.ndarray] = {}
+_SHARED_BLOCKS: List = []
+
+
+def _attach_shared_arrays(specs: Dict[str, Tuple[str, Tuple[int, ...], str]]):
+    """工作进程初始化：连接父进程创建的共享内存（每个进程只执行一次）"""
+    from multiprocessing import shared_memory
+
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        _SHARED_BLOCKS.append(block)
+        _SHARED_ARRAYS[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _count_row_block(start: int, stop: int) -> OverlapCounts:
+    """计算行号在[start, stop)范围内的IF与其后所有IF的共同数量"""
+    return _count_rows(
+        _SHARED_ARRAYS["indptr"],
+        _SHARED_ARRAYS["indices"],
+        _SHARED_ARRAYS["posting_indptr"],
+        _SHARED_ARRAYS["posting_indices"],
+        start,
+        stop
+    )
+
+
+def _count_rows(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    posting_indptr: np.ndarray,
+    posting_indices: np.ndarray,
+    start: int,
+    stop: int
+) -> OverlapCounts:
+    """基于CSR格式的字段对编号和倒排表，计算指定行范围的共同数量"""
+    row_parts, col_parts, count_parts = [], [], []
+    for i in range(start, stop):
+        fields = indices[indptr[i]:indptr[i + 1]]
+        if not len(fields):
+            continue
+        candidates = np.concatenate([
+            posting_indices[posting_indptr[field]:posting_indptr[field + 1]] for field in fields
+        ])
+        candidates = candidates[candidates > i]
+        if not len(candidates):
+            continue
+        cols, counts = np.unique(candidates, return_counts=True)
+        row_parts.append(np.full(len(cols), i, dtype=np.int64))
+        col_parts.append(cols.astype(np.int64))
+        count_parts.append(counts.astype(np.int64))
+
+    if not row_parts:
+        return _to_arrays([], [], [])
+    return np.concatenate(row_parts), np.concatenate(col_parts), np.concatenate(count_parts)
+
+
+class BlockedIndexEngine:
+    """多进程倒排索引引擎：按行块并行计算共同数量
+
+    在父进程中将字段对编码为整数，IF→字段对和字段对→IF两个CSR数组
+    放入共享内存，各工作进程只接收行号范围，不需要逐任务序列化IF集合。
+    各行块的结果按行号顺序合并，与单进程结果完全一致。
+    """
+
+    name = "index"
+
+    # IF数少于该值时多进程的开销大于收益，直接单进程计算
+    MIN_PARALLEL_IFS = 500
+
+    def __init__(self, workers: int, blocks_per_worker: int = 4):
+        """初始化多进程引擎
+
+        参数:
+            workers: 工作进程数
+            blocks_per_worker: 每个进程平均分到的行块数（用于负载均衡）
+        """
+        self.workers = workers
+        self.blocks_per_worker = blocks_per_worker
+
+    def encode(self, field_sets: List[Set[Hashable]]) -> Dict[str, np.ndarray]:
+        """将字段对集合编码为CSR数组
+
+        参数:
+            field_sets: 每个IF的字段对集合
+
+        返回:
+            {"indptr", "indices", "posting_indptr", "posting_indices"}
+        """
+        vocabulary: Dict[Hashable, int] = {}
+        indptr = np.zeros(len(field_sets) + 1, dtype=np.int64)
+        ids: List[int] = []
+        for i, field_set in enumerate(field_sets):
+            ids.extend(vocabulary.setdefault(field, len(vocabulary)) for field in field_set)
+            indptr[i + 1] = len(ids)
+        indices = np.asarray(ids, dtype=np.int32)
+
+        # 倒排表：按字段对编号排序（稳定排序保证IF序号升序）
+        owners = np.repeat(np.arange(len(field_sets), dtype=np.int32), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        posting_indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=len(vocabulary)), out=posting_indptr[1:])
+
+        return {
+            "indptr": indptr,
+            "indices": indices,
+            "posting_indptr": posting_indptr,
+            "posting_indices": owners[order],
+        }
+
+    def row_blocks(self, arrays: Dict[str, np.ndarray], block_count: int) -> List[Tuple[int, int]]:
+        """按估算工作量把行号切分为连续的行块
+
+        第i行的工作量近似为 字段对数量 × 其后的IF数。
+        """
+        n = len(arrays["indptr"]) - 1
+        work = np.diff(arrays["indptr"]) * (n - np.arange(n))
+        cumulative = np.cumsum(work, dtype=np.float64)
+        total = cumulative[-1] if n else 0
+        if total == 0:
+            return [(0, n)]
+        bounds = np.searchsorted(cumulative, total * np.arange(1, block_count) / block_count, side="right")
+        edges = [0] + sorted(set(int(b) for b in bounds if 0 < b < n)) + [n]
+        return list(zip(edges[:-1], edges[1:]))
+
+    def count_block(self, arrays: Dict[str, np.ndarray], start: int, stop: int) -> OverlapCounts:
+        """在当前进程中计算一个行块（行号在[start, stop)范围内的IF与其后所有IF）的共同数量"""
+        return _count_rows(
+            arrays["indptr"], arrays["indices"],
+            arrays["posting_indptr"], arrays["posting_indices"],
+            start, stop
+        )
+
+    def overlap_counts(self, field_sets: List[Set[Hashable]]) -> OverlapCounts:
+        """多进程计算所有IF对的共同数量
+
+        参数:
+            field_sets: 每个IF的字段对集合（按IF顺序）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，仅包含共同数量>0的对
+        """
+        if self.workers <= 1 or len(field_sets) < self.MIN_PARALLEL_IFS:
+            return InvertedIndexEngine().overlap_counts(field_sets)
+
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+
+        arrays = self.encode(field_sets)
+        blocks = self.row_blocks(arrays, self.workers * self.blocks_per_worker)
+
+        shared = []
+        try:
+            specs = {}
+            for key, array in arrays.items():
+                block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                shared.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                specs[key] = (block.name, array.shape, array.dtype.str)
+
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_attach_shared_arrays,
+                initargs=(specs,)
+            ) as executor:
+                futures = [executor.submit(_count_row_block, start, stop) for start, stop in blocks]
+                # 按行块顺序合并，保证结果与单进程一致
+                results = [future.result() for future in futures]
+        finally:
+            for block in shared:
+                block.close()
+                block.unlink()
+
+        return tuple(np.concatenate(parts) for parts in zip(*results))
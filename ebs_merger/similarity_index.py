@@ -0,0 +1,242 @@
+"""相似度索引模块
+
+将一个或多个输入文件中所有IF的字段对构建为倒排索引并保存到磁盘，
+加载时以内存映射方式打开，不重新读取输入文件、不与全部IF两两比较，
+即可查询与新IF最相似的前k个已有IF。
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ebs_merger.data_loader import DataLoader
+from ebs_merger.if_grouper import IFGrouper, IFInfo
+from ebs_merger.similarity_result import scores_from_counts
+
+
+class SimilarityIndex:
+    """保存在磁盘上的IF相似度索引
+
+    索引文件夹的内容：
+        meta.json: 格式版本和输入文件列表
+        ifs.json: 各IF的名称、所属输入文件和文書管理番号（序号即IF的编号）
+        fields.npy: 字段对键（"EBSテーブルID\\x1f項目ID"）的有序数组，位置即字段编号
+        sizes.npy: 各IF的字段对数量
+        indptr.npy / postings.npy: 字段编号到IF编号列表的倒排表（CSR格式）
+
+    数组文件以内存映射方式加载，查询时只读取查询IF的字段对对应的倒排表。
+    相似度的定义（max/avg）与SimilarityCalculator相同。
+    """
+
+    # 索引格式变更时递增
+    VERSION = 1
+
+    # 字段对键中EBSテーブルID与項目ID的分隔符
+    KEY_SEPARATOR = "\x1f"
+
+    def __init__(self, index_dir: str):
+        """以内存映射方式加载索引
+
+        参数:
+            index_dir: 索引文件夹路径
+
+        异常:
+            FileNotFoundError: 索引文件夹或索引文件不存在
+            ValueError: 索引格式版本不一致
+        """
+        self.index_dir = Path(index_dir)
+        meta_path = self.index_dir / "meta.json"
+        if not meta_path.exists():
+            raise FileNotFoundError(f"错误：找不到相似度索引 '{self.index_dir}'")
+        with open(meta_path, encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != self.VERSION:
+            raise ValueError(
+                f"错误：相似度索引的格式版本不一致（{self.meta.get('version')}），请重新构建索引"
+            )
+
+        with open(self.index_dir / "ifs.json", encoding='utf-8') as f:
+            ifs = json.load(f)
+        self.if_names: List[str] = ifs['if_names']
+        self.if_sources: List[int] = ifs['sources']
+        self.doc_numbers: List[str] = ifs['doc_numbers']
+        self.sources: List[str] = self.meta['sources']
+
+        self.fields = np.load(self.index_dir / "fields.npy", mmap_mode='r')
+        self.sizes = np.load(self.index_dir / "sizes.npy", mmap_mode='r')
+        self.indptr = np.load(self.index_dir / "indptr.npy", mmap_mode='r')
+        self.postings = np.load(self.index_dir / "postings.npy", mmap_mode='r')
+
+    def __len__(self) -> int:
+        """索引中的IF数"""
+        return len(self.if_names)
+
+    @classmethod
+    def field_key(cls, table_id: str, item_id: str) -> str:
+        """返回字段对在索引中的键"""
+        return f"{table_id}{cls.KEY_SEPARATOR}{item_id}"
+
+    @classmethod
+    def build(
+        cls,
+        input_files: Sequence[str],
+        index_dir: str,
+        loader: Optional[DataLoader] = None
+    ) -> "SimilarityIndex":
+        """读取输入文件并构建、保存相似度索引
+
+        参数:
+            input_files: 输入文件路径列表（.xlsx、.csv、.tsv、.parquet）
+            index_dir: 索引文件夹路径（已有的索引会被覆盖）
+            loader: 数据加载器（省略时使用默认设置）
+
+        返回:
+            加载后的SimilarityIndex
+        """
+        loader = loader or DataLoader()
+        grouper = IFGrouper()
+
+        if_names, if_sources, doc_numbers = [], [], []
+        field_lists = []
+        for source, input_file in enumerate(input_files):
+            if_dict = grouper.group_by_if(loader.load_file(str(input_file)))
+            for if_name, if_info in if_dict.items():
+                if_names.append(if_name)
+                if_sources.append(source)
+                doc_numbers.append(if_info.doc_number)
+                field_lists.append(np.fromiter(if_info.field_pairs, dtype=np.int64, count=len(if_info.field_pairs)))
+
+        # 字段编号改为键的字典序，查询时可以在fields.npy上二分查找
+        vocabulary = grouper.vocabulary
+        keys = np.array(
+            [cls.field_key(*vocabulary.pair(field_id)) for field_id in range(len(vocabulary))],
+            dtype=str
+        )
+        if len(keys) == 0:
+            keys = np.array([], dtype='<U1')
+        order = np.argsort(keys, kind='stable')
+        renumber = np.empty(len(keys), dtype=np.int64)
+        renumber[order] = np.arange(len(keys), dtype=np.int64)
+
+        sizes = np.array([len(fields) for fields in field_lists], dtype=np.int32)
+        if field_lists:
+            field_ids = renumber[np.concatenate(field_lists)]
+        else:
+            field_ids = np.array([], dtype=np.int64)
+        if_ids = np.repeat(np.arange(len(if_names), dtype=np.int32), sizes)
+        # 倒排表按(字段编号, IF编号)排序
+        posting_order = np.lexsort((if_ids, field_ids))
+        postings = if_ids[posting_order]
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(field_ids, minlength=len(keys)), out=indptr[1:])
+
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        # 先删除已有的meta.json：重新构建中途失败时，不会留下旧meta.json与新旧混合的数组组成的可加载索引
+        (index_dir / "meta.json").unlink(missing_ok=True)
+        # 各文件经由临时文件替换，正在以内存映射方式读取旧索引的进程不受影响
+        for name, array in (
+            ("fields.npy", keys[order]), ("sizes.npy", sizes), ("indptr.npy", indptr), ("postings.npy", postings)
+        ):
+            cls._replace(index_dir / name, lambda f, array=array: np.save(f, array))
+        ifs = {'if_names': if_names, 'sources': if_sources, 'doc_numbers': doc_numbers}
+        cls._replace(
+            index_dir / "ifs.json", lambda f: f.write(json.dumps(ifs, ensure_ascii=False).encode('utf-8'))
+        )
+        # meta.json最后写入，写入后索引才可以加载
+        meta = {'version': cls.VERSION, 'sources': [str(input_file) for input_file in input_files]}
+        cls._replace(
+            index_dir / "meta.json", lambda f: f.write(json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
+        )
+        return cls(str(index_dir))
+
+    @staticmethod
+    def _replace(path: Path, writer):
+        """经由临时文件原子地写入索引文件
+
+        参数:
+            path: 写入的文件路径
+            writer: 接收二进制文件对象并写入内容的函数
+        """
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, 'wb') as f:
+                writer(f)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _field_ids(self, field_pairs: Iterable[Tuple[str, str]]) -> np.ndarray:
+        """返回索引中已有字段对的字段编号（索引中没有的字段对被忽略）"""
+        keys = np.array([self.field_key(table_id, item_id) for table_id, item_id in field_pairs], dtype=str)
+        if len(keys) == 0 or len(self.fields) == 0:
+            return np.array([], dtype=np.int64)
+        positions = np.searchsorted(self.fields, keys)
+        found = positions < len(self.fields)
+        found[found] = self.fields[positions[found]] == keys[found]
+        return positions[found]
+
+    def query(
+        self,
+        field_pairs: Iterable[Tuple[str, str]],
+        k: int = 10,
+        mode: str = "max"
+    ) -> List[Dict]:
+        """查询与给定字段对集合最相似的前k个IF
+
+        参数:
+            field_pairs: 查询IF的(EBSテーブルID, 項目ID)对（已去除空格）
+            k: 返回的IF数
+            mode: 相似度算出方法（max或avg）
+
+        返回:
+            按相似度降序（相同时按索引中的顺序）排列的字典列表，
+            每项包含IF名、入力ファイル、文書管理番号、類似度、共通項目数。
+            没有共同字段对的IF不包含在结果中
+        """
+        if mode not in ["max", "avg"]:
+            raise ValueError(f"mode must be 'max' or 'avg', got '{mode}'")
+
+        field_pairs = set(field_pairs)
+        field_ids = self._field_ids(field_pairs)
+        if len(field_ids) == 0 or k <= 0:
+            return []
+
+        # 合并查询字段对的倒排表，统计每个IF的共同字段对数量
+        starts, stops = self.indptr[field_ids], self.indptr[field_ids + 1]
+        candidates = np.concatenate([self.postings[start:stop] for start, stop in zip(starts, stops)])
+        if_ids, common = np.unique(candidates, return_counts=True)
+
+        scores = scores_from_counts(
+            common, np.full(len(if_ids), len(field_pairs)), self.sizes[if_ids], mode
+        )
+        top = np.lexsort((if_ids, -scores))[:k]
+        return [
+            {
+                'IF名': self.if_names[if_id],
+                '入力ファイル': Path(self.sources[self.if_sources[if_id]]).name,
+                '文書管理番号': self.doc_numbers[if_id],
+                '類似度': float(score),
+                '共通項目数': int(count),
+            }
+            for if_id, score, count in zip(
+                if_ids[top].tolist(), scores[top].tolist(), common[top].tolist()
+            )
+        ]
+
+    def query_if(self, if_info: IFInfo, grouper: IFGrouper, k: int = 10, mode: str = "max") -> List[Dict]:
+        """查询与一个IF最相似的前k个IF
+
+        参数:
+            if_info: 查询的IF（字段对ID属于grouper的词表）
+            grouper: 读取查询IF时使用的IFGrouper
+            k: 返回的IF数
+            mode: 相似度算出方法（max或avg）
+
+        返回:
+            与query相同
+        """
+        return self.query(grouper.vocabulary.decode(if_info.field_pairs), k, mode)
@@ -0,0 +1,132 @@
+"""内存映射相似度矩阵模块
+
+将一个场景的完整相似度方阵写入磁盘上的.npy文件（float32或uint8百分比），
+并保存IF名称索引。读取时以内存映射方式打开，按行块读取，不需要把整个矩阵放入内存。
+"""
+
+import json
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ebs_merger.similarity_result import SimilarityResult
+
+
+class MemmapMatrix:
+    """保存在磁盘上的完整相似度方阵
+
+    文件夹的内容：
+        index.json: IF名称（行列顺序）、相似度算出方法和数据类型
+        scores.npy: 按mode计算的相似度方阵（对称，对角线为0）
+        directional.npy: 定向相似度方阵（行IF为分母，類似度詳細値）
+
+    数据类型为float32时保存相似度本身，uint8时保存四舍五入后的百分比（0-100）。
+    """
+
+    # 可选的数据类型
+    DTYPES = {"float32": np.float32, "uint8": np.uint8}
+
+    # 写入时每块使用的内存上限（元素数）
+    BLOCK_ELEMENTS = 4 * 1024 * 1024
+
+    def __init__(self, directory: str):
+        """以内存映射方式打开矩阵
+
+        参数:
+            directory: write()输出的文件夹路径
+
+        异常:
+            FileNotFoundError: 文件夹或索引文件不存在
+        """
+        self.directory = Path(directory)
+        index_path = self.directory / "index.json"
+        if not index_path.exists():
+            raise FileNotFoundError(f"错误：找不到相似度矩阵 '{self.directory}'")
+        with open(index_path, encoding='utf-8') as f:
+            index = json.load(f)
+        self.if_names: List[str] = index['if_names']
+        self.mode: str = index['mode']
+        self.dtype: str = index['dtype']
+        self.scores = np.load(self.directory / "scores.npy", mmap_mode='r')
+        self.directional = np.load(self.directory / "directional.npy", mmap_mode='r')
+
+    def __len__(self) -> int:
+        """IF数"""
+        return len(self.if_names)
+
+    @classmethod
+    def write(
+        cls,
+        result: SimilarityResult,
+        directory: str,
+        if_names: Optional[Sequence[str]] = None,
+        dtype: str = "float32"
+    ) -> "MemmapMatrix":
+        """将相似度结果按行块写入内存映射文件
+
+        参数:
+            result: 该场景的相似度计算结果（需包含所有有共同字段对的IF对）
+            directory: 输出文件夹路径
+            if_names: 矩阵行列的IF名称顺序（省略时为结果中的顺序）
+            dtype: 数据类型（float32或uint8）
+
+        返回:
+            打开后的MemmapMatrix
+        """
+        if dtype not in cls.DTYPES:
+            raise ValueError(f"dtype must be one of {sorted(cls.DTYPES)}, got '{dtype}'")
+        if result.threshold is not None:
+            raise ValueError("full matrix requires a result computed without threshold join")
+        if_names = list(if_names if if_names is not None else result.if_names)
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        n = len(if_names)
+        block_rows = max(1, cls.BLOCK_ELEMENTS // max(n, 1))
+        for file_name, directional in (("scores.npy", False), ("directional.npy", True)):
+            matrix = np.lib.format.open_memmap(
+                directory / file_name, mode='w+', dtype=cls.DTYPES[dtype], shape=(n, n)
+            )
+            for start, block in result.iter_row_blocks(if_names, block_rows, directional):
+                if dtype == "uint8":
+                    block = np.rint(block * 100)
+                matrix[start:start + len(block)] = block
+            matrix.flush()
+            del matrix
+
+        with open(directory / "index.json", 'w', encoding='utf-8') as f:
+            json.dump({'if_names': if_names, 'mode': result.mode, 'dtype': dtype}, f, ensure_ascii=False)
+        return cls(str(directory))
+
+    def row_block(self, start: int, stop: int, directional: bool = False) -> np.ndarray:
+        """读取行块的相似度
+
+        参数:
+            start: 起始行号
+            stop: 结束行号（不含）
+            directional: True时读取定向相似度
+
+        返回:
+            形状为(stop - start, IF数)的float64数组（相似度0.0-1.0）
+        """
+        matrix = self.directional if directional else self.scores
+        block = np.asarray(matrix[start:stop], dtype=np.float64)
+        if self.dtype == "uint8":
+            block /= 100
+        return block
+
+    def tiles(self, tile_rows: Optional[int] = None, directional: bool = False) -> Iterator[Tuple[int, np.ndarray]]:
+        """按行块逐块读取整个矩阵
+
+        参数:
+            tile_rows: 每块的行数（省略时按BLOCK_ELEMENTS决定）
+            directional: True时读取定向相似度
+
+        返回:
+            (起始行号, row_block()的数组)的迭代器
+        """
+        n = len(self.if_names)
+        tile_rows = tile_rows or max(1, self.BLOCK_ELEMENTS // max(n, 1))
+        for start in range(0, n, tile_rows):
+            yield start, self.row_block(start, min(start + tile_rows, n), directional)
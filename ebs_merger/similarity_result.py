@@ -0,0 +1,269 @@
+"""相似度结果模块
+
+以数组形式保存一个场景内所有IF对的共同字段对数量，
+分组、分组根据、相似度矩阵输出和模板填充共用同一个结果对象。
+"""
+
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def scores_from_counts(
+    common: np.ndarray,
+    sizes1: np.ndarray,
+    sizes2: np.ndarray,
+    mode: str
+) -> np.ndarray:
+    """根据共同字段对数量批量计算相似度（与SimilarityCalculator.calculate_similarity的定义一致）
+
+    参数:
+        common: 共同字段对数量数组
+        sizes1: IF1的字段对数量数组
+        sizes2: IF2的字段对数量数组
+        mode: 相似度算出方法（max或avg）
+
+    返回:
+        相似度数组，范围[0.0, 1.0]
+    """
+    if mode == "max":
+        similarity = common / np.minimum(sizes1, sizes2)
+    else:  # mode == "avg"
+        similarity = (common / sizes1 + common / sizes2) / 2
+    return np.clip(similarity, 0.0, 1.0)
+
+
+class SimilarityResult:
+    """一个场景的相似度计算结果
+
+    只保存共同字段对数量大于0的IF对（按(i, j)升序，i < j），
+    其余IF对的相似度均为0。相似度（max/avg）和定向相似度（詳細値）
+    都由共同数量和各IF的字段对数量推导得到。
+    由阈值连接得到的结果（threshold不为None）只包含相似度>=threshold的对。
+    """
+
+    def __init__(
+        self,
+        if_names: Sequence[str],
+        sizes: np.ndarray,
+        rows: np.ndarray,
+        cols: np.ndarray,
+        common: np.ndarray,
+        mode: str = "max",
+        threshold: Optional[float] = None
+    ):
+        """初始化相似度结果
+
+        参数:
+            if_names: IF名称列表（决定序号）
+            sizes: 各IF的字段对数量
+            rows: IF对的行号数组（i）
+            cols: IF对的列号数组（j，j > i）
+            common: IF对的共同字段对数量数组
+            mode: 相似度算出方法（max或avg）
+            threshold: 结果由阈值连接得到时的阈值（此时只包含相似度>=threshold的对，
+                None表示包含所有有共同字段对的IF对）
+        """
+        if mode not in ["max", "avg"]:
+            raise ValueError(f"mode must be 'max' or 'avg', got '{mode}'")
+
+        self.if_names = list(if_names)
+        self.mode = mode
+        self.threshold = threshold
+        self.sizes = np.asarray(sizes, dtype=np.int32)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.common = np.asarray(common, dtype=np.int32)
+        self.scores = scores_from_counts(
+            self.common, self.sizes[self.rows], self.sizes[self.cols], mode
+        )
+        self._positions = {name: i for i, name in enumerate(self.if_names)}
+        # IF对的键（i·n + j，升序），首次按名称查询时生成
+        self._keys = None
+        # 自动选择引擎时的EnginePlan（由SimilarityCalculator设置）
+        self.plan = None
+
+    def __len__(self) -> int:
+        """IF数"""
+        return len(self.if_names)
+
+    @property
+    def pair_count(self) -> int:
+        """共同字段对数量大于0的IF对数"""
+        return len(self.rows)
+
+    def index_of(self, if_name: str) -> int:
+        """返回IF名称对应的序号"""
+        return self._positions[if_name]
+
+    def _pair_position(self, i: int, j: int) -> int:
+        """返回IF对(i, j)在数组中的位置，不存在时返回-1"""
+        if i > j:
+            i, j = j, i
+        key = i * len(self.if_names) + j
+        if self._keys is None:
+            self._keys = self.rows.astype(np.int64) * len(self.if_names) + self.cols
+        keys = self._keys
+        position = int(np.searchsorted(keys, key))
+        if position < len(keys) and keys[position] == key:
+            return position
+        return -1
+
+    def similarity(self, if1: str, if2: str) -> float:
+        """返回两个IF之间的相似度（按mode计算）"""
+        position = self._pair_position(self.index_of(if1), self.index_of(if2))
+        return float(self.scores[position]) if position >= 0 else 0.0
+
+    def directional(self, if1: str, if2: str) -> float:
+        """返回以if1的字段对数量为分母的定向相似度（類似度詳細値）"""
+        i = self.index_of(if1)
+        position = self._pair_position(i, self.index_of(if2))
+        if position < 0:
+            return 0.0
+        return float(np.clip(self.common[position] / self.sizes[i], 0.0, 1.0))
+
+    def similar_pairs(self, threshold: float) -> List[Tuple[str, str, float]]:
+        """返回相似度>=threshold的IF对列表
+
+        参数:
+            threshold: 相似度阈值（不大于0时返回包含相似度0的完整列表）
+
+        返回:
+            (IF1名称, IF2名称, 相似度)的列表，顺序与两两比较时相同
+        """
+        if self.threshold is not None and threshold < self.threshold:
+            raise ValueError(
+                f"result only contains pairs with similarity >= {self.threshold}, got threshold {threshold}"
+            )
+        if threshold <= 0:
+            return list(self.iter_full_pairs())
+
+        selected = np.flatnonzero(self.scores >= threshold)
+        names = self.if_names
+        return [
+            (names[i], names[j], similarity)
+            for i, j, similarity in zip(
+                self.rows[selected].tolist(),
+                self.cols[selected].tolist(),
+                self.scores[selected].tolist()
+            )
+        ]
+
+    def iter_edges(self, threshold: float, chunk_size: int = 65536) -> Iterator[Tuple[int, int]]:
+        """逐个生成相似度>=threshold的IF对序号（不生成完整的名称列表）
+
+        参数:
+            threshold: 相似度阈值（大于0）
+            chunk_size: 每次转换为Python整数的IF对数
+
+        返回:
+            (i, j)序号对的迭代器，顺序与similar_pairs相同
+        """
+        if self.threshold is not None and threshold < self.threshold:
+            raise ValueError(
+                f"result only contains pairs with similarity >= {self.threshold}, got threshold {threshold}"
+            )
+        selected = np.flatnonzero(self.scores >= threshold)
+        for start in range(0, len(selected), chunk_size):
+            chunk = selected[start:start + chunk_size]
+            yield from zip(self.rows[chunk].tolist(), self.cols[chunk].tolist())
+
+    def iter_full_pairs(self) -> Iterator[Tuple[str, str, float]]:
+        """逐个生成所有IF对（包括相似度为0的对）
+
+        返回:
+            (IF1名称, IF2名称, 相似度)的迭代器，顺序与两两比较时相同
+        """
+        names = self.if_names
+        rows = self.rows.tolist()
+        cols = self.cols.tolist()
+        scores = self.scores.tolist()
+        position = 0
+        for i in range(len(names)):
+            for j in range(i + 1, len(names)):
+                if position < len(rows) and rows[position] == i and cols[position] == j:
+                    yield (names[i], names[j], scores[position])
+                    position += 1
+                else:
+                    yield (names[i], names[j], 0.0)
+
+    def score_matrix(self, if_names: Sequence[str]) -> np.ndarray:
+        """按指定IF顺序生成对称的相似度方阵（对角线为0）
+
+        参数:
+            if_names: 矩阵行列的IF名称顺序
+
+        返回:
+            形状为(len(if_names), len(if_names))的float64数组
+        """
+        order = self._reorder(if_names)
+        matrix = np.zeros((len(if_names), len(if_names)), dtype=np.float64)
+        rows, cols = order[self.rows], order[self.cols]
+        matrix[rows, cols] = self.scores
+        matrix[cols, rows] = self.scores
+        return matrix
+
+    def directional_matrix(self, if_names: Sequence[str]) -> np.ndarray:
+        """按指定IF顺序生成定向相似度方阵（行IF为分母，对角线为0）
+
+        参数:
+            if_names: 矩阵行列的IF名称顺序
+
+        返回:
+            形状为(len(if_names), len(if_names))的float64数组
+        """
+        order = self._reorder(if_names)
+        matrix = np.zeros((len(if_names), len(if_names)), dtype=np.float64)
+        rows, cols = order[self.rows], order[self.cols]
+        matrix[rows, cols] = np.clip(self.common / self.sizes[self.rows], 0.0, 1.0)
+        matrix[cols, rows] = np.clip(self.common / self.sizes[self.cols], 0.0, 1.0)
+        return matrix
+
+    def iter_row_blocks(
+        self,
+        if_names: Sequence[str],
+        block_rows: int,
+        directional: bool = False
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """按行块逐块生成相似度方阵（不生成完整的方阵）
+        
+        参数:
+            if_names: 矩阵行列的IF名称顺序
+            block_rows: 每块的行数
+            directional: True时生成定向相似度（行IF为分母），否则为按mode计算的相似度
+            
+        返回:
+            (起始行号, 形状为(块行数, len(if_names))的float64数组)的迭代器，
+            各块的值与score_matrix / directional_matrix的对应行相同
+        """
+        order = self._reorder(if_names)
+        rows, cols = order[self.rows], order[self.cols]
+        if directional:
+            row_values = np.clip(self.common / self.sizes[self.rows], 0.0, 1.0)
+            col_values = np.clip(self.common / self.sizes[self.cols], 0.0, 1.0)
+        else:
+            row_values = col_values = self.scores
+        
+        # 每个IF对在矩阵中出现两次：(rows, cols)和(cols, rows)
+        entry_rows = np.concatenate([rows, cols])
+        entry_cols = np.concatenate([cols, rows])
+        entry_values = np.concatenate([row_values, col_values])
+        by_row = np.argsort(entry_rows, kind='stable')
+        entry_rows, entry_cols, entry_values = entry_rows[by_row], entry_cols[by_row], entry_values[by_row]
+        
+        n = len(if_names)
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            first, last = np.searchsorted(entry_rows, [start, stop])
+            block = np.zeros((stop - start, n), dtype=np.float64)
+            block[entry_rows[first:last] - start, entry_cols[first:last]] = entry_values[first:last]
+            yield start, block
+    
+    def _reorder(self, if_names: Sequence[str]) -> np.ndarray:
+        """返回从本结果的序号到指定顺序中位置的映射数组"""
+        if len(if_names) != len(self.if_names):
+            raise ValueError("if_names must contain every IF of the result")
+        order = np.empty(len(self.if_names), dtype=np.int64)
+        for position, if_name in enumerate(if_names):
+            order[self.index_of(if_name)] = position
+        return order
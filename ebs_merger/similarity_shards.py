@@ -0,0 +1,204 @@
+"""相似度分片模块
+
+在没有集群调度的多台机器上分担相似度计算：每台机器（--shard i/N）读取相同的输入，
+只计算文件内全部IF两两组合中确定的一部分行块，把部分结果写入共享文件夹；
+merge-shards合并所有部分结果，各场景的相似度从合并结果中提取，与单机计算的结果完全相同。
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ebs_merger.if_grouper import IFInfo
+from ebs_merger.similarity_engines import BlockedIndexEngine
+from ebs_merger.similarity_result import SimilarityResult
+
+
+class SimilarityShards:
+    """一个输入文件的相似度分片
+
+    分片的对象是文件内所有IF（不按AI分类划分）的共同字段对数量，
+    共同数量与分类无关，因此合并后可以提取任意场景的结果。
+    行块按估算工作量切分（与BlockedIndexEngine相同），只依赖输入内容，各机器的切分一致。
+    """
+
+    # 分片文件格式变更时递增
+    VERSION = 1
+
+    def __init__(self, directory: str):
+        """初始化
+
+        参数:
+            directory: 分片文件所在文件夹（各机器共享）
+        """
+        self.directory = Path(directory)
+
+    @staticmethod
+    def parse(text: str) -> Tuple[int, int]:
+        """解析"i/N"形式的分片指定
+
+        参数:
+            text: 分片指定（i为1到N的分片编号）
+
+        返回:
+            (i, N)
+
+        异常:
+            ValueError: 格式错误或范围不正确
+        """
+        try:
+            index, count = (int(value) for value in text.split('/'))
+        except ValueError:
+            raise ValueError(f"shard must be 'i/N', got '{text}'")
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"shard index must be between 1 and N, got '{text}'")
+        return index, count
+
+    @staticmethod
+    def input_hash(file_path: str) -> str:
+        """返回输入文件内容的SHA-256（确认各分片读取的是同一输入）"""
+        content = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                content.update(chunk)
+        return content.hexdigest()
+
+    def path(self, index: int, count: int) -> Path:
+        """返回分片文件路径"""
+        return self.directory / f"shard_{index}_of_{count}.npz"
+
+    @staticmethod
+    def compute(if_dict: Dict[str, IFInfo], index: int, count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """计算第index个分片（共count个）的共同字段对数量
+
+        参数:
+            if_dict: 文件内所有IF的信息字典
+            index: 分片编号（1到count）
+            count: 分片数
+
+        返回:
+            if_dict顺序中的(行号数组, 列号数组, 共同数量数组)，只包含该分片的行块
+        """
+        engine = BlockedIndexEngine(workers=1)
+        arrays = engine.encode([if_info.field_pairs for if_info in if_dict.values()])
+        blocks = engine.row_blocks(arrays, count)
+        # 行块数可能少于分片数（IF很少时），多出的分片为空
+        if index > len(blocks):
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+        start, stop = blocks[index - 1]
+        return engine.count_block(arrays, start, stop)
+
+    def write(
+        self,
+        index: int,
+        count: int,
+        input_hash: str,
+        if_names: Sequence[str],
+        rows: np.ndarray,
+        cols: np.ndarray,
+        common: np.ndarray
+    ) -> Path:
+        """经由临时文件原子地写入分片结果
+
+        参数:
+            index: 分片编号
+            count: 分片数
+            input_hash: 输入文件内容的哈希
+            if_names: 文件内的IF名称（行号、列号的顺序）
+            rows, cols, common: 该分片的结果
+
+        返回:
+            分片文件路径
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(index, count)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                version=np.int64(self.VERSION),
+                input_hash=np.array(input_hash),
+                if_names=np.array(list(if_names), dtype=str),
+                rows=rows.astype(np.int32),
+                cols=cols.astype(np.int32),
+                common=common.astype(np.int32)
+            )
+        os.replace(tmp, path)
+        return path
+
+    def merge(self, input_hash: str, if_names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """读取并合并所有分片结果
+
+        参数:
+            input_hash: 输入文件内容的哈希（与各分片一致）
+            if_names: 文件内的IF名称（与各分片一致）
+
+        返回:
+            if_names顺序中的(行号数组, 列号数组, 共同数量数组)，按(i, j)升序
+
+        异常:
+            ValueError: 没有分片、分片不全或分片与输入不一致
+        """
+        counts = {int(path.stem.rsplit('_', 1)[1]) for path in self.directory.glob("shard_*_of_*.npz")}
+        if len(counts) != 1:
+            raise ValueError(f"错误：分片结果不存在或分片数不一致：{self.directory}")
+        count = counts.pop()
+
+        names = np.array(list(if_names), dtype=str)
+        row_parts, col_parts, count_parts = [], [], []
+        for index in range(1, count + 1):
+            path = self.path(index, count)
+            if not path.exists():
+                raise ValueError(f"错误：缺少分片结果 {index}/{count}：{path}")
+            with np.load(path) as data:
+                if (int(data['version']) != self.VERSION or str(data['input_hash']) != input_hash
+                        or not np.array_equal(data['if_names'], names)):
+                    raise ValueError(f"错误：分片结果 {index}/{count} 与输入文件不一致，请重新计算：{path}")
+                row_parts.append(data['rows'].astype(np.int64))
+                col_parts.append(data['cols'].astype(np.int64))
+                count_parts.append(data['common'].astype(np.int64))
+
+        rows, cols, common = (np.concatenate(parts) for parts in (row_parts, col_parts, count_parts))
+        order = np.lexsort((cols, rows))
+        return rows[order], cols[order], common[order]
+
+    @staticmethod
+    def scenario_result(
+        file_if_names: List[str],
+        rows: np.ndarray,
+        cols: np.ndarray,
+        common: np.ndarray,
+        if_dict: Dict[str, IFInfo],
+        mode: str = "max"
+    ) -> SimilarityResult:
+        """从文件级的合并结果中提取一个场景的相似度结果
+
+        参数:
+            file_if_names: 合并结果的IF名称顺序
+            rows, cols, common: 合并结果
+            if_dict: 该场景的IF信息字典
+            mode: 相似度算出方法（max或avg）
+
+        返回:
+            与SimilarityCalculator.compute(if_dict, mode)相同的SimilarityResult
+        """
+        if_names = list(if_dict.keys())
+        positions = {if_name: i for i, if_name in enumerate(if_names)}
+        # 文件级序号 -> 场景内序号（不属于该场景时为-1）
+        mapping = np.array([positions.get(if_name, -1) for if_name in file_if_names], dtype=np.int64)
+        first, second = mapping[rows], mapping[cols]
+        kept = (first >= 0) & (second >= 0)
+        first, second = first[kept], second[kept]
+        scenario_rows = np.minimum(first, second)
+        scenario_cols = np.maximum(first, second)
+        scenario_common = common[kept]
+        order = np.lexsort((scenario_cols, scenario_rows))
+
+        sizes = np.array([len(if_info.field_pairs) for if_info in if_dict.values()], dtype=np.int64)
+        return SimilarityResult(
+            if_names, sizes, scenario_rows[order], scenario_cols[order], scenario_common[order], mode
+        )
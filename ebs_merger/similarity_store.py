@@ -0,0 +1,344 @@
+"""相似度存储模块
+
+将代表IF之间的共同字段对数量保存到磁盘，键为各IF字段对集合的指纹。
+同一缓存文件夹下的所有输入文件、模块和场景共用一个存储：处理文件时先把新出现的
+指纹登记到存储（只计算这些指纹所在的行），再按场景切出需要的IF对，
+因此场景名变化或新增的文件中出现已处理过的IF时也直接复用保存的结果。
+"""
+
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SimilarityStore:
+    """按指纹保存的增量相似度存储
+
+    文件（.npz）中保存：
+        fingerprints: 各代表IF字段对集合的指纹（SHA-1）
+        last_used: 各指纹最后一次被登记的时间（UNIX秒）
+        keys / indptr / indices: 各指纹的字段对字符串（CSR形式）
+        rows / cols / common: 指纹序号之间共同数量大于0的对（i < j）
+
+    保存的所有指纹之间共同数量大于0的对总是完整的（新指纹与已保存的全部指纹比较），
+    所以任意指纹子集的结果都可以直接从存储中切出。共同数量只由两个字段对集合决定，
+    与IF名、场景、相似度算出方法和阈值无关。
+    """
+
+    # 存储格式变更时递增，使旧文件失效
+    VERSION = 2
+    # 超过该时间没有被登记的指纹在保存时删除
+    EXPIRE_SECONDS = 30 * 24 * 3600
+
+    def __init__(self, path: Optional[str] = None):
+        """初始化存储
+
+        参数:
+            path: 存储文件路径（.npz）。None时只在内存中保存（slice的结果）
+        """
+        self.path = Path(path) if path is not None else None
+        # 最近一次update或overlap_counts中复用和新计算的代表IF数
+        self.reused = 0
+        self.computed = 0
+        self._data = None
+
+    @staticmethod
+    def field_keys(field_pairs: Iterable[Tuple[str, str]]) -> List[str]:
+        """返回字段对集合的字符串表示（排序后的"EBSテーブルID\\x1f項目ID"列表）"""
+        return sorted(f"{table_id}\x1f{item_id}" for table_id, item_id in field_pairs)
+
+    @staticmethod
+    def digest(field_keys: Sequence[str]) -> str:
+        """返回field_keys的结果对应的指纹"""
+        return hashlib.sha1("\n".join(field_keys).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def fingerprint(cls, field_pairs: Iterable[Tuple[str, str]]) -> str:
+        """返回字段对集合的指纹（与词表的ID无关）
+
+        参数:
+            field_pairs: (EBSテーブルID, 項目ID)对
+
+        返回:
+            十六进制字符串形式的SHA-1
+        """
+        return cls.digest(cls.field_keys(field_pairs))
+
+    @staticmethod
+    def _empty() -> Dict[str, np.ndarray]:
+        """空存储的内容"""
+        empty = np.array([], dtype=np.int64)
+        return {
+            'fingerprints': np.array([], dtype='<U40'),
+            'last_used': np.array([], dtype=np.float64),
+            'keys': np.array([], dtype='<U1'),
+            'indptr': np.zeros(1, dtype=np.int64),
+            'indices': empty,
+            'rows': empty,
+            'cols': empty,
+            'common': empty,
+        }
+
+    def load(self) -> Dict[str, np.ndarray]:
+        """读取保存的结果（只在第一次调用时读取文件）
+
+        返回:
+            各数组的字典，没有存储文件或文件损坏时为空存储
+        """
+        if self._data is not None:
+            return self._data
+        data = self._empty()
+        if self.path is not None and self.path.exists():
+            try:
+                with np.load(self.path) as stored:
+                    if int(stored['version']) == self.VERSION:
+                        data = {name: stored[name] for name in data}
+            except Exception:
+                # 损坏的存储视为不存在
+                pass
+        self._data = data
+        return data
+
+    def save(self):
+        """经由临时文件原子地保存结果
+
+        多个进程同时保存时后保存的文件有效，丢失的只是对方新登记的指纹
+        （之后再次计算），存储本身始终完整。
+        """
+        if self.path is None:
+            return
+        data = self.load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, 'wb') as f:
+                np.savez(
+                    f,
+                    version=np.int64(self.VERSION),
+                    fingerprints=data['fingerprints'],
+                    last_used=data['last_used'],
+                    keys=data['keys'],
+                    indptr=data['indptr'].astype(np.int64),
+                    indices=data['indices'].astype(np.int32),
+                    rows=data['rows'].astype(np.int32),
+                    cols=data['cols'].astype(np.int32),
+                    common=data['common'].astype(np.int32)
+                )
+            os.replace(tmp, self.path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def update(self, field_keys: Dict[str, Sequence[str]]):
+        """登记指纹并保存，只计算新指纹与所有已保存指纹之间的共同数量
+
+        参数:
+            field_keys: {指纹: field_keys的结果}
+        """
+        data = self.load()
+        now = time.time()
+        stored = data['fingerprints'].tolist()
+        positions = {fingerprint: i for i, fingerprint in enumerate(stored)}
+        new_fingerprints = [fingerprint for fingerprint in field_keys if fingerprint not in positions]
+        self.reused = len(field_keys) - len(new_fingerprints)
+        self.computed = len(new_fingerprints)
+
+        last_used = data['last_used'].copy()
+        last_used[[positions[fingerprint] for fingerprint in field_keys if fingerprint in positions]] = now
+
+        if new_fingerprints:
+            # 新指纹的字段对登记到存储的字段对表中
+            keys = data['keys'].tolist()
+            key_ids = {key: i for i, key in enumerate(keys)}
+            new_indices = []
+            for fingerprint in new_fingerprints:
+                for key in field_keys[fingerprint]:
+                    key_id = key_ids.get(key)
+                    if key_id is None:
+                        key_id = key_ids[key] = len(keys)
+                        keys.append(key)
+                    new_indices.append(key_id)
+            new_sizes = np.array([len(field_keys[fingerprint]) for fingerprint in new_fingerprints], dtype=np.int64)
+            sizes = np.concatenate((np.diff(data['indptr']), new_sizes))
+            fields = np.concatenate((data['indices'].astype(np.int64), np.array(new_indices, dtype=np.int64)))
+
+            # 新指纹所在的行：与已保存和新登记的全部指纹比较
+            is_new = np.zeros(len(sizes), dtype=bool)
+            is_new[len(stored):] = True
+            new_rows, new_cols, new_common = self._new_overlaps(sizes, fields, is_new)
+            rows = np.concatenate((data['rows'].astype(np.int64), new_rows))
+            cols = np.concatenate((data['cols'].astype(np.int64), new_cols))
+            common = np.concatenate((data['common'].astype(np.int64), new_common))
+            order = np.lexsort((cols, rows))
+
+            data = {
+                'fingerprints': np.array(stored + new_fingerprints, dtype='<U40'),
+                'last_used': np.concatenate((last_used, np.full(len(new_fingerprints), now))),
+                'keys': np.array(keys) if keys else data['keys'],
+                'indptr': np.concatenate(([0], np.cumsum(sizes))),
+                'indices': fields,
+                'rows': rows[order],
+                'cols': cols[order],
+                'common': common[order],
+            }
+        else:
+            data = dict(data, last_used=last_used)
+
+        self._data = self._select(data, data['last_used'] >= now - self.EXPIRE_SECONDS)
+        self.save()
+
+    def slice(self, fingerprints: Iterable[str]) -> 'SimilarityStore':
+        """切出指定指纹之间的结果（不写入文件）
+
+        参数:
+            fingerprints: 需要的指纹（存储中没有的忽略）
+
+        返回:
+            只包含这些指纹的内存中存储（可以传给子进程）
+        """
+        data = self.load()
+        wanted = set(fingerprints)
+        keep = np.array([fingerprint in wanted for fingerprint in data['fingerprints'].tolist()], dtype=bool)
+        part = SimilarityStore()
+        part._data = self._select(data, keep, with_fields=False)
+        return part
+
+    @classmethod
+    def _select(cls, data: Dict[str, np.ndarray], keep: np.ndarray, with_fields: bool = True) -> Dict[str, np.ndarray]:
+        """只保留keep为True的指纹，重新编号IF对
+
+        参数:
+            data: 存储的内容
+            keep: 各指纹是否保留
+            with_fields: 是否保留字段对（False时字段对为空）
+
+        返回:
+            新的存储内容
+        """
+        if keep.all():
+            return data
+        renumber = np.cumsum(keep) - 1
+        kept_pairs = keep[data['rows']] & keep[data['cols']]
+        selected = cls._empty()
+        selected.update(
+            fingerprints=data['fingerprints'][keep],
+            last_used=data['last_used'][keep],
+            rows=renumber[data['rows'][kept_pairs]],
+            cols=renumber[data['cols'][kept_pairs]],
+            common=data['common'][kept_pairs],
+        )
+        if with_fields:
+            sizes = np.diff(data['indptr'])
+            indices = data['indices'][np.repeat(keep, sizes)]
+            # 不再使用的字段对从表中删除
+            used = np.unique(indices)
+            selected.update(
+                keys=data['keys'][used] if len(used) else data['keys'][:0],
+                indptr=np.concatenate(([0], np.cumsum(sizes[keep]))),
+                indices=np.searchsorted(used, indices),
+            )
+        else:
+            selected['indptr'] = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+        return selected
+
+    def overlap_counts(
+        self,
+        fingerprints: Sequence[str],
+        field_sets: List[FrozenSet[int]],
+        engine
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """计算代表IF之间的共同数量，存储中有的指纹之间直接使用保存的结果
+
+        存储中没有的指纹（没有先用update登记时）与本次所有IF比较，结果不写入存储。
+        没有可复用的结果时用engine计算全部。
+
+        参数:
+            fingerprints: 各代表IF的指纹（互不相同）
+            field_sets: 各代表IF的字段对ID集合
+            engine: 相似度计算引擎（提供overlap_counts）
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，按(i, j)升序
+        """
+        data = self.load()
+        positions = {fingerprint: i for i, fingerprint in enumerate(fingerprints)}
+        # 保存的指纹序号 -> 本次的序号（本次没有时为-1）
+        mapping = np.array(
+            [positions.get(fingerprint, -1) for fingerprint in data['fingerprints'].tolist()],
+            dtype=np.int64
+        )
+        is_new = np.ones(len(fingerprints), dtype=bool)
+        is_new[mapping[mapping >= 0]] = False
+        self.reused = int(len(fingerprints) - is_new.sum())
+        self.computed = int(is_new.sum())
+
+        if self.reused == 0:
+            return engine.overlap_counts(field_sets)
+
+        # 两个IF都在本次的对：使用保存的结果
+        first, second = mapping[data['rows']], mapping[data['cols']]
+        kept = (first >= 0) & (second >= 0)
+        first, second = first[kept], second[kept]
+        row_parts = [np.minimum(first, second)]
+        col_parts = [np.maximum(first, second)]
+        count_parts = [data['common'][kept].astype(np.int64)]
+
+        # 包含存储中没有的IF的对：只计算这些IF的行
+        if self.computed:
+            sizes = np.array([len(field_set) for field_set in field_sets], dtype=np.int64)
+            fields = np.fromiter(
+                (field_id for field_set in field_sets for field_id in field_set),
+                dtype=np.int64, count=int(sizes.sum())
+            )
+            new_rows, new_cols, new_common = self._new_overlaps(sizes, fields, is_new)
+            row_parts.append(new_rows)
+            col_parts.append(new_cols)
+            count_parts.append(new_common)
+
+        rows = np.concatenate(row_parts)
+        cols = np.concatenate(col_parts)
+        common = np.concatenate(count_parts)
+        order = np.lexsort((cols, rows))
+        return rows[order], cols[order], common[order]
+
+    @staticmethod
+    def _new_overlaps(
+        sizes: np.ndarray,
+        fields: np.ndarray,
+        is_new: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """用倒排索引计算新增IF与所有IF之间的共同数量
+
+        参数:
+            sizes: 各IF的字段对数量
+            fields: 按IF顺序连接的字段对ID
+            is_new: 各IF是否为新增
+
+        返回:
+            (行号数组, 列号数组, 共同数量数组)，每对只出现一次
+        """
+        n = len(sizes)
+        owners = np.repeat(np.arange(n, dtype=np.int64), sizes)
+
+        # 倒排表：按字段ID排序的(字段ID, IF序号)
+        order = np.argsort(fields, kind='stable')
+        posting_fields, posting_owners = fields[order], owners[order]
+
+        # 新增IF的每个字段对展开为该字段的倒排表
+        query = is_new[owners]
+        query_fields, query_owners = fields[query], owners[query]
+        starts = np.searchsorted(posting_fields, query_fields, side='left')
+        lengths = np.searchsorted(posting_fields, query_fields, side='right') - starts
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        others = posting_owners[np.arange(int(lengths.sum())) + offsets]
+        mine = np.repeat(query_owners, lengths)
+
+        # 排除自身；两个都是新增IF的对只从序号小的一侧计数
+        keep = (others != mine) & (~is_new[others] | (others > mine))
+        first = np.minimum(mine[keep], others[keep])
+        second = np.maximum(mine[keep], others[keep])
+        keys, common = np.unique(first * n + second, return_counts=True)
+        return keys // n, keys % n, common.astype(np.int64)
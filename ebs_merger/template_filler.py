@@ -5,9 +5,10 @@
 
 import pandas as pd
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional
 from datetime import datetime
 from openpyxl import load_workbook
+from ebs_merger.data_loader import IFRowIndex
 from ebs_merger.if_grouper import IFInfo
 
 
@@ -26,20 +27,20 @@ class TemplateFiller:
         self,
         if_dict: Dict[str, IFInfo],
         group_assignments: Dict[str, str],
-        similar_pairs: List[Tuple[str, str, float]],
         input_df: pd.DataFrame,
         output_dir: str = "output",
-        merged_if_names: Dict[str, str] = None
+        merged_if_names: Dict[str, str] = None,
+        row_index: Optional[IFRowIndex] = None
     ):
         """为所有需要合并的组填充模板
         
         参数:
             if_dict: IF信息字典
             group_assignments: IF到グルーピングIDの映射
-            similar_pairs: 相似IF对列表
             input_df: 原始输入数据DataFrame
             output_dir: 输出文件夹路径
             merged_if_names: AI生成的合并IF名字典 {group_id: merged_name}
+            row_index: input_df的IF行索引（省略时在此建立）
         """
         # 构建分组信息：group_id -> [if_names]
         groups = {}
@@ -51,6 +52,9 @@ class TemplateFiller:
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
+        if row_index is None:
+            row_index = IFRowIndex(input_df)
+        
         # 只处理需要合并的组（成员数>1）
         for group_id, group_members in groups.items():
             if len(group_members) > 1:
@@ -65,7 +69,8 @@ class TemplateFiller:
                     if_dict,
                     input_df,
                     output_path,
-                    merged_name
+                    merged_name,
+                    row_index
                 )
     
     def fill_single_group(
@@ -75,7 +80,8 @@ class TemplateFiller:
         if_dict: Dict[str, IFInfo],
         input_df: pd.DataFrame,
         output_path: Path,
-        merged_if_name: str = None
+        merged_if_name: str = None,
+        row_index: Optional[IFRowIndex] = None
     ):
         """为单个合并组填充模板
         
@@ -86,6 +92,7 @@ class TemplateFiller:
             input_df: 原始输入数据DataFrame
             output_path: 输出文件夹路径
             merged_if_name: AI生成的合并IF名（可选）
+            row_index: input_df的IF行索引（省略时在此建立）
         """
         # 加载模板
         wb = load_workbook(self.template_path, keep_vba=True)
@@ -129,16 +136,18 @@ class TemplateFiller:
         safe_set_cell('G21', f"{merged_name}.csv")  # ファイル名（使用AI生成的名称）
         
         # 收集所有IF的数据行
+        if row_index is None:
+            row_index = IFRowIndex(input_df)
         all_rows = []
         for if_name in sorted(group_members):
             # 从原始数据中获取该IF的所有行
-            if_rows = input_df[input_df['IF名'] == if_name]
+            if_rows = row_index.rows(if_name)
             all_rows.append(if_rows)
         
         # 合并所有数据
         merged_data = pd.concat(all_rows, ignore_index=True)
         
-        # 去重：基于EBSテーブルID和項目ID的组合去重
+        # 去重：基于EBSテーブルID和項目ID的组合去重（按原始值比较，保留第一次出现的行）
         merged_data = merged_data.drop_duplicates(
             subset=['EBSテーブルID', '項目ID'],
             keep='first'
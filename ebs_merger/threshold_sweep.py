@@ -0,0 +1,268 @@
+"""阈值扫描模块
+
+由一次相似度计算的结果构建单链接聚类的树状图（相似度边上的最大生成森林），
+不重新计算相似度、不调用AI，即可得到任意阈值下的分组。
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ebs_merger.merge_grouper import ArrayUnionFind
+from ebs_merger.similarity_result import SimilarityResult
+
+
+class ThresholdSweep:
+    """基于最大生成森林的阈值扫描
+
+    阈值t下的分组（相似度>=t的IF对的连通分量）等于最大生成森林中
+    相似度>=t的边的连通分量，因此只需保存最多(IF数-1)条边。
+    按相似度从高到低依次合并这些边，就能在近似线性的时间内得到所有阈值的分组统计。
+    """
+
+    # 未登记在グルーピング結果文件中的IF的分类
+    UNCLASSIFIED = ("未分類", "未分類")
+
+    def __init__(self, result: SimilarityResult, category: Optional[Tuple[str, str]] = None):
+        """由相似度结果构建最大生成森林
+
+        参数:
+            result: 一个场景的相似度计算结果（包含所有相似度>0的IF对）
+            category: 场景的分类 (モジュール, 業務内容)，整个文件作为一个场景时为None
+        """
+        self.if_names = list(result.if_names)
+        # 各IF的分类（整个文件作为一个场景时为None）
+        self.categories = None if category is None else [category] * len(self.if_names)
+        self._set_forest(*self._maximum_spanning_forest(result))
+
+    @classmethod
+    def combine(cls, sweeps: Sequence["ThresholdSweep"]) -> "ThresholdSweep":
+        """合并按场景构建的阈值扫描
+
+        不同场景的IF之间不会合并，各场景的最大生成森林拼接后即为整体的最大生成森林。
+
+        参数:
+            sweeps: 各场景的阈值扫描（均指定了category）
+
+        返回:
+            包含所有场景IF的阈值扫描
+        """
+        combined = cls.__new__(cls)
+        combined.if_names = []
+        combined.categories = []
+        rows, cols, scores = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+        for sweep in sweeps:
+            offset = len(combined.if_names)
+            combined.if_names.extend(sweep.if_names)
+            combined.categories.extend(sweep.categories or [cls.UNCLASSIFIED] * len(sweep.if_names))
+            rows.append(sweep.rows + offset)
+            cols.append(sweep.cols + offset)
+            scores.append(sweep.scores)
+        combined._set_forest(np.concatenate(rows), np.concatenate(cols), np.concatenate(scores))
+        return combined
+
+    def _set_forest(self, rows: np.ndarray, cols: np.ndarray, scores: np.ndarray):
+        """保存最大生成森林的边（按相似度从高到低排列）"""
+        order = np.argsort(-scores, kind='stable')
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.scores = scores[order]
+
+    @staticmethod
+    def _maximum_spanning_forest(result: SimilarityResult):
+        """求相似度边上的最大生成森林
+
+        安装了scipy时用minimum_spanning_tree求解（权重为相似度的降序名次，
+        保证取回的相似度与原值完全一致），否则按相似度降序执行Kruskal算法。
+
+        返回:
+            (rows, cols, scores)数组
+        """
+        n = len(result.if_names)
+        positive = np.flatnonzero(result.scores > 0)
+        rows = result.rows[positive].astype(np.int64)
+        cols = result.cols[positive].astype(np.int64)
+        scores = result.scores[positive]
+        if len(scores) == 0:
+            return rows, cols, scores
+
+        try:
+            from scipy import sparse
+            from scipy.sparse.csgraph import minimum_spanning_tree
+        except ImportError:
+            uf = ArrayUnionFind(n)
+            keep = [
+                k for k in np.argsort(-scores, kind='stable').tolist()
+                if uf.union(int(rows[k]), int(cols[k]))
+            ]
+            return rows[keep], cols[keep], scores[keep]
+
+        levels, ranks = np.unique(-scores, return_inverse=True)
+        graph = sparse.coo_matrix((ranks + 1.0, (rows, cols)), shape=(n, n)).tocsr()
+        forest = minimum_spanning_tree(graph).tocoo()
+        forest_scores = -levels[forest.data.astype(np.int64) - 1]
+        return forest.row.astype(np.int64), forest.col.astype(np.int64), forest_scores
+
+    def levels(self) -> List[float]:
+        """返回所有不同的合并阈值（最大生成森林中各边的相似度，降序）"""
+        return sorted(set(self.scores.tolist()), reverse=True)
+
+    @staticmethod
+    def _check_threshold(threshold: float):
+        """阈值必须大于0（阈值0时所有IF合并为一组，无需扫描）"""
+        if threshold <= 0:
+            raise ValueError(f"sweep threshold must be greater than 0, got {threshold}")
+
+    def groups_at(self, threshold: float) -> List[List[str]]:
+        """返回指定阈值下的分组
+
+        参数:
+            threshold: 相似度阈值（大于0）
+
+        返回:
+            组的列表，组内IF和各组的顺序与MergeGrouper.group_by_result相同
+        """
+        return [[self.if_names[i] for i in group] for group in self._group_indices(threshold)]
+
+    def _group_indices(self, threshold: float) -> List[List[int]]:
+        """返回指定阈值下的分组（IF序号）"""
+        self._check_threshold(threshold)
+        uf = ArrayUnionFind(len(self.if_names))
+        count = int(np.count_nonzero(self.scores >= threshold))
+        uf.union_edges(zip(self.rows[:count].tolist(), self.cols[:count].tolist()))
+        return uf.groups()
+
+    def summary(self, thresholds: Optional[Sequence[float]] = None) -> List[Dict]:
+        """统计各阈值下的分组情况
+
+        参数:
+            thresholds: 阈值列表（省略时为所有不同的合并阈值）
+
+        返回:
+            按阈值降序排列的统计字典列表
+        """
+        if thresholds is None:
+            thresholds = self.levels()
+        thresholds = sorted(set(thresholds), reverse=True)
+        for threshold in thresholds:
+            self._check_threshold(threshold)
+
+        n = len(self.if_names)
+        uf = ArrayUnionFind(n)
+        # 大小>1的组的大小分布
+        sizes: Counter = Counter()
+        group_count = n
+        edges = zip(self.rows.tolist(), self.cols.tolist(), self.scores.tolist())
+        pending = next(edges, None)
+
+        rows = []
+        for threshold in thresholds:
+            while pending is not None and pending[2] >= threshold:
+                i, j, _ = pending
+                root_i, root_j = uf.find(i), uf.find(j)
+                size_i, size_j = uf.size[root_i], uf.size[root_j]
+                uf.union(root_i, root_j)
+                for size in (size_i, size_j):
+                    if size > 1:
+                        sizes[size] -= 1
+                        if sizes[size] == 0:
+                            del sizes[size]
+                sizes[size_i + size_j] += 1
+                group_count -= 1
+                pending = next(edges, None)
+
+            merge_ifs = sum(size * count for size, count in sizes.items())
+            rows.append({
+                '閾値': threshold,
+                'グループ数': group_count,
+                'マージ対象グループ数': sum(sizes.values()),
+                'マージ対象IF数': merge_ifs,
+                '単独IF数': n - merge_ifs,
+                '最大グループサイズ': max(sizes) if sizes else (1 if n else 0),
+                'グループサイズ分布': ", ".join(
+                    f"{size}IF×{count}" for size, count in sorted(sizes.items(), reverse=True)
+                ),
+            })
+        return rows
+
+    def merge_history(self) -> List[Dict]:
+        """返回树状图的合并记录（按相似度降序）
+
+        返回:
+            每次合并一行：相似度、合并的两个IF及合并后的组大小
+        """
+        uf = ArrayUnionFind(len(self.if_names))
+        history = []
+        for i, j, score in zip(self.rows.tolist(), self.cols.tolist(), self.scores.tolist()):
+            uf.union(i, j)
+            row = {'類似度': score}
+            if self.categories is not None:
+                row['モジュール'], row['業務内容'] = self.categories[i]
+            row.update({
+                'IF1': self.if_names[i],
+                'IF2': self.if_names[j],
+                '結合後のグループサイズ': uf.size[uf.find(i)],
+            })
+            history.append(row)
+        return history
+
+    def notes(self) -> List[str]:
+        """返回阈值扫描结果的注意事项（与通常处理结果的关系）"""
+        if self.categories is None:
+            return [
+                "AIによる分類を行わず、ファイル全体を1つのシナリオとして計算しています。",
+                "通常処理ではモジュール・業務内容ごとにグループ化するため、"
+                "各閾値のグループは通常処理の結果の上界（より粗いグループ）です。",
+            ]
+        notes = [
+            "分類（モジュール・業務内容）は既存のグルーピング結果.xlsxから読み込んでいます（AIは使用していません）。",
+            "各閾値のグループは、同じ分類で通常処理を実行した場合のグループと同じです。",
+        ]
+        unclassified = self.categories.count(self.UNCLASSIFIED)
+        if unclassified:
+            notes.append(
+                f"グルーピング結果.xlsxに含まれないIF（{unclassified}個）は1つのシナリオ（未分類）として計算しています。"
+            )
+        return notes
+
+    def write_report(self, output_path: str, thresholds: Optional[Sequence[float]] = None):
+        """输出阈值扫描报告（Excel）
+
+        sheet:
+            サマリー: 各阈值的组数和组大小分布，以及注意事项（notes）
+            グループ: 各IF在各阈值下的グルーピングID（仅指定阈值列表时）
+            マージ履歴: 树状图的合并记录，可据此得到任意阈值的分组
+
+        参数:
+            output_path: 输出文件路径
+            thresholds: 阈值列表（省略时为所有不同的合并阈值）
+        """
+        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+            summary = self.summary(thresholds)
+            pd.DataFrame(summary).to_excel(writer, sheet_name='サマリー', index=False)
+            # 统计表下空一行写入注意事项
+            pd.DataFrame({'注記': self.notes()}).to_excel(
+                writer, sheet_name='サマリー', index=False, startrow=len(summary) + 2
+            )
+
+            if thresholds is not None:
+                assignments = {'IF名': self.if_names}
+                if self.categories is not None:
+                    assignments['モジュール'] = [module for module, _ in self.categories]
+                    assignments['業務内容'] = [scenario for _, scenario in self.categories]
+                for threshold in sorted(set(thresholds), reverse=True):
+                    group_ids = [None] * len(self.if_names)
+                    for group_no, group in enumerate(self._group_indices(threshold), 1):
+                        for i in group:
+                            group_ids[i] = f"G{group_no:03d}"
+                    assignments[f"閾値{threshold:g}"] = group_ids
+                pd.DataFrame(assignments).to_excel(writer, sheet_name='グループ', index=False)
+
+            history_columns = ['類似度', 'IF1', 'IF2', '結合後のグループサイズ']
+            if self.categories is not None:
+                history_columns[1:1] = ['モジュール', '業務内容']
+            pd.DataFrame(self.merge_history(), columns=history_columns).to_excel(
+                writer, sheet_name='マージ履歴', index=False
+            )
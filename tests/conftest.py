@@ -0,0 +1,48 @@
+"""测试共用的数据生成和比较函数"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from hypothesis import strategies as st
+
+from ebs_merger.if_grouper import FieldVocabulary, IFInfo
+from ebs_merger.similarity_result import SimilarityResult
+
+
+# 每个IF的字段对：(EBSテーブルID, 項目ID)，取值范围小，容易出现共同字段对和完全相同的集合
+field_pairs = st.tuples(st.sampled_from(["T1", "T2", "T3"]), st.sampled_from([f"F{i}" for i in range(6)]))
+
+# IF列表：每项为字段对集合（允许空集合和重复集合）
+if_field_sets = st.lists(st.frozensets(field_pairs, max_size=10), min_size=0, max_size=14)
+
+
+def build_if_dict(
+    field_sets: List[frozenset],
+    vocabulary: FieldVocabulary = None,
+    prefix: str = "IF"
+) -> Dict[str, IFInfo]:
+    """将字段对集合列表转换为IF信息字典（字段对登记到vocabulary）"""
+    vocabulary = vocabulary if vocabulary is not None else FieldVocabulary()
+    if_dict = {}
+    for i, pairs in enumerate(field_sets):
+        if_name = f"{prefix}{i:03d}"
+        ids = frozenset(vocabulary.intern(table_id, item_id) for table_id, item_id in sorted(pairs))
+        if_dict[if_name] = IFInfo(if_name, f"DOC{i}", ids, len(pairs), "")
+    return if_dict
+
+
+def with_duplicates(field_sets: List[frozenset]) -> List[frozenset]:
+    """在列表末尾追加前几个集合的副本，保证存在字段对集合完全相同的IF"""
+    return field_sets + field_sets[:3]
+
+
+def result_arrays(result: SimilarityResult) -> Tuple[list, list, list, list]:
+    """返回用于比较的结果内容"""
+    return result.if_names, result.rows.tolist(), result.cols.tolist(), result.common.tolist()
+
+
+def assert_same_result(actual: SimilarityResult, expected: SimilarityResult):
+    """两个相似度结果的IF顺序、IF对和共同数量完全相同"""
+    assert result_arrays(actual) == result_arrays(expected)
+    assert np.array_equal(actual.sizes, expected.sizes)
+    assert actual.mode == expected.mode
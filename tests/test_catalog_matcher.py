@@ -0,0 +1,56 @@
+"""目录相似度的测试"""
+
+import pandas as pd
+
+from ebs_merger.catalog_matcher import CatalogMatcher
+
+
+def input_frame(if_fields):
+    """由{IF名: [(EBSテーブルID, 項目ID), ...]}建立输入DataFrame"""
+    rows = [
+        {'文書管理番号': f"DOC_{if_name}", 'IF名': if_name, 'EBSテーブルID': table_id, '項目ID': item_id, '項目名': item_id}
+        for if_name, pairs in if_fields.items() for table_id, item_id in pairs
+    ]
+    return pd.DataFrame(rows)
+
+
+SHARED = [("T1", "F1"), ("T1", "F2"), ("T1", "F3")]
+
+
+def pair_kinds(rows):
+    """{(IF名1, IF名2): 区分}"""
+    return {tuple(sorted((row['IF名1'], row['IF名2']))): row['区分'] for row in rows}
+
+
+def test_cross_file_and_cross_category_pairs():
+    """跨文件、跨分类的对被报告，同一文件同一分类的对被排除"""
+    matcher = CatalogMatcher()
+    matcher.add_file("a.xlsx", input_frame({"A1": SHARED, "A2": SHARED, "A3": SHARED}), {
+        "A1": ("FI", "受注"), "A2": ("FI", "受注"), "A3": ("SD", "出荷"),
+    })
+    matcher.add_file("b.xlsx", input_frame({"B1": SHARED, "B2": [("T9", "F9")]}), {"B1": ("FI", "受注")})
+
+    rows = matcher.cross_pairs(0.8)
+    kinds = pair_kinds(rows)
+    assert ("A1", "A2") not in kinds
+    assert kinds[("A1", "A3")] == kinds[("A2", "A3")] == "分類間"
+    assert kinds[("A1", "B1")] == kinds[("A2", "B1")] == kinds[("A3", "B1")] == "ファイル間"
+    assert not any("B2" in pair for pair in kinds)
+    assert [row['No.'] for row in rows] == list(range(1, len(rows) + 1))
+
+
+def test_uncategorized_pairs_are_reported():
+    """没有分类信息的IF与同一文件中其他IF的相似对作为「未分類」报告"""
+    matcher = CatalogMatcher()
+    # 没有グルーピング結果的文件：所有IF未分类
+    matcher.add_file("a.xlsx", input_frame({"A1": SHARED, "A2": SHARED}))
+    # 部分IF没有分类信息
+    matcher.add_file("b.xlsx", input_frame({"B1": SHARED, "B2": SHARED, "B3": SHARED}), {
+        "B1": ("FI", "受注"), "B2": ("FI", "受注"),
+    })
+
+    kinds = pair_kinds(matcher.cross_pairs(0.8))
+    assert kinds[("A1", "A2")] == "未分類"
+    assert kinds[("B1", "B3")] == kinds[("B2", "B3")] == "未分類"
+    assert ("B1", "B2") not in kinds
+    assert kinds[("A1", "B1")] == "ファイル間"
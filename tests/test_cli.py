@@ -0,0 +1,141 @@
+"""CLI并行处理的测试
+
+AI的连接和调用替换为确定性的结果（不访问网络）。并行处理（文件、场景、AI线程）的输出
+必须与串行处理相同。
+"""
+
+import multiprocessing
+import random
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ebs_merger.ai_classifier import AIClassifier
+from ebs_merger.ai_generator import AIGenerator
+from ebs_merger.cli import EBSMergerCLI
+from ebs_merger.data_loader import IFRowIndex
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# 文件并行处理的子进程需要继承替换后的AI
+requires_fork = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="子进程不继承替换后的AI"
+)
+
+
+def fake_classify(self, if_dict, input_df, row_index=None):
+    """按IF名顺序轮流分配到2个模块、3个场景"""
+    categories = {}
+    for i, if_name in enumerate(sorted(if_dict)):
+        module, scenario = ["FI", "SD"][i % 2], ["受注", "出荷", "在庫"][(i // 2) % 3]
+        categories.setdefault(f"{module}_{scenario}", (module, scenario, []))[2].append(if_name)
+    return categories
+
+
+def fake_if_info(self, if_dict, input_df, row_index=None):
+    return {if_name: {'summary': f"概要{if_name}", 'representative_item': "代表"} for if_name in if_dict}
+
+
+def fake_merged_name(self, group_members, if_dict, input_df, row_index=None):
+    return "M_" + "_".join(sorted(group_members))
+
+
+@pytest.fixture
+def stub_ai(monkeypatch):
+    """AI的初始化和调用替换为确定性的结果"""
+    monkeypatch.setattr(AIGenerator, "__init__", lambda self, *args, **kwargs: None)
+    monkeypatch.setattr(AIClassifier, "__init__", lambda self, *args, **kwargs: None)
+    monkeypatch.setattr(AIClassifier, "classify_interfaces", fake_classify)
+    monkeypatch.setattr(AIGenerator, "generate_all_if_info", fake_if_info)
+    monkeypatch.setattr(AIGenerator, "generate_merged_if_name", fake_merged_name)
+    # 模板路径相对于仓库根目录
+    monkeypatch.chdir(REPO_ROOT)
+
+
+def write_input(path, seed, if_count=18):
+    """写入字段对从小范围随机选取的输入Excel（容易形成合并组）"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(if_count):
+        fields = rng.sample([(f"T{t}", f"F{f}") for t in range(3) for f in range(4)], rng.randint(2, 5))
+        for table_id, item_id in fields:
+            rows.append({
+                'No.': len(rows) + 1,
+                '文書管理番号': f"D{i:03d}",
+                'IF名': f"IF_{i:03d}",
+                'EBSテーブル名': f"表{table_id}",
+                'EBSテーブルID': table_id,
+                '項目ID': item_id,
+                '項目名': f"項目{item_id}",
+                '桁数': 10,
+            })
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return path
+
+
+def output_files(output_dir):
+    """输出文件夹内的文件（不包括缓存和处理日志）"""
+    return sorted(
+        path.relative_to(output_dir).as_posix() for path in Path(output_dir).rglob("*")
+        if path.is_file() and ".cache" not in path.parts and path.name != "処理ログ.txt"
+    )
+
+
+@requires_fork
+def test_parallel_files_match_serial(tmp_path, stub_ai):
+    """--jobs并行处理时各文件的输出和バッチ処理結果与串行处理相同"""
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    for seed in range(2):
+        write_input(input_dir / f"book{seed}.xlsx", seed)
+
+    outputs = {}
+    for jobs in (1, 2):
+        output_dir = tmp_path / f"jobs{jobs}"
+        assert EBSMergerCLI(str(input_dir), str(output_dir), threshold=0.5, jobs=jobs).run() == 0
+        outputs[jobs] = output_dir
+
+    serial, parallel = outputs[1], outputs[2]
+    assert output_files(parallel) == output_files(serial)
+    for seed in range(2):
+        assert (parallel / f"book{seed}" / "処理ログ.txt").exists()
+        pd.testing.assert_frame_equal(
+            pd.read_excel(parallel / f"book{seed}" / "グルーピング結果.xlsx"),
+            pd.read_excel(serial / f"book{seed}" / "グルーピング結果.xlsx")
+        )
+
+    def batch_summary(output_dir):
+        summary = pd.read_excel(output_dir / "バッチ処理結果.xlsx").drop(columns=['処理時間（秒）'])
+        summary['出力フォルダ'] = summary['出力フォルダ'].map(lambda folder: Path(folder).name)
+        return summary
+
+    assert (batch_summary(serial)['結果'] == "成功").all()
+    assert (batch_summary(serial)['マージ対象IF数'] > 0).all()
+    pd.testing.assert_frame_equal(batch_summary(parallel), batch_summary(serial))
+
+
+def test_parallel_scenarios_match_serial(tmp_path, stub_ai):
+    """场景并行计算和AI线程并行时process_modules的输出行（グルーピングID等）和模板与串行处理相同"""
+    input_file = write_input(tmp_path / "book.xlsx", seed=0)
+    outputs = {}
+    for scenario_processes, ai_threads in ((1, 1), (2, 3)):
+        output_dir = tmp_path / f"scenarios{scenario_processes}_threads{ai_threads}"
+        cli = EBSMergerCLI(
+            output_dir=str(output_dir), threshold=0.5,
+            scenario_processes=scenario_processes, ai_threads=ai_threads
+        )
+        df = cli.loader.load_file(str(input_file))
+        row_index = IFRowIndex(df)
+        if_dict = cli.grouper.group_by_if(df)
+        categories = cli.classifier.classify_interfaces(if_dict, df, row_index)
+        module_data = cli._organize_by_module(categories, if_dict, row_index)
+        rows = cli.process_modules(module_data, df, row_index, output_dir)
+        outputs[ai_threads] = (rows, output_files(output_dir))
+
+    serial_rows, serial_files = outputs[1]
+    parallel_rows, parallel_files = outputs[3]
+    assert any(row['マージ要否'] == "○" for row in serial_rows)
+    assert parallel_rows == serial_rows
+    assert parallel_files == serial_files
@@ -0,0 +1,22 @@
+"""输入文件读取的测试"""
+
+import importlib.util
+
+import pytest
+
+from ebs_merger import data_loader
+from ebs_merger.data_loader import DataLoader
+
+
+def test_parquet_without_pyarrow_is_rejected(tmp_path, monkeypatch):
+    """未安装pyarrow时读取Parquet文件报出明确的错误"""
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(
+        data_loader.importlib.util, "find_spec",
+        lambda name, *args: None if name == "pyarrow" else find_spec(name, *args)
+    )
+    path = tmp_path / "input.parquet"
+    path.write_bytes(b"")
+
+    with pytest.raises(ValueError, match="pyarrow"):
+        DataLoader().load_file(str(path))
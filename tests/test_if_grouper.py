@@ -0,0 +1,110 @@
+"""IF分组的测试
+
+向量化的group_by_if必须与逐行处理（iterrows）的原实现结果相同。
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from ebs_merger.data_loader import DataLoader
+from ebs_merger.if_grouper import IFGrouper
+
+
+def reference_group_by_if(df):
+    """逐行处理的原实现：{IF名: (文書管理番号, 字段对集合, 項目数, 代表項目名)}"""
+    result = {}
+    for if_name, if_df in df.groupby('IF名', observed=True):
+        field_pairs = set()
+        for _, row in if_df.iterrows():
+            table_id, item_id = row['EBSテーブルID'], row['項目ID']
+            if pd.notna(table_id) and pd.notna(item_id):
+                table_id_str, item_id_str = str(table_id).strip(), str(item_id).strip()
+                if table_id_str and item_id_str:
+                    field_pairs.add((table_id_str, item_id_str))
+        representative_item = ""
+        for item_name in if_df['項目名']:
+            if pd.notna(item_name) and str(item_name).strip():
+                representative_item = str(item_name)
+                break
+        doc_number = if_df['文書管理番号'].iloc[0]
+        result[str(if_name)] = (str(doc_number), field_pairs, len(field_pairs), representative_item)
+    return result
+
+
+def grouped(df):
+    """用向量化的group_by_if分组，转换为与reference_group_by_if相同的形式"""
+    grouper = IFGrouper()
+    return {
+        if_name: (
+            if_info.doc_number, grouper.vocabulary.decode(if_info.field_pairs),
+            if_info.item_count, if_info.representative_item
+        )
+        for if_name, if_info in grouper.group_by_if(df).items()
+    }
+
+
+# 包含空值、空白、前后空格和数值的单元格
+blank = st.sampled_from([None, np.nan, "", "  "])
+if_names = st.one_of(blank, st.sampled_from(["IF_A", "IF_B", " IF_A", "IF_C ", "10"]))
+doc_numbers = st.one_of(blank, st.sampled_from(["D001", "D002", " D003 "]), st.integers(1, 3))
+table_ids = st.one_of(blank, st.sampled_from(["T1", " T1 ", "T2", "0003"]), st.sampled_from([1, 1.0, 2.5]))
+item_ids = st.one_of(blank, st.sampled_from(["F1", "F1 ", "F2", "001"]), st.sampled_from([1, 1.0, 7]))
+item_names = st.one_of(blank, st.sampled_from(["名称1", " 名称2 ", "名称3"]))
+
+rows = st.lists(st.tuples(if_names, doc_numbers, table_ids, item_ids, item_names), max_size=40)
+
+
+def build_frame(data):
+    """由行数据建立输入DataFrame（各列为object类型）"""
+    columns = ['IF名', '文書管理番号', 'EBSテーブルID', '項目ID', '項目名']
+    return pd.DataFrame(data, columns=columns, dtype=object)
+
+
+@settings(max_examples=300, deadline=None)
+@given(data=rows)
+def test_matches_row_by_row_grouping(data):
+    """object列的输入与原实现相同（IF名、顺序、文書管理番号、字段对、代表項目名）"""
+    df = build_frame(data)
+    expected = reference_group_by_if(df)
+    actual = grouped(df)
+    assert list(actual) == list(expected)
+    assert actual == expected
+
+
+@settings(max_examples=300, deadline=None)
+@given(data=rows)
+def test_categorical_columns_match_object_columns(data):
+    """DataLoader转换为分类类型的列与取值相同的object列结果相同"""
+    categorical = build_frame(data)
+    for column in DataLoader.CATEGORICAL_COLUMNS:
+        categorical[column] = categorical[column].astype('category')
+    plain = categorical.astype(object)
+    assert grouped(categorical) == grouped(plain)
+    assert grouped(categorical) == reference_group_by_if(plain)
+
+
+@pytest.mark.parametrize("data, expected", [
+    # IF名为空值的行被忽略，空字符串的IF名作为一个IF
+    (
+        [(None, "D0", "T1", "F1", "x"), ("", "D1", "T1", "F1", "y"), ("IF_A", "D2", "T1", "F1", "z")],
+        {"": ("D1", {("T1", "F1")}, 1, "y"), "IF_A": ("D2", {("T1", "F1")}, 1, "z")},
+    ),
+    # 去除前后空格后相同的字段对只计一次，数值ID按str()转换
+    (
+        [("IF_A", "D1", " T1 ", "F1 ", None), ("IF_A", "D2", "T1", "F1", "  "), ("IF_A", "D3", 1.0, 7, " 名称 ")],
+        {"IF_A": ("D1", {("T1", "F1"), ("1.0", "7")}, 2, " 名称 ")},
+    ),
+    # 任一方为空的字段对被忽略
+    (
+        [("IF_A", None, "T1", None, None), ("IF_A", "D2", "  ", "F1", None)],
+        {"IF_A": ("None", set(), 0, "")},
+    ),
+])
+def test_messy_input(data, expected):
+    """空值、空白和数值单元格的处理与原实现相同"""
+    df = build_frame(data)
+    assert grouped(df) == expected
+    assert reference_group_by_if(df) == expected
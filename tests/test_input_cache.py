@@ -0,0 +1,133 @@
+"""输入缓存的测试
+
+文件未变更时返回与重新读取相同的DataFrame，文件或读取方式变化时不得返回旧数据。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ebs_merger.data_loader import DataLoader
+from ebs_merger.input_cache import InputCache
+
+
+def write_excel(path, if_names=("IF_A", "IF_A", "IF_B", None), item_ids=("F1", "F2", " F3", None)):
+    """写入包含前导零、前后空格和空白单元格的输入Excel"""
+    pd.DataFrame({
+        'No.': range(1, len(if_names) + 1),
+        '文書管理番号': ["D001", "D001", "D002", "D003"][:len(if_names)],
+        'IF名': list(if_names),
+        'EBSテーブル名': ["表1", "表1", " 表2 ", "表3"][:len(if_names)],
+        'EBSテーブルID': ["T001", "T001", "0002", "T003"][:len(if_names)],
+        '項目ID': list(item_ids)[:len(if_names)],
+        '項目名': ["項目1", None, "項目3", "項目4"][:len(if_names)],
+        '桁数': [10, 20, None, 5][:len(if_names)],
+    }).to_excel(path, index=False)
+    return str(path)
+
+
+def assert_same_frame(actual, expected):
+    """内容和列类型（包括分类类型）完全相同"""
+    pd.testing.assert_frame_equal(actual, expected)
+    for column in DataLoader.CATEGORICAL_COLUMNS:
+        assert isinstance(actual[column].dtype, pd.CategoricalDtype)
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    return write_excel(tmp_path / "input.xlsx")
+
+
+@pytest.mark.parametrize("use_parquet, item_ids, suffix", [
+    (True, ("F1", "F2", " F3", None), ".parquet"),
+    # 混合类型的列无法用Parquet表示，改用pickle
+    (True, ("F1", 2, " F3", None), ".pkl"),
+    (False, ("F1", "F2", " F3", None), ".pkl"),
+])
+def test_round_trip_matches_fresh_load(tmp_path, use_parquet, item_ids, suffix):
+    """Parquet和pickle缓存读回的DataFrame与不使用缓存的读取结果相同"""
+    if use_parquet:
+        pytest.importorskip("pyarrow")
+    input_file = write_excel(tmp_path / "input.xlsx", item_ids=item_ids)
+    cache = InputCache(str(tmp_path / "cache"))
+    cache.use_parquet = use_parquet
+    DataLoader(cache=cache).load_file(input_file)
+    assert [path.suffix for path in (tmp_path / "cache").iterdir()] == [suffix]
+
+    assert_same_frame(DataLoader(cache=cache).load_file(input_file), DataLoader().load_file(input_file))
+
+
+def test_unchanged_file_hits_without_parsing(tmp_path, input_file, monkeypatch):
+    """文件未变更时不解析Excel"""
+    cache = InputCache(str(tmp_path / "cache"))
+    expected = DataLoader(cache=cache).load_file(input_file)
+
+    loader = DataLoader(cache=cache)
+    monkeypatch.setattr(loader.reader, "iter_rows", lambda *args: pytest.fail("Excel was parsed"))
+    assert_same_frame(loader.load_file(input_file), expected)
+
+
+def test_changed_file_misses(tmp_path, input_file):
+    """内容、大小或修改时间变化时缓存键不同，重新读取得到新数据"""
+    cache = InputCache(str(tmp_path / "cache"))
+    loader = DataLoader(cache=cache)
+    loader.load_file(input_file)
+    keys = {cache.key(input_file, "openpyxl")}
+
+    # 修改时间变化（内容不变）
+    stat = os.stat(input_file)
+    os.utime(input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    keys.add(cache.key(input_file, "openpyxl"))
+
+    # 内容和大小变化
+    write_excel(input_file, if_names=("IF_X", "IF_Y", "IF_Z"))
+    keys.add(cache.key(input_file, "openpyxl"))
+    assert len(keys) == 3
+
+    df = loader.load_file(input_file)
+    assert list(df['IF名'].astype(str)) == ["IF_X", "IF_Y", "IF_Z"]
+    assert_same_frame(df, DataLoader().load_file(input_file))
+
+
+def test_variant_is_part_of_key(tmp_path, input_file):
+    """不同读取方式的缓存互不共用"""
+    cache = InputCache(str(tmp_path / "cache"))
+    assert cache.key(input_file, "openpyxl") != cache.key(input_file, "calamine")
+    assert cache.key(input_file, "openpyxl") == cache.key(input_file, "openpyxl")
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".pkl"])
+def test_corrupt_entry_is_a_miss(tmp_path, input_file, suffix):
+    """损坏的缓存文件视为未命中并被删除"""
+    cache = InputCache(str(tmp_path / "cache"))
+    key = cache.key(input_file, "openpyxl")
+    (tmp_path / "cache").mkdir()
+    path = tmp_path / "cache" / f"{key}{suffix}"
+    path.write_bytes(b"not a cache file")
+
+    assert cache.get(key) is None
+    assert not path.exists()
+    assert_same_frame(DataLoader(cache=cache).load_file(input_file), DataLoader().load_file(input_file))
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    """总大小超过上限时删除最久未使用的条目"""
+    df = pd.DataFrame({'a': np.arange(100)})
+    cache = InputCache(str(tmp_path / "cache"))
+    cache.put("a", df)
+    size = next((tmp_path / "cache").iterdir()).stat().st_size
+    cache.max_bytes = 2 * size
+
+    cache.put("b", df)
+    # 让a比b更旧，然后读取a使其成为最近使用的条目
+    for offset, name in enumerate(["a", "b"]):
+        path = next((tmp_path / "cache").glob(f"{name}.*"))
+        os.utime(path, (1000 + offset, 1000 + offset))
+    assert cache.get("a") is not None
+
+    cache.put("c", df)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
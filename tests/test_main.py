@@ -0,0 +1,14 @@
+"""命令行入口的测试（不创建CLI实例，不调用AI）"""
+
+from ebs_merger.__main__ import main, merge_shards_main
+
+
+def test_invalid_arguments_return_exit_code():
+    """参数错误时返回退出码1，而不是直接结束进程"""
+    assert main(["--threshold", "2"]) == 1
+    assert main(["--engine", "minhash", "--mode", "max"]) == 1
+
+
+def test_merge_shards_returns_exit_code():
+    """merge-shards子命令返回main的退出码"""
+    assert merge_shards_main(["--sweep", "0.5"]) == 1
@@ -0,0 +1,50 @@
+"""合并分组的测试"""
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from ebs_merger.merge_grouper import ArrayUnionFind, UnionFind
+
+
+@st.composite
+def edge_lists(draw):
+    """元素数和(i, j)边列表"""
+    n = draw(st.integers(min_value=0, max_value=30))
+    if n == 0:
+        return 0, []
+    index = st.integers(min_value=0, max_value=n - 1)
+    return n, draw(st.lists(st.tuples(index, index), max_size=60))
+
+
+def connected_components(n, edges):
+    """用UnionFind（名称版）求连通分量，作为参照"""
+    uf = UnionFind([str(i) for i in range(n)])
+    for i, j in edges:
+        uf.union(str(i), str(j))
+    return sorted(sorted(int(x) for x in group) for group in uf.get_groups().values())
+
+
+@settings(max_examples=200)
+@given(data=edge_lists(), random=st.randoms(use_true_random=False))
+def test_groups_independent_of_union_order(data, random):
+    """合并顺序和边的方向不影响groups()的结果"""
+    n, edges = data
+    uf = ArrayUnionFind(n)
+    uf.union_edges(edges)
+
+    shuffled = [(j, i) if random.random() < 0.5 else (i, j) for i, j in edges]
+    random.shuffle(shuffled)
+    other = ArrayUnionFind(n)
+    other.union_edges(iter(shuffled))
+
+    assert uf.groups() == other.groups()
+    assert uf.groups() == sorted(connected_components(n, edges))
+
+
+def test_groups_are_sorted_by_smallest_member():
+    """组内升序，各组按最小序号排列"""
+    uf = ArrayUnionFind(6)
+    assert uf.union(5, 2)
+    assert uf.union(4, 0)
+    assert not uf.union(0, 4)
+    assert uf.groups() == [[0, 4], [1], [2, 5], [3]]
@@ -0,0 +1,58 @@
+"""グルーピング根拠生成的测试
+
+使用邻接索引生成的根拠必须与逐对扫描similar_pairs的原实现完全相同。
+"""
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from ebs_merger.result_generator import ResultGenerator
+
+
+def scan_reason(if_name, group_members, similar_pairs):
+    """原实现：对每个IF扫描所有相似IF对"""
+    if len(group_members) == 1:
+        return "独立IF、マージ不要"
+    reasons = []
+    for if1, if2, similarity in similar_pairs:
+        if if1 == if_name and if2 in group_members:
+            reasons.append(f"「{if2}」と類似度{similarity:.1%}")
+        elif if2 == if_name and if1 in group_members:
+            reasons.append(f"「{if1}」と類似度{similarity:.1%}")
+    return "、".join(reasons) if reasons else "推移性によるマージ"
+
+
+@st.composite
+def grouped_pairs(draw):
+    """IF到グルーピングID的映射，以及IF对列表（包括跨组的对）"""
+    n = draw(st.integers(min_value=1, max_value=12))
+    if_names = [f"IF{i:02d}" for i in range(n)]
+    group_ids = draw(st.lists(st.sampled_from(["G1", "G2", "G3"]), min_size=n, max_size=n))
+    index = st.integers(min_value=0, max_value=n - 1)
+    score = st.sampled_from([0.5, 0.8, 0.8333333, 0.95, 1.0])
+    pairs = draw(st.lists(
+        st.tuples(index, index, score).filter(lambda pair: pair[0] != pair[1]),
+        max_size=30, unique_by=lambda pair: frozenset(pair[:2])
+    ))
+    return (
+        dict(zip(if_names, group_ids)),
+        [(if_names[i], if_names[j], similarity) for i, j, similarity in pairs],
+    )
+
+
+@settings(max_examples=300)
+@given(data=grouped_pairs())
+def test_indexed_reasons_match_scan(data):
+    """所有IF的根拠（顺序和格式）与逐对扫描相同"""
+    group_assignments, similar_pairs = data
+    groups = {}
+    for if_name, group_id in group_assignments.items():
+        groups.setdefault(group_id, []).append(if_name)
+
+    generator = ResultGenerator()
+    reason_index = generator.build_reason_index(group_assignments, similar_pairs)
+    for if_name, group_id in group_assignments.items():
+        members = groups[group_id]
+        expected = scan_reason(if_name, members, similar_pairs)
+        assert generator.create_grouping_reason(if_name, members, similar_pairs, reason_index) == expected
+        assert generator.create_grouping_reason(if_name, members, similar_pairs) == expected
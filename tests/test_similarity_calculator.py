@@ -0,0 +1,111 @@
+"""相似度计算引擎的测试
+
+所有精确引擎（以及auto）的结果都必须与calculate_similarity逐对计算的结果相同。
+"""
+
+import itertools
+import random
+
+import pytest
+from hypothesis import given, settings
+
+from conftest import assert_same_result, build_if_dict, if_field_sets, with_duplicates
+from ebs_merger.similarity_calculator import SimilarityCalculator
+
+
+EXACT_ENGINES = sorted(set(SimilarityCalculator.ENGINES) - SimilarityCalculator.APPROXIMATE_ENGINES)
+ENGINES_UNDER_TEST = EXACT_ENGINES + [SimilarityCalculator.AUTO_ENGINE]
+MODES = ["max", "avg"]
+
+
+def pairwise_scores(if_dict, mode):
+    """用calculate_similarity逐对计算所有IF对的相似度"""
+    calculator = SimilarityCalculator("brute")
+    return {
+        (if1, if2): calculator.calculate_similarity(if_dict[if1], if_dict[if2], mode)
+        for if1, if2 in itertools.combinations(if_dict, 2)
+    }
+
+
+@pytest.mark.parametrize("engine", ENGINES_UNDER_TEST)
+@pytest.mark.parametrize("mode", MODES)
+@settings(max_examples=60, deadline=None)
+@given(field_sets=if_field_sets)
+def test_full_result_matches_pairwise(engine, mode, field_sets):
+    """完整结果中每个IF对的相似度与逐对计算相同（包括字段对集合相同的IF）"""
+    if_dict = build_if_dict(with_duplicates(field_sets))
+    result = SimilarityCalculator(engine).compute(if_dict, mode)
+
+    for (if1, if2), expected in pairwise_scores(if_dict, mode).items():
+        assert result.similarity(if1, if2) == expected
+    assert sorted(result.iter_full_pairs()) == sorted(
+        (if1, if2, score) for (if1, if2), score in pairwise_scores(if_dict, mode).items()
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES_UNDER_TEST)
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 2 / 3, 0.8, 1.0])
+@settings(max_examples=40, deadline=None)
+@given(field_sets=if_field_sets)
+def test_threshold_join_matches_pairwise(engine, mode, threshold, field_sets):
+    """按阈值筛选的结果（支持阈值连接的引擎只计算这些对）与逐对计算相同"""
+    if_dict = build_if_dict(with_duplicates(field_sets))
+    result = SimilarityCalculator(engine).compute(if_dict, mode, threshold)
+
+    expected = sorted(
+        (if1, if2, score) for (if1, if2), score in pairwise_scores(if_dict, mode).items()
+        if score >= threshold
+    )
+    assert sorted(result.similar_pairs(threshold)) == expected
+
+
+@pytest.mark.parametrize("engine", ENGINES_UNDER_TEST)
+def test_identical_sets_are_expanded(engine):
+    """字段对集合相同的IF只比较代表IF，展开后与其他IF的结果相同"""
+    shared = frozenset({("T1", "F0"), ("T1", "F1"), ("T2", "F0")})
+    field_sets = [shared, frozenset({("T1", "F0")}), shared, frozenset(), shared, frozenset()]
+    if_dict = build_if_dict(field_sets)
+    result = SimilarityCalculator(engine).compute(if_dict, "max")
+
+    assert result.similarity("IF000", "IF002") == 1.0
+    assert result.similarity("IF002", "IF004") == 1.0
+    assert result.similarity("IF001", "IF004") == 1.0
+    # 空集合之间、空集合与其他IF之间相似度为0
+    assert result.similarity("IF003", "IF005") == 0.0
+    assert result.similarity("IF000", "IF003") == 0.0
+    assert result.pair_count == 6
+
+
+@given(field_sets=if_field_sets)
+@settings(max_examples=40, deadline=None)
+def test_auto_plan_selects_exact_engine(field_sets):
+    """auto只选择精确引擎，需要完整矩阵时不选择阈值连接"""
+    if_dict = build_if_dict(field_sets)
+    calculator = SimilarityCalculator(SimilarityCalculator.AUTO_ENGINE)
+
+    full_plan = calculator.plan(if_dict)
+    assert full_plan.engine in EXACT_ENGINES
+    assert full_plan.engine != "prefix"
+    assert calculator.plan(if_dict, 0.8).engine in EXACT_ENGINES
+    assert calculator.compute(if_dict).plan.engine == full_plan.engine
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_blocked_index_matches_single_process(mode):
+    """多进程分块计算的结果与单进程相同（IF数超过并行下限）"""
+    rng = random.Random(7)
+    fields = [(f"T{t}", f"F{f}") for t in range(20) for f in range(30)]
+    field_sets = [frozenset(rng.sample(fields, rng.randint(0, 12))) for _ in range(700)]
+    if_dict = build_if_dict(with_duplicates(field_sets))
+
+    assert_same_result(
+        SimilarityCalculator("index", workers=2).compute(if_dict, mode),
+        SimilarityCalculator("index").compute(if_dict, mode)
+    )
+
+
+def test_unknown_engine_is_rejected():
+    """未知的引擎名称报错"""
+    with pytest.raises(ValueError):
+        SimilarityCalculator("unknown")
@@ -0,0 +1,33 @@
+"""相似度计算引擎内部实现的测试"""
+
+import numpy as np
+import pytest
+
+from conftest import build_if_dict
+from ebs_merger.similarity_calculator import SimilarityCalculator
+from ebs_merger.similarity_engines import MinHashLSHEngine
+
+
+def test_minhash_universal_hash_matches_integer_arithmetic():
+    """MinHash的哈希与用Python整数计算的 (a·x + b) mod (2^61 - 1) 相同（uint64不溢出）"""
+    engine = MinHashLSHEngine(bands=8, rows=4)
+    rng = np.random.default_rng(0)
+    values = np.concatenate([
+        rng.integers(0, 1 << 32, size=200, dtype=np.uint64),
+        np.array([0, 1, (1 << 32) - 1], dtype=np.uint64),
+    ])
+    prime = (1 << 61) - 1
+    expected = np.array(
+        [[(int(a) * int(x) + int(b)) % prime for a, b in zip(engine._a, engine._b)] for x in values],
+        dtype=np.uint64
+    )
+    assert np.array_equal(engine.universal_hash(values), expected)
+
+
+def test_minhash_rejects_max_mode():
+    """minhash引擎只能与avg模式一起使用"""
+    if_dict = build_if_dict([frozenset({("T1", "F0"), ("T1", "F1")}), frozenset({("T1", "F0")})])
+    calculator = SimilarityCalculator("minhash")
+    with pytest.raises(ValueError):
+        calculator.compute(if_dict, "max")
+    assert calculator.compute(if_dict, "avg").similarity("IF000", "IF001") in (0.0, 0.75)
@@ -0,0 +1,61 @@
+"""相似度索引的测试"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ebs_merger.similarity_index import SimilarityIndex
+
+
+def write_input(path, if_fields):
+    """写入CSV输入文件 {IF名: [(EBSテーブルID, 項目ID), ...]}"""
+    pairs = [(if_name, table_id, item_id) for if_name, fields in if_fields.items() for table_id, item_id in fields]
+    rows = [
+        {
+            'No.': no, '文書管理番号': f"DOC_{if_name}", 'IF名': if_name, 'EBSテーブル名': table_id,
+            'EBSテーブルID': table_id, '項目ID': item_id, '項目名': item_id, '桁数': 10,
+        }
+        for no, (if_name, table_id, item_id) in enumerate(pairs, 1)
+    ]
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def test_query_returns_most_similar(tmp_path):
+    """查询结果按相似度降序排列"""
+    input_file = write_input(tmp_path / "a.csv", {
+        "IF_A": [("T1", "F1"), ("T1", "F2")],
+        "IF_B": [("T1", "F1"), ("T2", "F1"), ("T2", "F2")],
+        "IF_C": [("T3", "F1")],
+    })
+    index = SimilarityIndex.build([input_file], str(tmp_path / "index"))
+
+    result = index.query([("T1", "F1"), ("T1", "F2")], k=5)
+    assert [(row['IF名'], row['類似度']) for row in result] == [("IF_A", 1.0), ("IF_B", 0.5)]
+
+
+def test_failed_rebuild_leaves_no_loadable_index(tmp_path, monkeypatch):
+    """重新构建中途失败时，旧的meta.json不会与新的数组组合成可加载的索引"""
+    index_dir = str(tmp_path / "index")
+    SimilarityIndex.build([write_input(tmp_path / "a.csv", {"IF_A": [("T1", "F1")]})], index_dir)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(np, "save", fail)
+    with pytest.raises(OSError):
+        SimilarityIndex.build([write_input(tmp_path / "b.csv", {"IF_B": [("T2", "F1")]})], index_dir)
+    monkeypatch.undo()
+
+    with pytest.raises(FileNotFoundError):
+        SimilarityIndex(index_dir)
+    assert not list((tmp_path / "index").glob("*.tmp"))
+
+
+def test_rebuild_does_not_disturb_loaded_index(tmp_path):
+    """重新构建后，已加载的旧索引仍返回旧的结果，新加载的索引返回新的结果"""
+    index_dir = str(tmp_path / "index")
+    old = SimilarityIndex.build([write_input(tmp_path / "a.csv", {"IF_A": [("T1", "F1")]})], index_dir)
+    SimilarityIndex.build([write_input(tmp_path / "b.csv", {"IF_B": [("T1", "F1")], "IF_C": [("T2", "F1")]})], index_dir)
+
+    assert [row['IF名'] for row in old.query([("T1", "F1")])] == ["IF_A"]
+    assert [row['IF名'] for row in SimilarityIndex(index_dir).query([("T1", "F1")])] == ["IF_B"]
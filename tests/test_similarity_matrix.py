@@ -0,0 +1,71 @@
+"""内存映射相似度矩阵的测试
+
+逐块读取的矩阵必须与SimilarityResult生成的方阵相同（uint8在±0.5%以内）。
+"""
+
+import numpy as np
+import pytest
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+
+from conftest import build_if_dict, if_field_sets, with_duplicates
+from ebs_merger.similarity_calculator import SimilarityCalculator
+from ebs_merger.similarity_matrix import MemmapMatrix
+
+
+# float32保存时的误差上限，以及uint8（百分比取整）的误差上限
+TOLERANCE = {"float32": 1e-6, "uint8": 0.005 + 1e-9}
+
+
+def read_tiles(matrix, tile_rows, directional):
+    """用tiles()逐块读取并拼接整个矩阵"""
+    blocks = [block for _, block in matrix.tiles(tile_rows, directional)]
+    return np.concatenate(blocks) if blocks else np.zeros((0, len(matrix)))
+
+
+@pytest.mark.parametrize("dtype", sorted(MemmapMatrix.DTYPES))
+@pytest.mark.parametrize("mode", ["max", "avg"])
+@settings(max_examples=30, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(
+    field_sets=if_field_sets,
+    block_elements=st.integers(min_value=1, max_value=64),
+    tile_rows=st.integers(min_value=1, max_value=5),
+    reverse=st.booleans(),
+)
+def test_tiles_match_score_matrix(tmp_path_factory, monkeypatch, dtype, mode, field_sets, block_elements,
+                                  tile_rows, reverse):
+    """按任意行块写入、读取的矩阵与score_matrix和directional_matrix相同"""
+    monkeypatch.setattr(MemmapMatrix, "BLOCK_ELEMENTS", block_elements)
+    if_dict = build_if_dict(with_duplicates(field_sets))
+    result = SimilarityCalculator().compute(if_dict, mode)
+    if_names = sorted(if_dict, reverse=reverse)
+
+    directory = tmp_path_factory.mktemp("matrix")
+    MemmapMatrix.write(result, str(directory), if_names, dtype)
+    matrix = MemmapMatrix(str(directory))
+
+    # 名称索引的往返
+    assert matrix.if_names == if_names
+    assert (matrix.mode, matrix.dtype) == (mode, dtype)
+    assert matrix.scores.dtype == MemmapMatrix.DTYPES[dtype]
+
+    np.testing.assert_allclose(
+        read_tiles(matrix, tile_rows, False).reshape(len(if_names), len(if_names)),
+        result.score_matrix(if_names), rtol=0, atol=TOLERANCE[dtype]
+    )
+    np.testing.assert_allclose(
+        read_tiles(matrix, tile_rows, True).reshape(len(if_names), len(if_names)),
+        result.directional_matrix(if_names), rtol=0, atol=TOLERANCE[dtype]
+    )
+
+
+def test_invalid_input_is_rejected(tmp_path):
+    """未知的数据类型和阈值连接的结果（不完整）报错"""
+    if_dict = build_if_dict([frozenset({("T1", "F0")}), frozenset({("T1", "F0"), ("T1", "F1")})])
+    calculator = SimilarityCalculator()
+    with pytest.raises(ValueError):
+        MemmapMatrix.write(calculator.compute(if_dict), str(tmp_path / "a"), dtype="float16")
+    with pytest.raises(ValueError):
+        MemmapMatrix.write(SimilarityCalculator("prefix").compute(if_dict, threshold=0.5), str(tmp_path / "b"))
+    with pytest.raises(FileNotFoundError):
+        MemmapMatrix(str(tmp_path / "missing"))
@@ -0,0 +1,65 @@
+"""相似度分片的测试
+
+合并所有分片后提取的各场景结果必须与不分片计算的结果相同。
+"""
+
+import pytest
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+
+from conftest import assert_same_result, build_if_dict, if_field_sets, with_duplicates
+from ebs_merger.similarity_calculator import SimilarityCalculator
+from ebs_merger.similarity_shards import SimilarityShards
+
+
+def write_all_shards(directory, if_dict, count, input_hash="input"):
+    """计算并写入所有分片"""
+    shards = SimilarityShards(str(directory))
+    for index in range(1, count + 1):
+        rows, cols, common = SimilarityShards.compute(if_dict, index, count)
+        shards.write(index, count, input_hash, list(if_dict), rows, cols, common)
+    return shards
+
+
+@pytest.mark.parametrize("mode", ["max", "avg"])
+@settings(max_examples=40, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(field_sets=if_field_sets, count=st.integers(min_value=1, max_value=6), split=st.integers(min_value=0, max_value=20))
+def test_merged_shards_match_unsharded(tmp_path_factory, mode, field_sets, count, split):
+    """文件整体和任意场景（文件内IF的子集）的结果都与不分片计算相同"""
+    if_dict = build_if_dict(with_duplicates(field_sets))
+    shards = write_all_shards(tmp_path_factory.mktemp("shards"), if_dict, count)
+    merged = (list(if_dict), *shards.merge("input", list(if_dict)))
+    calculator = SimilarityCalculator()
+
+    assert_same_result(SimilarityShards.scenario_result(*merged, if_dict, mode), calculator.compute(if_dict, mode))
+
+    # 场景：文件内IF的一部分（顺序与文件内不同）
+    scenario = {if_name: if_dict[if_name] for if_name in reversed(list(if_dict)[:split])}
+    assert_same_result(
+        SimilarityShards.scenario_result(*merged, scenario, mode), calculator.compute(scenario, mode)
+    )
+
+
+def test_missing_or_mismatched_shard_is_rejected(tmp_path):
+    """缺少分片或分片与输入不一致时报错"""
+    if_dict = build_if_dict([frozenset({("T1", f"F{i}"), ("T2", "F0")}) for i in range(6)])
+    shards = write_all_shards(tmp_path, if_dict, 3)
+
+    with pytest.raises(ValueError):
+        shards.merge("other input", list(if_dict))
+    shards.path(2, 3).unlink()
+    with pytest.raises(ValueError):
+        shards.merge("input", list(if_dict))
+
+
+@pytest.mark.parametrize("text, expected", [("1/1", (1, 1)), ("2/3", (2, 3))])
+def test_parse(text, expected):
+    """分片指定的解析"""
+    assert SimilarityShards.parse(text) == expected
+
+
+@pytest.mark.parametrize("text", ["0/2", "3/2", "1", "a/b", "1/0"])
+def test_parse_rejects_invalid(text):
+    """格式或范围不正确时报错"""
+    with pytest.raises(ValueError):
+        SimilarityShards.parse(text)
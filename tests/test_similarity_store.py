@@ -0,0 +1,145 @@
+"""增量相似度存储的测试
+
+使用存储时（无论复用多少保存的结果、从共用存储切出哪些场景）都必须与不使用存储的重新计算结果相同。
+"""
+
+import pytest
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+
+from conftest import assert_same_result, build_if_dict, if_field_sets, with_duplicates
+from ebs_merger.if_grouper import FieldVocabulary
+from ebs_merger.similarity_calculator import SimilarityCalculator
+from ebs_merger.similarity_store import SimilarityStore
+
+
+def fingerprints_of(if_dict, vocabulary):
+    """各IF字段对集合的指纹"""
+    return {
+        if_name: SimilarityStore.fingerprint(vocabulary.decode(if_info.field_pairs))
+        for if_name, if_info in if_dict.items()
+    }
+
+
+def register(store, if_dict, vocabulary):
+    """与EBSMergerCLI._scenario_stores相同地将IF登记到存储，返回各IF的指纹"""
+    keys = {
+        if_name: SimilarityStore.field_keys(vocabulary.decode(if_info.field_pairs))
+        for if_name, if_info in if_dict.items()
+    }
+    store.update({SimilarityStore.digest(field_keys): field_keys for field_keys in keys.values()})
+    return {if_name: SimilarityStore.digest(field_keys) for if_name, field_keys in keys.items()}
+
+
+def compute_with_store(calculator, if_dict, vocabulary, store, mode):
+    """登记到存储后按场景切出并计算"""
+    fingerprints = register(store, if_dict, vocabulary)
+    return calculator.compute(if_dict, mode, store=store.slice(fingerprints.values()), fingerprints=fingerprints)
+
+
+@pytest.mark.parametrize("engine", ["index", "sparse", "bitset", SimilarityCalculator.AUTO_ENGINE])
+@pytest.mark.parametrize("mode", ["max", "avg"])
+@settings(max_examples=40, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(before=if_field_sets, after=if_field_sets, kept=st.integers(min_value=0, max_value=14))
+def test_store_matches_cold_run(tmp_path_factory, engine, mode, before, after, kept):
+    """第一次（全部未命中）和输入变更后（部分命中）的结果都与重新计算相同"""
+    calculator = SimilarityCalculator(engine)
+    store = SimilarityStore(str(tmp_path_factory.mktemp("store") / "similarity.npz"))
+
+    # 第一次处理：存储为空
+    vocabulary = FieldVocabulary()
+    first = build_if_dict(with_duplicates(before), vocabulary)
+    assert_same_result(compute_with_store(calculator, first, vocabulary, store, mode), calculator.compute(first, mode))
+    assert store.reused == 0
+
+    # 第二次处理：保留前kept个IF，其余不使用，并追加新的IF（使用新的词表，ID与第一次不同）
+    vocabulary = FieldVocabulary()
+    second = build_if_dict(before[:kept], vocabulary)
+    second.update(build_if_dict(after, vocabulary, prefix="NEW"))
+    assert_same_result(compute_with_store(calculator, second, vocabulary, store, mode), calculator.compute(second, mode))
+
+    # 第三次处理：输入没有变更，全部复用
+    result = compute_with_store(calculator, second, vocabulary, store, mode)
+    assert store.computed == 0
+    assert_same_result(result, calculator.compute(second, mode))
+
+    # 重新打开存储文件（其他文件、其他场景名）也全部复用
+    reopened = SimilarityStore(store.path)
+    result = compute_with_store(calculator, second, vocabulary, reopened, mode)
+    assert reopened.computed == 0
+    assert_same_result(result, calculator.compute(second, mode))
+
+
+def test_corrupt_store_is_recomputed(tmp_path):
+    """损坏的存储文件视为不存在"""
+    path = tmp_path / "similarity.npz"
+    path.write_bytes(b"not a npz file")
+    vocabulary = FieldVocabulary()
+    if_dict = build_if_dict([frozenset({("T1", "F0"), ("T1", "F1")}), frozenset({("T1", "F0")})], vocabulary)
+    calculator = SimilarityCalculator()
+    store = SimilarityStore(str(path))
+
+    assert_same_result(compute_with_store(calculator, if_dict, vocabulary, store, "max"), calculator.compute(if_dict))
+    assert store.reused == 0
+
+
+@settings(max_examples=40, deadline=None)
+@given(field_sets=if_field_sets, split=st.integers(min_value=0, max_value=14))
+def test_scenarios_share_one_store(tmp_path_factory, field_sets, split):
+    """一个场景登记的IF在另一个场景（另一个文件）中直接复用，切出的结果与重新计算相同"""
+    calculator = SimilarityCalculator()
+    path = tmp_path_factory.mktemp("store") / "similarity.npz"
+
+    vocabulary = FieldVocabulary()
+    first = build_if_dict(field_sets[:split], vocabulary)
+    first_fingerprints = set(register(SimilarityStore(str(path)), first, vocabulary).values())
+
+    # 新的文件：包含第一个场景的全部IF（名字不同）和新的IF
+    vocabulary = FieldVocabulary()
+    second = build_if_dict(field_sets, vocabulary, prefix="BOOK2_")
+    store = SimilarityStore(str(path))
+    fingerprints = register(store, second, vocabulary)
+    assert store.computed == len(set(fingerprints.values()) - first_fingerprints)
+    result = calculator.compute(second, "max", store=store.slice(fingerprints.values()), fingerprints=fingerprints)
+    assert_same_result(result, calculator.compute(second, "max"))
+
+    # 切出的存储只包含需要的指纹
+    part = store.slice(first_fingerprints)
+    assert set(part.load()['fingerprints'].tolist()) == first_fingerprints
+
+
+def test_unregistered_fingerprints_are_computed(tmp_path):
+    """没有登记的IF与本次所有IF比较，结果不写入存储"""
+    vocabulary = FieldVocabulary()
+    if_dict = build_if_dict(
+        [frozenset({("T1", "F0"), ("T1", "F1")}), frozenset({("T1", "F0")}), frozenset({("T2", "F0")})],
+        vocabulary
+    )
+    path = tmp_path / "similarity.npz"
+    store = SimilarityStore(str(path))
+    register(store, dict(list(if_dict.items())[:1]), vocabulary)
+
+    calculator = SimilarityCalculator()
+    store = SimilarityStore(str(path))
+    result = calculator.compute(if_dict, store=store, fingerprints=fingerprints_of(if_dict, vocabulary))
+    assert (store.reused, store.computed) == (1, 2)
+    assert_same_result(result, calculator.compute(if_dict))
+    assert len(SimilarityStore(str(path)).load()['fingerprints']) == 1
+
+
+def test_expired_fingerprints_are_dropped(tmp_path, monkeypatch):
+    """长时间没有登记的指纹在保存时删除"""
+    vocabulary = FieldVocabulary()
+    old = build_if_dict([frozenset({("T1", "F0"), ("T1", "F1")})], vocabulary, prefix="OLD")
+    new = build_if_dict([frozenset({("T1", "F0"), ("T2", "F0")})], vocabulary, prefix="NEW")
+    path = tmp_path / "similarity.npz"
+
+    monkeypatch.setattr("time.time", lambda: 0.0)
+    register(SimilarityStore(str(path)), old, vocabulary)
+    monkeypatch.setattr("time.time", lambda: SimilarityStore.EXPIRE_SECONDS + 1.0)
+    fingerprints = register(SimilarityStore(str(path)), new, vocabulary)
+
+    data = SimilarityStore(str(path)).load()
+    assert data['fingerprints'].tolist() == list(fingerprints.values())
+    assert data['keys'].tolist() == SimilarityStore.field_keys([("T1", "F0"), ("T2", "F0")])
+    assert len(data['rows']) == 0
@@ -0,0 +1,82 @@
+"""阈值扫描的测试
+
+任意阈值下的分组都必须与按该阈值直接分组的结果相同；按分类扫描时各场景互不合并。
+"""
+
+import pandas as pd
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from conftest import build_if_dict, if_field_sets, with_duplicates
+from ebs_merger.merge_grouper import MergeGrouper
+from ebs_merger.similarity_calculator import SimilarityCalculator
+from ebs_merger.threshold_sweep import ThresholdSweep
+
+
+THRESHOLDS = [0.3, 0.5, 2 / 3, 0.8, 1.0]
+
+
+def direct_groups(if_dict, threshold, mode="max"):
+    """按阈值直接分组（通常处理的方式）"""
+    result = SimilarityCalculator().compute(if_dict, mode)
+    return sorted(MergeGrouper().group_by_result(if_dict, result, threshold).values())
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+@settings(max_examples=40, deadline=None)
+@given(field_sets=if_field_sets)
+def test_groups_match_direct_grouping(threshold, field_sets):
+    """整个文件作为一个场景时，各阈值的分组与直接分组相同"""
+    if_dict = build_if_dict(with_duplicates(field_sets))
+    sweep = ThresholdSweep(SimilarityCalculator().compute(if_dict))
+
+    assert sorted(sweep.groups_at(threshold)) == direct_groups(if_dict, threshold)
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+@settings(max_examples=40, deadline=None)
+@given(field_sets=if_field_sets, labels=st.lists(st.sampled_from(["A", "B", "C"]), min_size=17, max_size=17))
+def test_combined_scenarios_match_per_scenario_grouping(threshold, field_sets, labels):
+    """按分类扫描时，各阈值的分组等于各场景直接分组的并集（不同场景的IF不合并）"""
+    if_dict = build_if_dict(with_duplicates(field_sets))
+    scenarios = {}
+    for if_name, label in zip(if_dict, labels):
+        scenarios.setdefault(("M", label), {})[if_name] = if_dict[if_name]
+    sweep = ThresholdSweep.combine([
+        ThresholdSweep(SimilarityCalculator().compute(scenario_if_dict), category)
+        for category, scenario_if_dict in scenarios.items()
+    ])
+
+    expected = sorted(
+        group for scenario_if_dict in scenarios.values() for group in direct_groups(scenario_if_dict, threshold)
+    )
+    assert sorted(sweep.groups_at(threshold)) == expected
+    summary = sweep.summary([threshold])[0]
+    assert summary['グループ数'] == len(expected)
+
+
+def test_combine_without_scenarios():
+    """没有场景时得到空的扫描"""
+    sweep = ThresholdSweep.combine([])
+    assert sweep.if_names == []
+    assert sweep.levels() == []
+    assert sweep.summary([0.5])[0]['グループ数'] == 0
+
+
+@pytest.mark.parametrize("categorized", [False, True])
+def test_report_contains_notes(tmp_path, categorized):
+    """サマリー sheet中写有与通常处理结果关系的注意事项"""
+    if_dict = build_if_dict([frozenset({("T1", "F0"), ("T1", "F1")}), frozenset({("T1", "F0")})])
+    result = SimilarityCalculator().compute(if_dict)
+    sweep = ThresholdSweep(result, ("M", "S")) if categorized else ThresholdSweep(result)
+    path = tmp_path / "sweep.xlsx"
+    sweep.write_report(str(path), [0.5])
+
+    sheet = pd.read_excel(path, sheet_name="サマリー", header=None).fillna("")
+    text = "\n".join(str(value) for value in sheet.to_numpy().ravel())
+    for note in sweep.notes():
+        assert note in text
+    assert ("上界" in text) != categorized
+    groups = pd.read_excel(path, sheet_name="グループ")
+    assert ("モジュール" in groups.columns) == categorized